@@ -0,0 +1 @@
+# Offline benchmarks for the email campaign (run with python -m benchmarks.<name>)
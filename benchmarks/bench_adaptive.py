@@ -0,0 +1,59 @@
+"""
+Generation under throttling and outages: fixed concurrency vs AIMD limiter and circuit breaker
+
+    python -m benchmarks.bench_adaptive
+"""
+import contextlib
+import io
+import os
+import time
+
+from src import clients, graph, limiter, metrics
+from .stubs import StubBedrockClient, make_customers
+
+CUSTOMERS = 1000
+LATENCY = 0.02
+
+
+def run(stub: StubBedrockClient, env: dict):
+    os.environ.update(env)
+    clients.set_client('bedrock-agent-runtime', stub)
+    limiter.reset_generation_control()
+    metrics.reset_metrics()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = graph.create_emails({"customers": make_customers(CUSTOMERS)})
+    elapsed = time.perf_counter() - start
+
+    assert len(result["emails_to_send"]) == CUSTOMERS
+    fallbacks = metrics.get_metrics().report()['counters'].get('generation.fallbacks', 0)
+    return elapsed, CUSTOMERS - fallbacks
+
+
+def main():
+    print(f"{CUSTOMERS} customers, {LATENCY * 1000:.0f} ms per call, 32 workers, service takes 8 calls at once")
+    for label, env in (
+        ('fixed, fall back on throttle', {'GENERATION_ADAPTIVE': 'false', 'GENERATION_MAX_RETRIES': '0'}),
+        ('fixed, retry throttled calls', {'GENERATION_ADAPTIVE': 'false', 'GENERATION_MAX_RETRIES': '3'}),
+        ('AIMD limiter + retries', {'GENERATION_ADAPTIVE': 'true', 'GENERATION_MAX_RETRIES': '3'})
+    ):
+        stub = StubBedrockClient(latency=LATENCY, capacity=8)
+        elapsed, generated = run(stub, {'GENERATION_CONCURRENCY': '32', 'GENERATION_BREAKER_THRESHOLD': '0.5', **env})
+        print(f"  {label:<30} {elapsed:6.2f}s  {generated:>5} model emails  {generated / elapsed:6.0f}/s  "
+              f"{stub.calls:>5} calls  {stub.throttled:>5} throttled")
+
+    print(f"\n{CUSTOMERS} customers, 8 workers, Bedrock down for the first 2s")
+    for label, threshold in (('no circuit breaker', '2'), ('circuit breaker', '0.5')):
+        stub = StubBedrockClient(latency=LATENCY, outage=2.0)
+        elapsed, generated = run(stub, {
+            'GENERATION_CONCURRENCY': '8',
+            'GENERATION_ADAPTIVE': 'true',
+            'GENERATION_BREAKER_THRESHOLD': threshold,
+            'GENERATION_BREAKER_COOLDOWN': '0.5'
+        })
+        print(f"  {label:<30} {elapsed:6.2f}s  {generated:>5} model emails  {stub.calls:>5} calls to Bedrock")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Order-to-profile aggregation: throughput, memory and incremental updates
+
+Orders are generated on the fly in time order, so memory is the
+aggregator's state only.
+
+    python -m benchmarks.bench_aggregation
+    python -m benchmarks.bench_aggregation --orders 20000000 --customers 1000000
+"""
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+from itertools import islice
+
+import numpy as np
+
+from src.aggregation import CHUNK_ORDERS, DAY, ProfileAggregator, iter_json_file
+
+DISHES = [f"Dish {i}" for i in range(80)]
+START = 1_700_000_000
+QUANTITIES = np.array(["1", "1", "1", "2", "3"])
+
+
+def iter_orders(count: int, customers: int, days: int, start: int = START, seed: int = 0, block: int = 10_000):
+    """Square-style orders in time order, built a block at a time"""
+    rng = np.random.default_rng(seed)
+    step = days * DAY / count
+    for first in range(0, count, block):
+        size = min(block, count - first)
+        stamps = np.datetime_as_string((start + np.arange(first, first + size) * step).astype('datetime64[s]'))
+        buyers = rng.integers(0, customers, size).tolist()
+        lines = rng.integers(1, 4, size).tolist()
+        dishes = (rng.zipf(1.6, 3 * size) % len(DISHES)).tolist()
+        quantities = rng.choice(QUANTITIES, 3 * size).tolist()
+        for i in range(size):
+            yield {
+                'id': f'ORD-{start}-{first + i}',
+                'customer_id': f'CUST-{buyers[i]}',
+                'state': 'COMPLETED',
+                'created_at': f'{stamps[i]}Z',
+                'line_items': [
+                    {'name': DISHES[dishes[3 * i + j]], 'quantity': quantities[3 * i + j]} for j in range(lines[i])
+                ]
+            }
+
+
+def contacts(customers: int):
+    for i in range(customers):
+        yield {'id': f'CUST-{i}', 'given_name': 'Customer', 'family_name': str(i), 'email_address': f'c{i}@example.com'}
+
+
+def maxrss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=2_000_000)
+    parser.add_argument('--customers', type=int, default=200_000)
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+
+    baseline = maxrss_mib()
+    aggregator = ProfileAggregator()
+    aggregator.add_contacts(contacts(args.customers))
+
+    # Generate a chunk, then time only the aggregator's work on it
+    orders = iter_orders(args.orders, args.customers, args.days)
+    elapsed = 0.0
+    while True:
+        chunk = list(islice(orders, CHUNK_ORDERS))
+        if not chunk:
+            break
+        start = time.perf_counter()
+        aggregator.update(chunk)
+        elapsed += time.perf_counter() - start
+    pairs = sum(len(keys) for keys, _ in aggregator.buckets.values())
+    print(f"{args.orders:,} orders, {args.customers:,} customers over {args.days} days")
+    print(f"  aggregate      {elapsed:7.2f}s  {args.orders / elapsed:10,.0f} orders/s  "
+          f"max RSS +{maxrss_mib() - baseline:,.0f} MiB  {pairs:,} (customer, dish, month) counts")
+
+    as_of = aggregator.watermark + DAY
+    start = time.perf_counter()
+    profiles = sum(1 for _ in aggregator.iter_profiles(as_of))
+    print(f"  emit profiles  {time.perf_counter() - start:7.2f}s  {profiles:,} profiles")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state = os.path.join(tmp, 'profiles.npz')
+        start = time.perf_counter()
+        aggregator.save(state)
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        aggregator = ProfileAggregator.load(state)
+        print(f"  save / load    {saved:7.2f}s / {time.perf_counter() - start:.2f}s  "
+              f"state {os.path.getsize(state) / 2**20:,.1f} MiB")
+
+        # Next day's orders, applied to the saved state
+        daily = max(args.orders // args.days, 1)
+        next_day = aggregator.watermark + 1
+        start = time.perf_counter()
+        aggregator.update(iter_orders(daily, args.customers, 1, start=next_day, seed=1), source='next-day.jsonl')
+        profiles = list(aggregator.iter_profiles(as_of + DAY))
+        print(f"  next day       {time.perf_counter() - start:7.2f}s  {daily:,} new orders, {len(profiles):,} profiles re-emitted")
+
+        # The same file read again (a rerun) is skipped by its watermark
+        start = time.perf_counter()
+        aggregator.update(iter_orders(daily, args.customers, 1, start=next_day, seed=1), source='next-day.jsonl')
+        assert list(aggregator.iter_profiles(as_of + DAY)) == profiles
+        print(f"  rerun          {time.perf_counter() - start:7.2f}s  {aggregator.skipped:,} orders skipped, profiles unchanged")
+
+        # The same orders read back from a JSON Lines file
+        sample = min(args.orders, 200_000)
+        path = os.path.join(tmp, 'orders.jsonl')
+        with open(path, 'w') as f:
+            for order in iter_orders(sample, args.customers, args.days):
+                f.write(json.dumps(order) + '\n')
+        start = time.perf_counter()
+        ProfileAggregator().update(iter_json_file(path))
+        elapsed = time.perf_counter() - start
+        print(f"  from JSONL     {elapsed:7.2f}s  {sample / elapsed:10,.0f} orders/s ({sample:,} orders, parsing included)")
+
+
+if __name__ == "__main__":
+    main()
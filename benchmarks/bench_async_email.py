@@ -0,0 +1,59 @@
+"""
+Email agent throughput under concurrent requests: blocking smtplib vs async backends
+
+send_restaurant_email awaits these backends directly, so requests/s here is
+what handle_email_request can sustain for the SMTP and SES paths.
+
+    python -m benchmarks.bench_async_email
+"""
+import asyncio
+import os
+import smtplib
+import time
+
+from src import async_email, ses_sender
+from src.async_email import AsyncSMTPPool
+from .bench_smtp import build_message
+from .stubs import SMTPSink, StubSESClient
+
+REQUESTS = 800
+MESSAGE_DELAY = 0.01
+
+
+async def blocking_smtp(sink: SMTPSink, i: int):
+    # What send_restaurant_email used to do: a blocking session inside the coroutine
+    with smtplib.SMTP(sink.host, sink.port) as server:
+        server.send_message(build_message(i))
+
+
+async def load(send, concurrency: int) -> float:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def request(i):
+        async with limit:
+            await send(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request(i) for i in range(REQUESTS)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+async def main():
+    print(f"{REQUESTS} requests, {MESSAGE_DELAY * 1000:.0f} ms per message at the server")
+    with SMTPSink(message_delay=MESSAGE_DELAY) as sink:
+        for concurrency in (1, 4, 16):
+            blocking = await load(lambda i: blocking_smtp(sink, i), concurrency)
+            pool = AsyncSMTPPool(sink.host, sink.port, size=concurrency, starttls=False)
+            pooled = await load(lambda i: pool.send_message(build_message(i)), concurrency)
+            await pool.close()
+            print(f"  SMTP concurrency={concurrency:<3} blocking {blocking:6.0f} req/s   async pool {pooled:6.0f} req/s")
+
+    os.environ['ASYNC_EXECUTOR_WORKERS'] = '16'
+    for concurrency in (1, 4, 16):
+        ses_sender._sender = ses_sender.SESSender(client=StubSESClient(max_send_rate=10_000, latency=MESSAGE_DELAY))
+        rate = await load(lambda i: async_email.send_ses_async(f"c{i}@example.com", "Hi", "Body"), concurrency)
+        print(f"  SES  concurrency={concurrency:<3} executor {rate:6.0f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
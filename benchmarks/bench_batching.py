@@ -0,0 +1,61 @@
+"""
+Requests and prompt size: one customer per call vs K customers per call
+
+    python -m benchmarks.bench_batching
+
+Also checks that a throttled batch call falls back to templates instead of
+splitting into K single-customer calls.
+"""
+import contextlib
+import io
+import os
+import time
+
+from src import clients, graph, limiter
+from .stubs import StubBedrockClient, make_customers
+
+CUSTOMERS = 400
+LATENCY = 0.05       # fixed cost per request
+ITEM_LATENCY = 0.01  # output cost per customer
+DROP_RATE = 0.02     # customers the model leaves out of a batch answer
+
+
+def run(batch_size: int, error_rate: float = 0.0):
+    os.environ['GENERATION_BATCH_SIZE'] = str(batch_size)
+    os.environ['GENERATION_CONCURRENCY'] = '8'
+    limiter.reset_generation_control()
+    client = StubBedrockClient(
+        latency=LATENCY, item_latency=ITEM_LATENCY, drop_rate=DROP_RATE, error_rate=error_rate
+    )
+    clients.set_client('bedrock-agent-runtime', client)
+    customers = make_customers(CUSTOMERS)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        emails = graph.create_emails({"customers": customers})["emails_to_send"]
+    elapsed = time.perf_counter() - start
+
+    assert [e["to"] for e in emails] == [c["email"] for c in customers]
+    return client, elapsed
+
+
+def main():
+    print(f"{CUSTOMERS} customers, 8 workers, {DROP_RATE:.0%} of batch items dropped")
+    for batch_size in (1, 5, 20, 50):
+        client, elapsed = run(batch_size)
+        print(
+            f"  K={batch_size:<3} requests={client.calls:<4} "
+            f"prompt chars/customer={client.input_chars / CUSTOMERS:6.0f}  {elapsed:5.2f}s"
+        )
+
+    # Every call throttled: each batch costs its retries, never K more calls
+    os.environ['GENERATION_MAX_RETRIES'] = '1'
+    batch_size = 20
+    client, elapsed = run(batch_size, error_rate=1.0)
+    batches = -(-CUSTOMERS // batch_size)
+    print(f"  K={batch_size:<3} all throttled: requests={client.calls} for {batches} batches  {elapsed:5.2f}s")
+    assert client.calls <= batches * 2, client.calls
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Model calls on a rerun with the generation cache
+
+    python -m benchmarks.bench_cache
+"""
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from src import clients, graph
+from src.email_cache import get_generation_cache
+from .stubs import StubBedrockClient, make_customers
+
+CUSTOMERS = 500
+CHANGED = 25
+
+
+def run(customers):
+    client = StubBedrockClient(latency=0.005)
+    clients.set_client('bedrock-agent-runtime', client)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        graph.create_emails({"customers": customers})
+    return client.calls, time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['GENERATION_CACHE_PATH'] = os.path.join(directory, 'generations.sqlite')
+        customers = make_customers(CUSTOMERS)
+
+        calls, elapsed = run(customers)
+        print(f"  first run            {calls:>4} model calls  {elapsed:5.2f}s")
+
+        # A few customers changed favorite dish since the last campaign
+        for customer in customers[:CHANGED]:
+            customer['favorite_dish'] = 'Tiramisu'
+        calls, elapsed = run(customers)
+        print(f"  rerun, {CHANGED} changed    {calls:>4} model calls  {elapsed:5.2f}s")
+        print(f"  cache stats          {get_generation_cache().stats()}")
+        assert calls == CHANGED
+
+
+if __name__ == "__main__":
+    main()
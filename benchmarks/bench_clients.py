@@ -0,0 +1,34 @@
+"""
+Per-email client overhead: a new boto3 client per call vs the shared registry
+
+    python -m benchmarks.bench_clients
+"""
+import time
+
+import boto3
+
+from src import clients
+
+CALLS = 200
+
+
+def timed(label: str, fn) -> float:
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        fn()
+    per_call = (time.perf_counter() - start) / CALLS
+    print(f"  {label:<40} {per_call * 1e6:9.0f} us/email")
+    return per_call
+
+
+def main():
+    print(f"{CALLS} emails, client setup cost only (no network)")
+    for service in ('ses', 'bedrock-agent-runtime', 's3'):
+        before = timed(f"boto3.client('{service}')", lambda: boto3.client(service, region_name='us-east-1'))
+        clients.reset_clients()
+        after = timed(f"get_client('{service}')", lambda: clients.get_client(service, 'us-east-1'))
+        print(f"  {'':<40} x{before / after:,.0f} less overhead")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Reading generated emails: whole answer then json.loads vs validating the stream as it arrives
+
+    python -m benchmarks.bench_completion
+"""
+import contextlib
+import io
+import json
+import os
+import time
+
+from src import clients, graph, metrics
+from src.completion import completion_text
+from .stubs import StubBedrockClient, make_customers
+
+CUSTOMERS = 300
+CHUNK_LATENCY = 0.002
+MALFORMED_RATE = 0.3
+
+
+def read_whole(completion) -> dict:
+    """The old behaviour: wait for the full answer, then parse it"""
+    return json.loads(completion_text(completion))
+
+
+def run(read) -> tuple:
+    stub = StubBedrockClient(latency=0.01, chunk_latency=CHUNK_LATENCY, malformed_rate=MALFORMED_RATE)
+    clients.set_client('bedrock-agent-runtime', stub)
+    metrics.reset_metrics()
+    os.environ['GENERATION_CONCURRENCY'] = '8'
+
+    original = graph.read_email_completion
+    if read is not None:
+        graph.read_email_completion = read
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            graph.create_emails({"customers": make_customers(CUSTOMERS)})
+        elapsed = time.perf_counter() - start
+    finally:
+        graph.read_email_completion = original
+
+    report = metrics.get_metrics().report()
+    return elapsed, stub.chunks, report['calls']['bedrock.invoke_inline_agent'], report['counters']
+
+
+def main():
+    print(f"{CUSTOMERS} customers, {CHUNK_LATENCY * 1000:g} ms per 16-byte chunk, {MALFORMED_RATE:.0%} of answers malformed")
+    for label, read in (('whole answer + json.loads', read_whole), ('streaming validation', None)):
+        elapsed, chunks, call, counters = run(read)
+        print(f"  {label:<28} {elapsed:6.2f}s  {chunks:>6} chunks streamed  "
+              f"p50 {call['p50_ms']:6.1f} ms  p95 {call['p95_ms']:6.1f} ms  "
+              f"rejected {counters.get('generation.rejected', 0):>3}  fallbacks {counters.get('generation.fallbacks', 0):>3}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Benchmark create_emails against a stub Bedrock client with injected latency
+
+    python -m benchmarks.bench_generation
+"""
+import contextlib
+import io
+import os
+import time
+
+from src import clients, graph
+from .stubs import StubBedrockClient, make_customers
+
+CUSTOMERS = 200
+LATENCY = 0.05
+
+
+def run(concurrency: int) -> float:
+    os.environ['GENERATION_CONCURRENCY'] = str(concurrency)
+    clients.set_client('bedrock-agent-runtime', StubBedrockClient(latency=LATENCY))
+    customers = make_customers(CUSTOMERS)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = graph.create_emails({"customers": customers})
+    elapsed = time.perf_counter() - start
+
+    assert [e["to"] for e in result["emails_to_send"]] == [c["email"] for c in customers]
+    return elapsed
+
+
+def main():
+    print(f"{CUSTOMERS} customers, {LATENCY * 1000:.0f} ms per model call")
+    baseline = None
+    for concurrency in (1, 4, 16, 32):
+        elapsed = run(concurrency)
+        baseline = baseline or elapsed
+        print(f"  workers={concurrency:<3} {elapsed:6.2f}s  speedup x{baseline / elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Daily reruns: full campaign vs incremental mode with a small share of changed customers
+
+    python -m benchmarks.bench_incremental
+"""
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from src import clients, graph, incremental
+from .stubs import StubBedrockClient, StubS3Client, make_customers
+
+CUSTOMERS = 20_000
+CHURN = 0.02
+
+
+def run_day(customers: list, incremental_db: str):
+    if incremental_db:
+        os.environ['INCREMENTAL_DB'] = incremental_db
+    else:
+        os.environ.pop('INCREMENTAL_DB', None)
+    incremental.reset_contact_index()
+    bedrock = StubBedrockClient(latency=0.002)
+    clients.set_client('bedrock-agent-runtime', bedrock)
+    clients.set_client('s3', StubS3Client({'customers.json': json.dumps(customers).encode()}))
+
+    app = graph.create_email_graph()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = app.invoke({"customers": [], "emails_to_send": [], "results": []})
+    return time.perf_counter() - start, bedrock.calls, len(result["results"]), result["stats"].get("incremental")
+
+
+def main():
+    os.environ['CUSTOMERS_KEY'] = 'customers.json'
+    os.environ['EMAIL_BACKEND'] = 'mock'
+    os.environ['GENERATION_CONCURRENCY'] = '8'
+    os.environ['CUSTOMER_STREAMING'] = 'false'
+
+    day1 = make_customers(CUSTOMERS)
+    day2 = [dict(c) for c in day1]
+    for c in day2[::int(1 / CHURN)]:
+        c['favorite_dish'] = 'Tiramisu'
+    day2 += make_customers(CUSTOMERS + 100)[CUSTOMERS:]
+
+    print(f"{CUSTOMERS} customers; day 2 changes {CHURN:.0%} and adds 100")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'contacts.sqlite')
+        for label, customers, index_db in (
+            ('day 1, full run', day1, ''),
+            ('day 2, full run', day2, ''),
+            ('day 1, incremental (seeds index)', day1, db),
+            ('day 2, incremental', day2, db)
+        ):
+            elapsed, calls, sent, stats = run_day(customers, index_db)
+            print(f"  {label:<34} {elapsed:6.2f}s  {calls:>6} model calls  {sent:>6} sent  {stats or ''}")
+
+
+if __name__ == "__main__":
+    main()
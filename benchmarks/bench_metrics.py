@@ -0,0 +1,62 @@
+"""
+Instrumentation overhead per call, and the report for a stubbed campaign
+
+    python -m benchmarks.bench_metrics
+"""
+import contextlib
+import json
+import os
+import time
+
+from src import clients, graph, metrics
+from .stubs import StubBedrockClient, StubS3Client, customers_jsonl
+
+CALLS = 200_000
+
+
+def overhead():
+    registry = metrics.Metrics()
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        pass
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        with registry.timer('bench'):
+            pass
+    timed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        registry.inc('bench.count')
+    counted = time.perf_counter() - start
+
+    print(f"Overhead over {CALLS} calls")
+    print(f"  timer  {(timed - baseline) / CALLS * 1e6:6.2f} us/call")
+    print(f"  inc    {(counted - baseline) / CALLS * 1e6:6.2f} us/call")
+
+
+def campaign(count: int = 2000):
+    os.environ['CUSTOMER_STREAMING'] = 'true'
+    os.environ['CUSTOMERS_KEY'] = 'customers.jsonl'
+    os.environ['EMAIL_BACKEND'] = 'mock'
+    os.environ['GENERATION_CONCURRENCY'] = '8'
+    clients.set_client('s3', StubS3Client({'customers.jsonl': customers_jsonl(count)}))
+    clients.set_client('bedrock-agent-runtime', StubBedrockClient(latency=0.01, error_rate=0.02))
+
+    metrics.reset_metrics()
+    app = graph.create_email_graph()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        app.invoke({"customers": [], "emails_to_send": [], "results": []})
+    print(f"Report for {count} customers (10 ms generation, 2% errors)")
+    print(json.dumps(metrics.get_metrics().report(), indent=2))
+
+
+def main():
+    overhead()
+    campaign()
+
+
+if __name__ == "__main__":
+    main()
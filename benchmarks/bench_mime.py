@@ -0,0 +1,64 @@
+"""
+Messages built per second: a MIMEMultipart tree per email vs the precompiled MessageBuilder
+
+    python -m benchmarks.bench_mime [messages]
+"""
+import copy
+import io
+import sys
+import time
+from email.generator import BytesGenerator
+from email.utils import getaddresses
+
+from src.mime import MessageBuilder, make_boundary, mime_message
+from src.renderer import render_emails
+from .stubs import make_customers
+
+SENDER = 'Your Carbonara Is Waiting <noreply@restaurant.com>'
+
+
+def email_package(draft, boundary=None) -> bytes:
+    """What send_email did per message: build the tree, then smtplib.send_message's flatten"""
+    msg = mime_message(SENDER, draft.to, draft.subject, draft.body)
+    if boundary is not None:
+        msg.set_boundary(boundary)
+    getaddresses(msg.get_all('To', []))
+    msg_copy = copy.copy(msg)
+    del msg_copy['Bcc']
+    del msg_copy['Resent-Bcc']
+    with io.BytesIO() as data:
+        BytesGenerator(data).flatten(msg_copy, linesep='\r\n')
+        return data.getvalue()
+
+
+def rate(label: str, build, drafts) -> float:
+    start = time.perf_counter()
+    for draft in drafts:
+        build(draft)
+    per_second = len(drafts) / (time.perf_counter() - start)
+    print(f"  {label:<22} {per_second:10,.0f} msg/s")
+    return per_second
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    # Rule-based drafts: ASCII bodies, and an emoji subject for the loyal segment
+    drafts = render_emails(make_customers(count))
+    # Non-ASCII bodies go out as base64 UTF-8
+    for draft in drafts[::7]:
+        draft.body += "\n\nBuon appetito — à bientôt! 🍝"
+    builder = MessageBuilder(SENDER)
+    print(f"{count:,} rendered drafts")
+
+    for draft in drafts[:2000]:
+        boundary = make_boundary()
+        assert builder.build(draft.to, draft.subject, draft.body, boundary) == email_package(draft, boundary), draft
+    print("  byte-identical to the email package on 2,000 drafts")
+
+    before = rate("MIME tree + flatten", email_package, drafts)
+    after = rate("MessageBuilder", lambda d: builder.build(d.to, d.subject, d.body), drafts)
+    print(f"  x{after / before:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Sending through a slow, failing SES: direct sends vs the durable outbox
+
+    python -m benchmarks.bench_outbox
+"""
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from src import clients, graph, metrics, outbox, ses_sender
+from .stubs import StubBedrockClient, StubSESClient, make_customers
+
+CUSTOMERS = 2000
+OUTAGE = 3.0
+
+
+class TimedBedrockClient(StubBedrockClient):
+    """Records when the last model call returned, i.e. when generation finished"""
+
+    finished = 0.0
+
+    def invoke_inline_agent(self, **kwargs):
+        response = super().invoke_inline_agent(**kwargs)
+        self.finished = time.perf_counter()
+        return response
+
+
+def run(outbox_db: str):
+    if outbox_db:
+        os.environ['OUTBOX_DB'] = outbox_db
+    else:
+        os.environ.pop('OUTBOX_DB', None)
+    outbox.reset_outbox()
+    metrics.reset_metrics()
+    bedrock = TimedBedrockClient(latency=0.005)
+    ses = StubSESClient(max_send_rate=10_000, latency=0.02, outage=OUTAGE)
+    clients.set_client('bedrock-agent-runtime', bedrock)
+    ses_sender._sender = ses_sender.SESSender(client=ses, rate=10_000)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = graph.send_emails({"emails_to_send": graph.create_emails({"customers": make_customers(CUSTOMERS)})["emails_to_send"]})
+    elapsed = time.perf_counter() - start
+    return elapsed, bedrock.finished - start, ses.sent, bedrock.calls, result["results"][-1]
+
+
+def main():
+    os.environ.update({
+        'EMAIL_BACKEND': 'ses',
+        'GENERATION_CONCURRENCY': '8',
+        'SEND_CONCURRENCY': '4',
+        'PIPELINE_DEPTH': '64',
+        'OUTBOX_RETRY_BASE': '0.5',
+        'OUTBOX_DRAIN_TIMEOUT': '60'
+    })
+
+    print(f"{CUSTOMERS} customers, pipelined; SES takes 20 ms per send and is down for the first {OUTAGE:g}s")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, db in (('direct sends', ''), ('outbox', os.path.join(tmp, 'outbox.sqlite'))):
+            elapsed, generated_at, delivered, calls, summary = run(db)
+            print(f"  {label:<14} generation done {generated_at:5.2f}s  total {elapsed:5.2f}s  "
+                  f"{delivered:>5} delivered  {calls:>5} model calls  ({summary})")
+
+
+if __name__ == "__main__":
+    main()
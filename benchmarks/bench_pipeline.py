@@ -0,0 +1,65 @@
+"""
+Time to first send and total wall-clock: barrier stages vs pipelined stages
+
+    python -m benchmarks.bench_pipeline
+
+Also prints the work each stage.* timer was charged, which should match
+the stub latencies whether or not the stages overlap.
+"""
+import contextlib
+import io
+import os
+import time
+
+from src import clients, graph, metrics
+from .stubs import StubBedrockClient, StubS3Client, customers_jsonl
+
+CUSTOMERS = 1000
+MODEL_LATENCY = 0.02
+SEND_LATENCY = 0.005
+
+
+def run(env: dict):
+    os.environ.update(env)
+    objects = {'customers.json': b'[' + customers_jsonl(CUSTOMERS).replace(b'}\n{', b'},{') + b']'}
+    clients.set_client('s3', StubS3Client(objects))
+    clients.set_client('bedrock-agent-runtime', StubBedrockClient(latency=MODEL_LATENCY))
+
+    sends = []
+
+    def send_email(**kwargs):
+        time.sleep(SEND_LATENCY)
+        sends.append(time.perf_counter())
+        return f"Email sent to {kwargs['customer_name']}"
+
+    graph.send_email = send_email
+    app = graph.create_email_graph()
+    metrics.reset_metrics()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.invoke({"customers": [], "emails_to_send": [], "results": []})
+    elapsed = time.perf_counter() - start
+
+    assert len(sends) == CUSTOMERS
+    calls = metrics.get_metrics().report()['calls']
+    stages = {name[len('stage.'):]: call['mean_ms'] * call['count'] / 1000 for name, call in calls.items() if name.startswith('stage.')}
+    return sends[0] - start, elapsed, stages
+
+
+def main():
+    print(f"{CUSTOMERS} customers, {MODEL_LATENCY * 1000:.0f} ms generation, {SEND_LATENCY * 1000:.0f} ms send")
+    common = {'GENERATION_CONCURRENCY': '8', 'SEND_CONCURRENCY': '2'}
+    modes = (
+        ("barrier", {'CUSTOMER_STREAMING': 'false', 'PIPELINE_DEPTH': '0'}),
+        ("streaming", {'CUSTOMER_STREAMING': 'true', 'PIPELINE_DEPTH': '0'}),
+        ("pipelined", {'CUSTOMER_STREAMING': 'false', 'PIPELINE_DEPTH': '64'})
+    )
+    for label, env in modes:
+        first, total, stages = run({**common, **env})
+        work = '  '.join(f"{name.split('_')[0]} {seconds:5.2f}s" for name, seconds in stages.items())
+        print(f"  {label:<10} first send {first:6.3f}s  total {total:6.2f}s  stage work: {work}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Per-customer memory and state-transition overhead: dicts and strings vs slotted records
+
+    python -m benchmarks.bench_records
+    python -m benchmarks.bench_records --customers 100000 --checkpoint
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from src import graph
+from src.records import Customer, SendResult
+from .stubs import make_customers
+
+
+def traced(build):
+    """(result, bytes still allocated, seconds) for build()"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def dict_customers(data: bytes) -> list:
+    return json.loads(data)
+
+
+def record_customers(data: bytes) -> list:
+    customers = json.loads(data)
+    for i, customer in enumerate(customers):
+        customers[i] = Customer.from_dict(customer)
+    return customers
+
+
+def sent_text(email) -> str:
+    # What the SMTP backend returns for a delivered email
+    return f"Email sent to {email['name']} via SMTP"
+
+
+def transition(customers: list, emails: list, results: list, checkpoint: bool):
+    """Run a four-node graph with the campaign's state shape that only hands the lists on"""
+    from langgraph.graph import StateGraph, END
+
+    workflow = StateGraph(graph.EmailState)
+    workflow.add_node("fetch_customers", lambda state: {"customers": customers})
+    workflow.add_node("target_customers", lambda state: {"customers": state["customers"]})
+    workflow.add_node("create_emails", lambda state: {"emails_to_send": emails})
+    workflow.add_node("send_emails", lambda state: {"results": results})
+    workflow.set_entry_point("fetch_customers")
+    workflow.add_edge("fetch_customers", "target_customers")
+    workflow.add_edge("target_customers", "create_emails")
+    workflow.add_edge("create_emails", "send_emails")
+    workflow.add_edge("send_emails", END)
+
+    checkpointer = None
+    if checkpoint:
+        from langgraph.checkpoint.memory import InMemorySaver
+        from src.checkpoint import RecordSerializer
+
+        checkpointer = InMemorySaver(serde=RecordSerializer())
+    app = workflow.compile(checkpointer=checkpointer)
+    config = {"configurable": {"thread_id": "bench"}}
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    app.invoke({"customers": [], "emails_to_send": [], "results": []}, config)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--customers', type=int, default=1_000_000)
+    parser.add_argument('--checkpoint', action='store_true', help='also time state transitions through a checkpointer')
+    args = parser.parse_args()
+    count = args.customers
+
+    data = json.dumps(make_customers(count)).encode()
+    print(f"{count:,} customers ({len(data) / 2**20:.0f} MiB of customers.json)")
+
+    print(f"\n  {'per customer':<16} {'dicts/str':>10} {'records':>10} {'saved':>7}")
+    before, before_size, before_s = traced(lambda: dict_customers(data))
+    after, after_size, after_s = traced(lambda: record_customers(data))
+    rows = [('customer', before_size, after_size)]
+
+    def dict_drafts():
+        return [dict(graph.fallback_email(customer)) for customer in before]
+
+    before_drafts, size, _ = traced(dict_drafts)
+    after_drafts, after_drafts_size, _ = traced(lambda: [graph.fallback_email(customer) for customer in after])
+    rows.append(('draft', size, after_drafts_size))
+
+    before_results, size, _ = traced(lambda: [sent_text(email) for email in before_drafts])
+    after_results, after_results_size, _ = traced(
+        lambda: [SendResult.parse(sent_text(email), email['name']) for email in after_drafts]
+    )
+    rows.append(('result', size, after_results_size))
+
+    for name, old, new in rows:
+        print(f"  {name:<16} {old / count:8.0f} B {new / count:8.0f} B {1 - new / old:6.0%}")
+    total_old = sum(row[1] for row in rows)
+    total_new = sum(row[2] for row in rows)
+    print(f"  {'state total':<16} {total_old / 2**20:6.0f} MiB {total_new / 2**20:6.0f} MiB {1 - total_new / total_old:6.0%}")
+    print(f"  loading: {before_s:.2f}s as dicts, {after_s:.2f}s as records")
+
+    modes = [False, True] if args.checkpoint else [False]
+    for checkpoint in modes:
+        label = 'checkpointed' if checkpoint else 'in memory'
+        print(f"\n  state transitions, {label}")
+        for name, state in (('dicts/str', (before, before_drafts, before_results)),
+                            ('records', (after, after_drafts, after_results))):
+            elapsed, peak, current = transition(*state, checkpoint)
+            print(f"  {name:<16} {elapsed:7.2f}s  peak +{peak / 2**20:7.1f} MiB  retained +{current / 2**20:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Rule-based rendering: lambda_handler per customer vs the batch renderer
+
+    python -m benchmarks.bench_renderer [rows]
+"""
+import json
+import sys
+import time
+
+from src.lambda_agent import lambda_handler
+from src.renderer import render_columns, to_columns
+from .stubs import make_customers
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    customers = make_customers(rows)
+    columns = to_columns(customers)
+    print(f"{rows} customers")
+
+    sample = customers[:50_000]
+    start = time.perf_counter()
+    for customer in sample:
+        lambda_handler({'inputText': json.dumps({'customer': customer})}, None)
+    per_customer = (time.perf_counter() - start) / len(sample)
+    print(f"  lambda_handler per customer  {per_customer * rows:6.2f}s (extrapolated from {len(sample)})")
+
+    start = time.perf_counter()
+    rendered = render_columns(columns)
+    print(f"  render_columns               {time.perf_counter() - start:6.2f}s")
+    assert len(rendered['body']) == rows
+
+
+if __name__ == "__main__":
+    main()
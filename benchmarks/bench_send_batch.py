@@ -0,0 +1,40 @@
+"""
+AgentCore sending: one agent invocation per email vs send_batch
+
+    python -m benchmarks.bench_send_batch
+"""
+import os
+import time
+
+from src import clients, graph
+from .stubs import StubEmailAgentClient, make_customers
+
+EMAILS = 300
+
+
+def run(batch_size: int):
+    os.environ.update({'EMAIL_BACKEND': 'agentcore', 'EMAIL_BATCH_SIZE': str(batch_size), 'SEND_CONCURRENCY': '4'})
+    client = StubEmailAgentClient()
+    clients.set_client('bedrock-agent-runtime', client)
+    emails = [
+        {"to": c["email"], "name": c["name"], "subject": "We miss you!", "body": "Come back for 20% off!"}
+        for c in make_customers(EMAILS)
+    ]
+
+    start = time.perf_counter()
+    results = graph.send_emails({"emails_to_send": emails})["results"]
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == EMAILS and all(graph.sent_ok(r) for r in results)
+    return client.calls, elapsed
+
+
+def main():
+    print(f"{EMAILS} emails, 4 senders, 50 ms per agent invocation")
+    for batch_size in (1, 10, 50):
+        calls, elapsed = run(batch_size)
+        print(f"  EMAIL_BATCH_SIZE={batch_size:<3} invocations={calls:<4} {elapsed:5.2f}s")
+
+
+if __name__ == "__main__":
+    main()
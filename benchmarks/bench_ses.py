@@ -0,0 +1,71 @@
+"""
+SES sending at MaxSendRate: naive thread pool vs the paced SESSender
+
+    python -m benchmarks.bench_ses
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.ses_sender import SESSender
+from .stubs import StubSESClient
+
+MESSAGES = 300
+MAX_SEND_RATE = 100
+WORKERS = 16
+
+
+def messages():
+    return [
+        {'to_email': f'customer{i}@example.com', 'subject': 'We miss you!', 'body': 'Come back for 20% off!'}
+        for i in range(MESSAGES)
+    ]
+
+
+def naive(client: StubSESClient):
+    def send_one(message):
+        try:
+            client.send_email(
+                Source='noreply@restaurant.com',
+                Destination={'ToAddresses': [message['to_email']]},
+                Message={'Subject': {'Data': message['subject']}, 'Body': {'Text': {'Data': message['body']}}}
+            )
+        except Exception:
+            pass
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        list(pool.map(send_one, messages()))
+
+
+def paced(client: StubSESClient):
+    results = SESSender(client=client, max_workers=WORKERS).send_many(messages())
+    assert all(r['success'] for r in results)
+
+
+def raised_quota():
+    """AWS doubles MaxSendRate mid-run; the sender picks it up on its next refresh"""
+    client = StubSESClient(max_send_rate=MAX_SEND_RATE)
+    sender = SESSender(client=client, max_workers=WORKERS, refresh_interval=0.5)
+    sender.send_many(messages())
+    client.max_send_rate = MAX_SEND_RATE * 2
+    time.sleep(0.5)
+    start = time.perf_counter()
+    results = sender.send_many(messages())
+    elapsed = time.perf_counter() - start
+    assert all(r['success'] for r in results)
+    assert sender.bucket.rate == MAX_SEND_RATE * 2, sender.bucket.rate
+    print(f"  {'quota raised':<14} rate {sender.bucket.rate:g}/s after refresh  {MESSAGES / elapsed:6.0f} msg/s")
+
+
+def main():
+    print(f"{MESSAGES} messages, MaxSendRate {MAX_SEND_RATE}/s, {WORKERS} workers")
+    for label, run in (("unpaced pool", naive), ("SESSender", paced)):
+        client = StubSESClient(max_send_rate=MAX_SEND_RATE)
+        start = time.perf_counter()
+        run(client)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<14} sent={client.sent:<4} throttled={client.throttled:<4} {client.sent / elapsed:6.0f} msg/s")
+    raised_quota()
+
+
+if __name__ == "__main__":
+    main()
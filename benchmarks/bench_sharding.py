@@ -0,0 +1,51 @@
+"""
+One graph in one process vs the campaign sharded over a process pool
+
+    python -m benchmarks.bench_sharding
+"""
+import contextlib
+import os
+import sys
+import time
+
+from src import clients, runner
+from src.records import ResultCode
+from .stubs import StubBedrockClient, StubS3Client, customers_jsonl
+
+COUNT = 2000
+LATENCY = 0.005
+
+
+def install_stubs(count: int, quiet: bool = True):
+    """Stub S3 and Bedrock in this process (also the worker initializer)"""
+    os.environ['CUSTOMERS_KEY'] = 'customers.jsonl'
+    os.environ['CUSTOMER_STREAMING'] = 'true'
+    os.environ['EMAIL_BACKEND'] = 'mock'
+    clients.set_client('s3', StubS3Client({'customers.jsonl': customers_jsonl(count)}))
+    clients.set_client('bedrock-agent-runtime', StubBedrockClient(latency=LATENCY))
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+
+
+def main():
+    print(f"{COUNT} customers, {LATENCY * 1000:.0f} ms generation, {os.cpu_count()} CPUs")
+    install_stubs(COUNT, quiet=False)
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        result = runner.run_campaign()
+    single = time.perf_counter() - start
+    print(f"  {'1 process':<12} {single:6.2f}s  {result['results'][-1]}")
+
+    for shards in (2, 4, 8):
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = runner.run_sharded(shards, shards, initializer=install_stubs, initargs=(COUNT,))
+        elapsed = time.perf_counter() - start
+        sent = [str(r) for r in result['results'] if r.code is ResultCode.SUMMARY]
+        total = sum(int(r.split()[1]) for r in sent)
+        print(f"  {f'{shards} shards':<12} {elapsed:6.2f}s  sent {total} across {len(sent)} shards  x{single / elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Messages per second: connect-per-message SMTP vs the pooled transport
+
+    python -m benchmarks.bench_smtp
+"""
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from src.smtp_pool import SMTPPool
+from .stubs import SMTPSink
+
+MESSAGES = 300
+CONNECT_DELAY = 0.02  # stands in for TCP connect + STARTTLS + login
+WORKERS = 4
+
+
+def build_message(i: int) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg['From'] = 'noreply@restaurant.com'
+    msg['To'] = f'customer{i}@example.com'
+    msg['Subject'] = 'We miss you!'
+    msg.attach(MIMEText('Come back for 20% off!', 'plain'))
+    return msg
+
+
+def connect_per_message(sink: SMTPSink, i: int):
+    with smtplib.SMTP(sink.host, sink.port) as server:
+        server.send_message(build_message(i))
+
+
+def timed(label: str, send):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        list(pool.map(send, range(MESSAGES)))
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<22} {MESSAGES / elapsed:8.0f} msg/s")
+
+
+def main():
+    print(f"{MESSAGES} messages, {WORKERS} senders, {CONNECT_DELAY * 1000:.0f} ms connection setup")
+
+    with SMTPSink(connect_delay=CONNECT_DELAY) as sink:
+        timed("connect per message", lambda i: connect_per_message(sink, i))
+
+        pool = SMTPPool(sink.host, sink.port, size=WORKERS, max_messages=100, starttls=False)
+        timed("pooled sessions", lambda i: pool.send_message(build_message(i)))
+        pool.close()
+
+    # Server closes each session with 421 after 25 messages; the pool must reconnect
+    with SMTPSink(connect_delay=CONNECT_DELAY, drop_after=25) as sink:
+        pool = SMTPPool(sink.host, sink.port, size=WORKERS, max_messages=1000, starttls=False)
+        timed("pooled, 421 every 25", lambda i: pool.send_message(build_message(i)))
+        pool.close()
+        assert sink.messages == MESSAGES, sink.messages
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Customer load time: customers.json vs a cached, memory-mapped Arrow snapshot
+
+    python -m benchmarks.bench_snapshot [rows]
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from src import clients, snapshot, tools
+from .stubs import StubS3Client, make_customers
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn()
+    print(f"  {label:<34} {time.perf_counter() - start:7.2f}s")
+    return result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    data = json.dumps(make_customers(rows)).encode()
+    s3 = StubS3Client({'customers.json': data})
+    clients.set_client('s3', s3)
+    print(f"{rows} customers, {len(data) / 2**20:.0f} MiB of JSON")
+
+    with tempfile.TemporaryDirectory() as cache:
+        os.environ['CUSTOMER_CACHE_DIR'] = cache
+
+        timed("json.loads (current path)", lambda: tools.read_customers_from_s3())
+        timed("snapshot, cold cache", lambda: snapshot.fetch_snapshot('customers.json'))
+        table = timed("snapshot, warm cache (mmap table)", lambda: snapshot.load_snapshot(
+            snapshot.fetch_snapshot('customers.json')))
+        timed("snapshot, warm cache (to dicts)", lambda: snapshot.read_customers_from_snapshot('customers.json'))
+
+        assert table.num_rows == rows
+        assert s3.gets == 2, s3.gets  # one for json.loads, one for the cold cache
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Cold-start import cost of the campaign entry point, measured with python -X importtime
+
+Fails (exit code 1) if a heavy dependency is loaded at import time again.
+
+    python -m benchmarks.bench_startup
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only load on first use
+HEAVY = ['boto3', 'botocore', 'langgraph', 'numpy', 'pyarrow', 'smtplib', 'aiosmtplib']
+
+# Per backend: what importing and resolving the send path is allowed to load
+BACKENDS = {
+    'mock': [],
+    'ses': ['boto3'],
+    'smtp': ['smtplib']
+}
+
+BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', '300'))
+
+
+def import_time_ms(module: str) -> float:
+    """Cumulative import time of `module` in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    for line in reversed(result.stderr.splitlines()):
+        fields = [f.strip() for f in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1000
+    raise RuntimeError(f"No importtime entry for {module}")
+
+
+def loaded_modules(code: str, env: dict) -> list:
+    """Heavy modules present in sys.modules after running `code` in a fresh interpreter"""
+    probe = code + f"\nimport sys; print('loaded:', *(m for m in {HEAVY!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, '-c', probe],
+        cwd=ROOT, capture_output=True, text=True, check=True, env={**os.environ, **env}
+    )
+    return result.stdout.splitlines()[-1].split()[1:]
+
+
+def main():
+    failures = []
+
+    print("Cumulative import time (fresh interpreter)")
+    for module in ('src.graph', 'main'):
+        ms = import_time_ms(module)
+        print(f"  import {module:<12} {ms:8.1f} ms")
+        if ms > BUDGET_MS:
+            failures.append(f"import {module} took {ms:.0f} ms (budget {BUDGET_MS:.0f} ms)")
+
+    loaded = loaded_modules('import main', {})
+    print(f"  heavy modules after import main: {', '.join(loaded) or 'none'}")
+    if loaded:
+        failures.append(f"import main loaded {', '.join(loaded)}")
+
+    print("Modules loaded when resolving each EMAIL_BACKEND")
+    for backend, allowed in BACKENDS.items():
+        # A send to an unreachable host still walks the whole import path of the backend
+        code = (
+            "from src import tools\n"
+            "try:\n"
+            "    tools.send_email('a@example.com', 'hi', 'body', 'Bench')\n"
+            "except Exception:\n"
+            "    pass"
+        )
+        env = {
+            'EMAIL_BACKEND': backend,
+            'SMTP_SERVER': '127.0.0.1',
+            'SMTP_PORT': '9',
+            'SMTP_PASSWORD': 'bench',
+            'AWS_ACCESS_KEY_ID': 'bench',
+            'AWS_SECRET_ACCESS_KEY': 'bench',
+            'AWS_ENDPOINT_URL': 'http://127.0.0.1:9',
+            'AWS_MAX_ATTEMPTS': '1'
+        }
+        loaded = loaded_modules(code, env)
+        unexpected = [m for m in loaded if m not in allowed and not (m == 'botocore' and 'boto3' in allowed)]
+        print(f"  {backend:<6} {', '.join(loaded) or 'none'}")
+        if unexpected:
+            failures.append(f"EMAIL_BACKEND={backend} loaded {', '.join(unexpected)}")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
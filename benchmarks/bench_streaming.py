@@ -0,0 +1,47 @@
+"""
+Peak traced memory of a full graph run: whole-file JSON vs streaming windows
+
+    python -m benchmarks.bench_streaming
+"""
+import contextlib
+import os
+import time
+import tracemalloc
+
+from src import clients, graph
+from .stubs import StubBedrockClient, StubS3Client, customers_jsonl
+
+
+def run(count: int, streaming: bool):
+    os.environ['CUSTOMER_STREAMING'] = 'true' if streaming else 'false'
+    os.environ['CUSTOMERS_KEY'] = 'customers.jsonl'
+    os.environ['EMAIL_BACKEND'] = 'mock'
+    data = customers_jsonl(count)
+
+    # Whole-file mode needs a JSON array; streaming accepts either
+    objects = {'customers.jsonl': data if streaming else b'[' + data.replace(b'}\n{', b'},{') + b']'}
+    clients.set_client('s3', StubS3Client(objects))
+    clients.set_client('bedrock-agent-runtime', StubBedrockClient(latency=0))
+    del data
+
+    app = graph.create_email_graph()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        result = app.invoke({"customers": [], "emails_to_send": [], "results": []})
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    for count in (3, 10_000, 50_000):
+        for streaming in (False, True):
+            elapsed, peak, _ = run(count, streaming)
+            mode = "streaming" if streaming else "whole file"
+            print(f"  {count:>8} customers  {mode:<10} {elapsed:6.2f}s  peak {peak / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
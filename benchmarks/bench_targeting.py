@@ -0,0 +1,101 @@
+"""
+Targeting before generation: segment/recency masks, suppression, dedup and frequency caps
+
+    python -m benchmarks.bench_targeting
+    python -m benchmarks.bench_targeting --customers 5000000 --suppressed 5000000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from src import targeting
+from src.targeting import HashSet, Targeting, load_suppression
+from .stubs import iter_customers
+
+
+def customers_with_repeats(count: int, repeat_every: int = 10):
+    """Synthetic customers where every `repeat_every`-th row reuses an earlier row's address"""
+    for i, customer in enumerate(iter_customers(count)):
+        if i % repeat_every == repeat_every - 1:
+            customer['email'] = f"customer{i // 2}@example.com"
+        yield customer
+
+
+def write_suppression(path: str, count: int):
+    # Every other suppressed address is a customer; the rest are unrelated bounces
+    with open(path, 'w') as f:
+        f.write("# unsubscribes and bounces\n")
+        for i in range(count):
+            f.write(f"customer{2 * i}@example.com\n" if i % 2 else f"bounce{i}@elsewhere.org,hard bounce\n")
+
+
+def python_set_filter(customers, suppressed: set, segments: set, max_days: int):
+    seen = set()
+    for customer in customers:
+        if customer['segment'] not in segments or customer['days_since_visit'] > max_days:
+            continue
+        address = customer['email'].strip().lower()
+        if address in suppressed or address in seen:
+            continue
+        seen.add(address)
+        yield customer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--customers', type=int, default=1_000_000)
+    parser.add_argument('--suppressed', type=int, default=1_000_000)
+    parser.add_argument('--window', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'suppressed.txt')
+        write_suppression(path, args.suppressed)
+        print(f"{args.customers:,} customers (10% repeated addresses), {args.suppressed:,} suppressed addresses")
+
+        start = time.perf_counter()
+        hashes = load_suppression(path)
+        parsed = time.perf_counter() - start
+        start = time.perf_counter()
+        hashes = load_suppression(path)
+        cached = time.perf_counter() - start
+        suppressed = HashSet(hashes)
+        print(f"  suppression list  parse {parsed:.2f}s, cached load {cached:.3f}s, {suppressed.nbytes / 2**20:.1f} MiB")
+
+        start = time.perf_counter()
+        with open(path) as f:
+            addresses = {line.split(',', 1)[0].strip().lower() for line in f if '@' in line}
+        loaded = time.perf_counter() - start
+        tracemalloc.start()
+        with open(path) as f:
+            addresses = {line.split(',', 1)[0].strip().lower() for line in f if '@' in line}
+        python_mib = tracemalloc.get_traced_memory()[0] / 2**20
+        tracemalloc.stop()
+        print(f"  python set of str  load {loaded:.2f}s every run, {python_mib:.1f} MiB")
+
+        segments, max_days = {'re-engagement', 'loyal'}, 90
+        start = time.perf_counter()
+        kept = sum(1 for _ in python_set_filter(customers_with_repeats(args.customers), addresses, segments, max_days))
+        print(f"  per-row python filter  {time.perf_counter() - start:6.2f}s  {kept:,} eligible")
+
+        rules = Targeting(tuple(segments), None, max_days, suppressed, dedup=True)
+        start = time.perf_counter()
+        kept = sum(1 for _ in rules.iter_eligible(customers_with_repeats(args.customers), args.window))
+        elapsed = time.perf_counter() - start
+        print(f"  Targeting              {elapsed:6.2f}s  {kept:,} eligible  {args.customers / elapsed:,.0f} rows/s  {rules.stats()}")
+
+        # Frequency cap on top: the first run sends, the second finds everyone capped
+        history = targeting.SendHistory(os.path.join(tmp, 'frequency.sqlite'))
+        capped = Targeting(tuple(segments), None, max_days, suppressed, dedup=True, history=history, cap_count=1, cap_days=7)
+        sample = min(args.customers, 200_000)
+        history.record([c['email'] for c in capped.iter_eligible(customers_with_repeats(sample), args.window)])
+        start = time.perf_counter()
+        kept = sum(1 for _ in capped.iter_eligible(customers_with_repeats(sample), args.window))
+        elapsed = time.perf_counter() - start
+        print(f"  + frequency cap        {elapsed:6.2f}s  {kept:,} eligible of {sample:,}  {sample / elapsed:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Throttle the circuit breaker's half-open probe and check the breaker still closes
+
+    python -m benchmarks.check_breaker
+"""
+import contextlib
+import io
+import os
+import time
+
+from src import clients, graph, limiter
+
+COOLDOWN = 0.05
+
+
+class RecoveringBedrock:
+    """Down for `outage` calls, then throttles the next `throttles` calls, then answers"""
+
+    def __init__(self, outage: int, throttles: int):
+        self.outage = outage
+        self.throttles = throttles
+        self.calls = 0
+
+    def invoke_inline_agent(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.outage:
+            raise RuntimeError("ServiceUnavailableException: Service is unavailable")
+        if self.calls <= self.outage + self.throttles:
+            raise RuntimeError("ThrottlingException: Rate exceeded")
+        return {'completion': '{"subject": "Hi", "body": "Come back soon", "discount": "20"}'}
+
+
+def main():
+    os.environ.update({
+        'GENERATION_BREAKER_THRESHOLD': '0.5',
+        'GENERATION_BREAKER_WINDOW': '4',
+        'GENERATION_BREAKER_COOLDOWN': str(COOLDOWN),
+        'GENERATION_MAX_RETRIES': '2'
+    })
+    limiter.reset_generation_control()
+    stub = RecoveringBedrock(outage=4, throttles=1)
+    clients.set_client('bedrock-agent-runtime', stub)
+    breaker = limiter.get_generation_breaker()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(stub.outage):
+            with contextlib.suppress(RuntimeError):
+                graph.invoke_generation('check.outage')
+        assert breaker.state == 'open', breaker.state
+
+        time.sleep(COOLDOWN * 2)
+        # The half-open probe is throttled once, retried and answered
+        graph.invoke_generation('check.probe')
+        assert breaker.state == 'closed', breaker.state
+        for _ in range(10):
+            graph.invoke_generation('check.after')
+
+    print(f"  breaker opened after {stub.outage} failures, throttled probe retried, closed again; "
+          f"{stub.calls} calls to Bedrock")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
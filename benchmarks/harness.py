@@ -0,0 +1,237 @@
+"""
+End-to-end campaign benchmarks against local stand-ins
+
+create_email_graph runs unchanged; S3 and SES are served by moto, SMTP by a
+local sink and Bedrock by a stub with configurable latency and error rate.
+Each scenario runs in a fresh process and reports throughput, per-call
+latency percentiles and peak traced memory per stage. Results are appended
+to a JSON Lines history and compared with the previous run of the same
+scenario.
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.harness
+    python -m benchmarks.harness --sizes 3,1000,100000,1000000 --backends ses,smtp
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RESULTS = os.path.join(ROOT, 'benchmarks', 'results', 'history.jsonl')
+SENDER = 'noreply@restaurant.com'
+
+# Scenario fields that identify a run for regression comparison
+SCENARIO_KEYS = ('customers', 'backend', 'latency', 'error_rate', 'streaming', 'concurrency', 'ses_rate', 'memory')
+
+
+def _moto():
+    try:
+        from moto import mock_aws
+    except ImportError as e:
+        raise ImportError("The benchmark harness needs moto: pip install -r benchmarks/requirements.txt") from e
+    return mock_aws
+
+
+def run_scenario(scenario: dict) -> dict:
+    """Run one campaign in this process and return its measurements"""
+    mock_aws = _moto()
+
+    os.environ.update({
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'EMAIL_BACKEND': scenario['backend'],
+        'SENDER_EMAIL': SENDER,
+        'CUSTOMERS_KEY': 'customers.json',
+        'CUSTOMER_STREAMING': 'true' if scenario['streaming'] else 'false',
+        'GENERATION_CONCURRENCY': str(scenario['concurrency']),
+        'SEND_CONCURRENCY': str(scenario['concurrency']),
+        'SES_MAX_SEND_RATE': str(scenario['ses_rate']),
+        'SMTP_PASSWORD': 'benchmark',
+        'SMTP_STARTTLS': 'false',
+        'SMTP_POOL_SIZE': str(scenario['concurrency'])
+    })
+
+    from src import clients, graph, metrics, tools
+    from .stubs import SMTPSink, StubBedrockClient, customers_json
+
+    with mock_aws(), SMTPSink() as sink:
+        os.environ['SMTP_SERVER'] = sink.host
+        os.environ['SMTP_PORT'] = str(sink.port)
+
+        clients.reset_clients()
+        s3 = clients.get_client('s3')
+        s3.create_bucket(Bucket=tools.CUSTOMER_BUCKET)
+        s3.put_object(Bucket=tools.CUSTOMER_BUCKET, Key='customers.json', Body=customers_json(scenario['customers']))
+        clients.get_client('ses').verify_email_identity(EmailAddress=SENDER)
+        clients.set_client('bedrock-agent-runtime', StubBedrockClient(
+            latency=scenario['latency'], error_rate=scenario['error_rate']
+        ))
+
+        metrics.reset_metrics()
+        if scenario['memory']:
+            tracemalloc.start()
+
+        app = graph.create_email_graph()
+        stages = {}
+        results = []
+        start = last = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            # Node boundaries; with streaming the stages overlap and the
+            # memory shows up in the last stage to consume it (the stage.*
+            # timers follow the work itself)
+            for update in app.stream({"customers": [], "emails_to_send": [], "results": []}, stream_mode='updates'):
+                now = time.perf_counter()
+                for node, values in update.items():
+                    stage = {'seconds': round(now - last, 4)}
+                    if scenario['memory']:
+                        stage['peak_mib'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+                        tracemalloc.reset_peak()
+                    stages[node] = stage
+                    if node == 'send_emails':
+                        results = values['results']
+                last = now
+        elapsed = time.perf_counter() - start
+
+        if scenario['memory']:
+            tracemalloc.stop()
+        report = metrics.get_metrics().report()
+
+    sent = report['counters'].get('emails.sent', 0)
+    return {
+        'scenario': {key: scenario[key] for key in SCENARIO_KEYS},
+        'seconds': round(elapsed, 3),
+        'customers_per_second': round(scenario['customers'] / elapsed, 2),
+        'sent': sent,
+        'failed': report['counters'].get('emails.failed', 0),
+        'smtp_messages': sink.messages,
+        'results': len(results),
+        'stages': stages,
+        'calls': report['calls'],
+        'counters': report['counters'],
+        'maxrss_mib': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def run_isolated(scenario: dict) -> dict:
+    """Run a scenario in a fresh interpreter so singletons and peak RSS start clean"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_scenario, scenario).result()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return 'unknown'
+
+
+def load_history(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_run(history: list, scenario: dict):
+    for entry in reversed(history):
+        if entry['scenario'] == scenario:
+            return entry
+    return None
+
+
+def print_result(result: dict, previous, threshold: float) -> bool:
+    """Print one scenario; returns True if throughput regressed past `threshold`"""
+    s = result['scenario']
+    mode = 'streaming' if s['streaming'] else 'whole file'
+    print(f"\n{s['customers']:,} customers  {s['backend']}  {mode}  concurrency {s['concurrency']}  "
+          f"latency {s['latency'] * 1000:g} ms  errors {s['error_rate']:.0%}")
+    print(f"  total {result['seconds']:.2f}s  {result['customers_per_second']:,.0f} customers/s  "
+          f"sent {result['sent']:,}  failed {result['failed']:,}  max RSS {result['maxrss_mib']:,.0f} MiB")
+    for node, stage in result['stages'].items():
+        peak = f"  peak {stage['peak_mib']:8.1f} MiB" if 'peak_mib' in stage else ''
+        call = result['calls'].get(f"stage.{node}")
+        work = f"  work {call['mean_ms'] * call['count'] / 1000:8.2f}s" if call else ''
+        print(f"  stage {node:<18} {stage['seconds']:8.2f}s{work}{peak}")
+    for name, call in result['calls'].items():
+        if name.startswith('stage.'):
+            continue
+        print(f"  {name:<36} {call['count']:>9,}  {call['per_second']:>10,.0f}/s  "
+              f"p50 {call['p50_ms']:8.2f}  p95 {call['p95_ms']:8.2f}  p99 {call['p99_ms']:8.2f} ms")
+
+    if previous is None:
+        return False
+    change = result['customers_per_second'] / previous['customers_per_second'] - 1
+    regressed = change < -threshold
+    flag = '  REGRESSION' if regressed else ''
+    print(f"  vs {previous['commit']} ({previous['timestamp']}): {change:+.1%} throughput{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='3,1000,10000', help='comma-separated customer counts (3 to 1000000)')
+    parser.add_argument('--backends', default='mock,ses,smtp', help='comma-separated EMAIL_BACKEND values')
+    parser.add_argument('--latency', type=float, default=0.005, help='stub Bedrock latency per call in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.01, help='fraction of stub Bedrock calls that fail')
+    parser.add_argument('--concurrency', type=int, default=8, help='generation and send concurrency')
+    parser.add_argument('--streaming-from', type=int, default=100_000, help='stream customers from this size up')
+    parser.add_argument('--ses-rate', type=float, default=10_000, help='SES send rate the sender paces to')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc (it slows large runs)')
+    parser.add_argument('--results', default=DEFAULT_RESULTS, help='JSON Lines history file')
+    parser.add_argument('--no-save', action='store_true', help="don't append to the history")
+    parser.add_argument('--threshold', type=float, default=0.10, help='throughput drop reported as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit 1 if any scenario regressed')
+    args = parser.parse_args()
+
+    history = load_history(args.results)
+    commit = git_commit()
+    regressions = 0
+
+    for size in (int(s) for s in args.sizes.split(',')):
+        for backend in args.backends.split(','):
+            scenario = {
+                'customers': size,
+                'backend': backend,
+                'latency': args.latency,
+                'error_rate': args.error_rate,
+                'streaming': size >= args.streaming_from,
+                'concurrency': args.concurrency,
+                'ses_rate': args.ses_rate,
+                'memory': not args.no_memory
+            }
+            result = run_isolated(scenario)
+            result.update({
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'commit': commit,
+                'python': platform.python_version(),
+                'cpus': os.cpu_count()
+            })
+            if print_result(result, previous_run(history, result['scenario']), args.threshold):
+                regressions += 1
+
+            if not args.no_save:
+                os.makedirs(os.path.dirname(args.results), exist_ok=True)
+                with open(args.results, 'a') as f:
+                    f.write(json.dumps(result) + '\n')
+
+    if not args.no_save:
+        print(f"\nResults appended to {args.results}")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Local stand-ins for AWS services used by the benchmarks
+"""
+import json
+import random
+import socketserver
+import threading
+import time
+
+
+class StubBedrockClient:
+    """
+    Fake bedrock-agent-runtime client with injected latency and error rate
+
+    Answers single-customer prompts with one JSON object and batch prompts
+    (a JSON array of customers with ids) with a JSON array. latency is paid
+    per call and item_latency per customer in the call; drop_rate leaves
+    customers out of batch answers. capacity > 0 throttles calls beyond that
+    many in flight; every call fails with a server error for the first
+    `outage` seconds. chunk_latency > 0 returns the completion as an
+    event stream of small chunks, paying that much per chunk; malformed_rate
+    makes single-email answers drift (prose, an extra field or a long body).
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        item_latency: float = 0.0,
+        drop_rate: float = 0.0,
+        capacity: int = 0,
+        outage: float = 0.0,
+        chunk_latency: float = 0.0,
+        malformed_rate: float = 0.0
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.item_latency = item_latency
+        self.drop_rate = drop_rate
+        self.capacity = capacity
+        self.outage = outage
+        self.chunk_latency = chunk_latency
+        self.malformed_rate = malformed_rate
+        self.calls = 0
+        self.chunks = 0
+        self.throttled = 0
+        self.input_chars = 0
+        self.in_flight = 0
+        self._started = None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def invoke_inline_agent(self, **kwargs):
+        text = kwargs.get('inputText', '')
+        start = text.find('[{')
+        customers = json.loads(text[start:text.index('\n', start)]) if start != -1 and '"id"' in text[start:start + 20] else None
+
+        with self._lock:
+            self.calls += 1
+            self.input_chars += len(text) + len(kwargs.get('instruction', ''))
+            if self._started is None:
+                self._started = time.monotonic()
+            if self.capacity and self.in_flight >= self.capacity:
+                self.throttled += 1
+                raise RuntimeError("ThrottlingException: Too many concurrent requests")
+            fail = self._random.random() < self.error_rate
+            malformed = customers is None and self._random.random() < self.malformed_rate
+            down = time.monotonic() - self._started < self.outage
+            dropped = {c['id'] for c in customers or [] if self._random.random() < self.drop_rate}
+            self.in_flight += 1
+        try:
+            time.sleep(self.latency + self.item_latency * len(customers or [None]))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if down:
+            raise RuntimeError("ServiceUnavailableException: Service is unavailable")
+        if fail:
+            raise RuntimeError("ThrottlingException: Rate exceeded")
+
+        email = {
+            'subject': 'Your favorite dish is waiting!',
+            'body': 'Come back this week and enjoy a discount on your favorite dish.',
+            'discount': '20'
+        }
+        if customers is None:
+            answer = self._malformed(email) if malformed else json.dumps(email)
+        else:
+            answer = json.dumps([{'id': c['id'], **email} for c in customers if c['id'] not in dropped])
+        if self.chunk_latency:
+            return {'completion': self._stream(answer)}
+        return {'completion': answer}
+
+    def _malformed(self, email: dict) -> str:
+        kind = self.calls % 3
+        if kind == 0:
+            return "Sure! Here is a friendly email for this customer:\n\n" + json.dumps(email)
+        if kind == 1:
+            return json.dumps({'subject': email['subject'], 'tone': 'friendly', **email})
+        return json.dumps({**email, 'body': ' '.join(['Come back soon and enjoy your favorite dish.'] * 40)})
+
+    def _stream(self, answer: str, size: int = 16):
+        # invoke_inline_agent event stream: {'chunk': {'bytes': ...}} events
+        data = answer.encode()
+        for i in range(0, len(data), size):
+            time.sleep(self.chunk_latency)
+            with self._lock:
+                self.chunks += 1
+            yield {'chunk': {'bytes': data[i:i + size]}}
+
+
+def iter_customers(count: int):
+    """Synthetic customers in the customers.json format, one at a time"""
+    segments = ['re-engagement', 'loyal', 'new_customer']
+    dishes = ['Carbonara Pasta', 'All American Burger', 'Grilled Salmon', 'Margherita Pizza']
+    for i in range(count):
+        yield {
+            "name": f"Customer {i}",
+            "email": f"customer{i}@example.com",
+            "favorite_dish": dishes[i % len(dishes)],
+            "days_since_visit": (i * 7) % 120,
+            "visit_count": 1 + i % 10,
+            "segment": segments[i % len(segments)]
+        }
+
+
+def make_customers(count: int) -> list:
+    """Synthetic customers in the customers.json format"""
+    return list(iter_customers(count))
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept messages from smtplib"""
+
+    def handle(self):
+        sink = self.server.sink
+        time.sleep(sink.connect_delay)
+        self._reply(220, "localhost SMTP sink")
+        sent = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.wfile.write(b"250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250 SIZE 10485760\r\n")
+            elif command.startswith('AUTH'):
+                self._reply(235, "Authentication successful")
+            elif command.startswith('MAIL'):
+                if sink.drop_after and sent >= sink.drop_after:
+                    self._reply(421, "Too many messages, closing connection")
+                    return
+                self._reply(250, "OK")
+            elif command.startswith(('RCPT', 'RSET', 'NOOP')):
+                self._reply(250, "OK")
+            elif command == 'DATA':
+                self._reply(354, "End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                time.sleep(sink.message_delay)
+                sent += 1
+                with sink.lock:
+                    sink.messages += 1
+                self._reply(250, "Queued")
+            elif command == 'QUIT':
+                self._reply(221, "Bye")
+                return
+            else:
+                self._reply(502, "Not implemented")
+
+    def _reply(self, code: int, text: str):
+        self.wfile.write(f"{code} {text}\r\n".encode('ascii'))
+
+
+class _SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class SMTPSink:
+    """
+    Local SMTP server that counts and discards messages
+
+    connect_delay simulates the TCP/TLS/login cost of a real server and
+    message_delay the time to accept each message; drop_after answers 421
+    once a connection has sent that many messages.
+    """
+
+    def __init__(self, connect_delay: float = 0.0, drop_after: int = 0, message_delay: float = 0.0):
+        self.connect_delay = connect_delay
+        self.message_delay = message_delay
+        self.drop_after = drop_after
+        self.messages = 0
+        self.lock = threading.Lock()
+        self._server = _SinkServer(('127.0.0.1', 0), _SMTPHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class StubSESClient:
+    """
+    Fake SES client that throttles anything above max_send_rate per second
+
+    Every send fails with a server error for the first `outage` seconds.
+    """
+
+    def __init__(self, max_send_rate: float = 50, latency: float = 0.01, outage: float = 0.0):
+        self.max_send_rate = max_send_rate
+        self.latency = latency
+        self.outage = outage
+        self.sent = 0
+        self.throttled = 0
+        self.failed = 0
+        self._started = None
+        self._window = []
+        self._lock = threading.Lock()
+
+    def get_send_quota(self):
+        return {'Max24HourSend': 50000.0, 'SentLast24Hours': 0.0, 'MaxSendRate': self.max_send_rate}
+
+    def send_email(self, **kwargs):
+        from botocore.exceptions import ClientError
+
+        time.sleep(self.latency)
+        with self._lock:
+            now = time.monotonic()
+            if self._started is None:
+                self._started = now
+            if now - self._started < self.outage:
+                self.failed += 1
+                raise ClientError(
+                    {'Error': {'Code': 'ServiceUnavailable', 'Message': 'Service is unavailable.'}},
+                    'SendEmail'
+                )
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.max_send_rate:
+                self.throttled += 1
+                raise ClientError(
+                    {'Error': {'Code': 'Throttling', 'Message': 'Maximum sending rate exceeded.'}},
+                    'SendEmail'
+                )
+            self._window.append(now)
+            self.sent += 1
+            return {'MessageId': f'stub-{self.sent}'}
+
+
+class StubBody:
+    """Stand-in for a botocore StreamingBody over in-memory bytes"""
+
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def read(self):
+        return self._data
+
+    def iter_chunks(self, chunk_size: int = 1024):
+        for i in range(0, len(self._data), chunk_size):
+            yield self._data[i:i + chunk_size]
+
+
+class StubS3Client:
+    """Fake S3 client serving objects from a dict of key -> bytes"""
+
+    def __init__(self, objects: dict):
+        self.objects = objects
+        self.gets = 0
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self.gets += 1
+        data = self.objects[Key]
+        return {'Body': StubBody(data), 'ContentLength': len(data), 'ETag': f'"{hash(data):x}"'}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        data = self.objects[Key]
+        return {'ContentLength': len(data), 'ETag': f'"{hash(data):x}"'}
+
+
+def customers_jsonl(count: int) -> bytes:
+    return "".join(json.dumps(c) + "\n" for c in iter_customers(count)).encode()
+
+
+def customers_json(count: int) -> bytes:
+    """Synthetic customers as one JSON array, built without holding the dicts"""
+    data = bytearray(b'[')
+    for i, customer in enumerate(iter_customers(count)):
+        if i:
+            data += b','
+        data += json.dumps(customer).encode()
+    data += b']'
+    return bytes(data)
+
+
+class StubEmailAgentClient:
+    """Fake bedrock-agent-runtime client standing in for the deployed email agent"""
+
+    def __init__(self, latency: float = 0.05, item_latency: float = 0.002):
+        self.latency = latency
+        self.item_latency = item_latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke_inline_agent(self, **kwargs):
+        result = kwargs['sessionState']['returnControlInvocationResults'][0]['functionResult']
+        payload = json.loads(result['responseBody']['TEXT']['body'])
+        messages = payload.get('messages', [payload])
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency + self.item_latency * len(messages))
+        if result['action'] == 'send_batch':
+            completion = {'success': True, 'results': [{'success': True} for _ in messages]}
+        else:
+            completion = {'success': True}
+        return {'completion': json.dumps(completion)}
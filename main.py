@@ -1,25 +1,43 @@
-from src.graph import create_email_graph
+from src.metrics import get_metrics, serve_metrics, write_report
+from src.runner import run_campaign, run_sharded
 import json
+import os
 
 def main():
     print("Starting Restaurant Email Campaign...")
+    serve_metrics()
     
-    # Create and run the graph
-    app = create_email_graph()
-    
-    # Run with empty initial state
-    result = app.invoke({
-        "customers": [],
-        "emails_to_send": [],
-        "results": []
-    })
+    # CAMPAIGN_SHARDS > 1 fans the campaign out over local processes; a
+    # process started with SHARD_INDEX/SHARD_COUNT (one ECS task per shard)
+    # runs just its own shard
+    shards = int(os.environ.get('CAMPAIGN_SHARDS', '1'))
+    if shards > 1 and 'SHARD_COUNT' not in os.environ:
+        result = run_sharded(shards, int(os.environ.get('SHARD_PROCESSES', '0')))
+    else:
+        result = run_campaign()
     
     # Print results
     print("\nCampaign Results:")
-    print(f"Emails sent: {len(result['results'])}")
+    # In streaming mode results only hold failures and a summary line
+    emails = result.get('stats', {}).get('emails', {'sent': 0, 'total': 0})
+    print(f"Emails sent: {emails['sent']} of {emails['total']}")
     for r in result['results']:
         print(f"  - {r}")
     
+    if result.get('stats'):
+        print(f"\nStats: {json.dumps(result['stats'], indent=2)}")
+    
+    # Per-call latency and throughput (METRICS_REPORT also writes it to a file)
+    report = get_metrics().report()
+    print("\nMetrics:")
+    for name, call in report['calls'].items():
+        print(f"  {name:<36} {call['count']:>8} calls  p50 {call['p50_ms']:9.1f} ms  p95 {call['p95_ms']:9.1f} ms  p99 {call['p99_ms']:9.1f} ms")
+    for name, value in report['counters'].items():
+        print(f"  {name:<36} {value:>8g}")
+    path = write_report()
+    if path:
+        print(f"Metrics report written to {path}")
+    
     print("\nDone!")
 
 if __name__ == "__main__":
@@ -0,0 +1,415 @@
+"""
+Order-to-profile aggregation
+Streams Square-style contacts and orders into the customer profile table fetch_customers reads
+
+    python -m src.aggregation --contacts contacts.json --orders orders.json --output customers.json
+    python -m src.aggregation --state profiles.npz --orders new_orders.jsonl --output customers.json
+"""
+import argparse
+import json
+import os
+import time
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .tools import CUSTOMER_BUCKET, iter_json_records
+
+DAY = 86400
+
+# Dish counts are kept per BUCKET_DAYS bucket; the buckets inside WINDOW_DAYS decide the favorite dish
+BUCKET_DAYS = 30
+WINDOW_DAYS = 180
+
+# Returning customers away longer than this are re-engagement targets, as in data/customers.json
+REENGAGEMENT_DAYS = 30
+
+CHUNK_ORDERS = 100_000
+
+# (customer, dish) pairs are packed into one int64 key
+DISH_BITS = 20
+DISH_MASK = (1 << DISH_BITS) - 1
+
+
+def _pack(strings: List[str]) -> np.ndarray:
+    return np.frombuffer('\n'.join(strings).encode(), dtype=np.uint8)
+
+
+def _unpack(data: np.ndarray, size: int) -> List[str]:
+    return data.tobytes().decode().split('\n') if size else []
+
+
+def utc_offset(timestamp: str) -> int:
+    """Seconds east of UTC in an RFC 3339 timestamp's offset ("+02:00", "-0530"); 0 for Z or none"""
+    tail = timestamp[19:]
+    sign = max(tail.rfind('+'), tail.rfind('-'))
+    if sign < 0:
+        return 0
+    digits = tail[sign + 1:].replace(':', '')
+    seconds = int(digits[:2]) * 3600 + int(digits[2:4] or 0) * 60
+    return -seconds if tail[sign] == '-' else seconds
+
+
+class ProfileAggregator:
+    """
+    Running per-customer aggregates over a stream of orders
+
+    State is array-backed and indexed by a dense customer number: visit
+    count, last visit, total items (for a party-size estimate) and the top
+    dish of the latest order. Dish quantities are kept as sorted packed
+    (customer, dish) keys per time bucket, so buckets that fall out of the
+    window are dropped whole. Memory grows with customers and (customer,
+    dish) pairs in the window, not with orders.
+
+    Each named source (an orders file) keeps a watermark, the latest
+    created_at read from it. Orders at or before it are skipped, so reading
+    a source again doesn't count its orders twice; sources are expected to
+    only grow forward in time (append-only exports, a new file per day).
+    """
+
+    def __init__(self, window_days: int = WINDOW_DAYS, bucket_days: int = BUCKET_DAYS):
+        self.window_days = window_days
+        self.bucket_days = bucket_days
+        self.customer_ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.emails: List[str] = []
+        self.dish_ids: Dict[str, int] = {}
+        self.dishes: List[str] = []
+        self.visits = np.zeros(0, dtype=np.int32)
+        self.last_visit = np.zeros(0, dtype=np.int64)
+        self.items = np.zeros(0, dtype=np.int64)
+        self.last_dish = np.zeros(0, dtype=np.int32)
+        self.buckets: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self.watermark = 0
+        self.orders = 0
+        self.skipped = 0
+        self.sources: Dict[str, int] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.names)
+
+    def _customer(self, customer_id: str) -> int:
+        index = self.customer_ids.get(customer_id)
+        if index is None:
+            index = self.customer_ids[customer_id] = len(self.names)
+            self.names.append('')
+            self.emails.append('')
+        return index
+
+    def _dish(self, name: str) -> int:
+        index = self.dish_ids.get(name)
+        if index is None:
+            if len(self.dishes) > DISH_MASK:
+                raise ValueError(f"More than {DISH_MASK + 1} distinct dishes")
+            index = self.dish_ids[name] = len(self.dishes)
+            self.dishes.append(name)
+        return index
+
+    def _grow(self):
+        """Make the per-customer arrays cover every customer seen so far (doubling)"""
+        size = self.size
+        capacity = len(self.visits)
+        if size <= capacity:
+            return
+        extra = max(size, 2 * capacity, 1024) - capacity
+        self.visits = np.concatenate([self.visits, np.zeros(extra, dtype=np.int32)])
+        self.last_visit = np.concatenate([self.last_visit, np.zeros(extra, dtype=np.int64)])
+        self.items = np.concatenate([self.items, np.zeros(extra, dtype=np.int64)])
+        self.last_dish = np.concatenate([self.last_dish, np.full(extra, -1, dtype=np.int32)])
+
+    def add_contacts(self, contacts: Iterable[dict]):
+        """Square customer records: id, given_name, family_name, email_address"""
+        for contact in contacts:
+            index = self._customer(contact['id'])
+            name = ' '.join(filter(None, (contact.get('given_name'), contact.get('family_name'))))
+            self.names[index] = (name or contact.get('nickname') or '').strip()
+            self.emails[index] = (contact.get('email_address') or '').strip()
+        self._grow()
+
+    def update(self, orders: Iterable[dict], chunk: int = CHUNK_ORDERS, source: Optional[str] = None):
+        """Fold Square order records in, `chunk` orders at a time; `source` skips orders already read from it"""
+        # The watermark moves once the whole source is read, so its orders needn't be in time order
+        since = self.sources.get(source) if source is not None else None
+        latest = since
+        orders = iter(orders)
+        while True:
+            batch = list(islice(orders, chunk))
+            if not batch:
+                break
+            newest = self._update_chunk(batch, since)
+            if newest is not None and (latest is None or newest > latest):
+                latest = newest
+        if source is not None and latest is not None:
+            self.sources[source] = latest
+
+    def _update_chunk(self, orders: List[dict], since: Optional[int] = None) -> Optional[int]:
+        # The per-order loop is the only Python-level work; everything after it is vectorized
+        customers = []
+        created = []
+        offsets = {}
+        line_order = []
+        line_dish = []
+        line_quantity = []
+        customer_ids = self.customer_ids
+        dish_ids = self.dish_ids
+        quantities = {}
+        for order in orders:
+            customer_id = order.get('customer_id')
+            if not customer_id or order.get('state', 'COMPLETED') != 'COMPLETED':
+                continue
+            position = len(customers)
+            for item in order.get('line_items') or ():
+                name = item.get('name') or 'Unknown item'
+                dish = dish_ids.get(name)
+                line_dish.append(self._dish(name) if dish is None else dish)
+                # Square quantities are decimal strings ("1", "2.5")
+                text = item.get('quantity') or '1'
+                quantity = quantities.get(text)
+                if quantity is None:
+                    quantity = quantities[text] = max(int(float(text)), 1)
+                line_quantity.append(quantity)
+                line_order.append(position)
+            customer = customer_ids.get(customer_id)
+            customers.append(self._customer(customer_id) if customer is None else customer)
+            # RFC 3339; seconds precision is enough, offsets are applied below
+            text = order['created_at']
+            created.append(text[:19])
+            if len(text) > 20 and text[-1] not in 'Zz':
+                offsets[position] = utc_offset(text)
+        if not customers:
+            return None
+        self._grow()
+
+        customer = np.array(customers, dtype=np.int64)
+        when = np.array(created, dtype='datetime64[s]').astype(np.int64)
+        if offsets:
+            when[list(offsets)] -= np.array(list(offsets.values()), dtype=np.int64)
+        lines = np.array(line_order, dtype=np.int64)
+        dish = np.array(line_dish, dtype=np.int64)
+        quantity = np.array(line_quantity, dtype=np.int64)
+        newest = int(when.max())
+
+        if since is not None:
+            # Already read from this source: drop those orders and their lines
+            fresh = when > since
+            if not fresh.all():
+                self.skipped += int((~fresh).sum())
+                line_fresh = fresh[lines]
+                lines = (np.cumsum(fresh) - 1)[lines[line_fresh]]
+                dish = dish[line_fresh]
+                quantity = quantity[line_fresh]
+                customer = customer[fresh]
+                when = when[fresh]
+                if not len(customer):
+                    return newest
+        self.orders += len(customer)
+
+        np.add.at(self.visits, customer, 1)
+        np.add.at(self.items, customer[lines], quantity)
+
+        # Top dish of each order (largest quantity, first line on ties)
+        top = np.full(len(customer), -1, dtype=np.int32)
+        by_order = np.lexsort((-quantity, lines))
+        first = np.ones(len(by_order), dtype=bool)
+        first[1:] = lines[by_order][1:] != lines[by_order][:-1]
+        top[lines[by_order][first]] = dish[by_order][first]
+
+        # Latest order per customer wins: assign in time order, later writes overwrite earlier ones
+        order = np.argsort(when, kind='stable')
+        newer = (when[order] >= self.last_visit[customer[order]]) & (top[order] >= 0)
+        self.last_dish[customer[order][newer]] = top[order][newer]
+        np.maximum.at(self.last_visit, customer, when)
+
+        self.watermark = max(self.watermark, int(when.max()))
+        oldest = self._oldest_bucket(self.watermark)
+        bucket = when[lines] // (self.bucket_days * DAY)
+        keys = (customer[lines] << DISH_BITS) | dish
+        for b in np.unique(bucket[bucket >= oldest]).tolist():
+            selected = bucket == b
+            self._merge(b, keys[selected], quantity[selected])
+        self._expire(oldest)
+        return newest
+
+    def _oldest_bucket(self, as_of: float) -> int:
+        return int(as_of - self.window_days * DAY) // (self.bucket_days * DAY)
+
+    def _merge(self, bucket: int, keys: np.ndarray, counts: np.ndarray):
+        if bucket in self.buckets:
+            old_keys, old_counts = self.buckets[bucket]
+            keys = np.concatenate([old_keys, keys])
+            counts = np.concatenate([old_counts, counts])
+        unique, inverse = np.unique(keys, return_inverse=True)
+        self.buckets[bucket] = (unique, np.bincount(inverse, weights=counts).astype(np.int32))
+
+    def _expire(self, oldest: int):
+        for bucket in [b for b in self.buckets if b < oldest]:
+            del self.buckets[bucket]
+
+    def favorites(self, as_of: float) -> np.ndarray:
+        """Dish index per customer: most ordered in the window, else the top dish of the latest order"""
+        favorite = self.last_dish[:self.size].copy()
+        oldest = self._oldest_bucket(as_of)
+        live = [tables for bucket, tables in self.buckets.items() if bucket >= oldest]
+        if not live:
+            return favorite
+        unique, inverse = np.unique(np.concatenate([keys for keys, _ in live]), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate([counts for _, counts in live]))
+        customer = unique >> DISH_BITS
+        by_count = np.lexsort((-totals, customer))
+        first = np.ones(len(by_count), dtype=bool)
+        first[1:] = customer[by_count][1:] != customer[by_count][:-1]
+        favorite[customer[by_count][first]] = (unique[by_count][first] & DISH_MASK).astype(np.int32)
+        return favorite
+
+    def iter_profiles(self, as_of: Optional[float] = None) -> Iterator[dict]:
+        """Profiles in data/customers.json format (plus party_size) for customers with an email and an order"""
+        as_of = time.time() if as_of is None else as_of
+        size = self.size
+        visits = self.visits[:size]
+        days = np.maximum((int(as_of) - self.last_visit[:size]) // DAY, 0)
+        party = np.rint(self.items[:size] / np.maximum(visits, 1)).astype(np.int64)
+        segment = np.where(visits == 1, 'new_customer', np.where(days > REENGAGEMENT_DAYS, 're-engagement', 'loyal'))
+        favorite = self.favorites(as_of)
+
+        for i in np.flatnonzero(visits > 0).tolist():
+            if not self.emails[i]:
+                continue
+            yield {
+                'name': self.names[i],
+                'email': self.emails[i],
+                'favorite_dish': self.dishes[favorite[i]] if favorite[i] >= 0 else '',
+                'days_since_visit': int(days[i]),
+                'visit_count': int(visits[i]),
+                'segment': str(segment[i]),
+                'party_size': int(party[i])
+            }
+
+    def save(self, path: str):
+        """Write the state to one .npz file (atomically)"""
+        size = self.size
+        arrays = {
+            'meta': np.array([self.window_days, self.bucket_days, self.watermark, self.orders, size, len(self.dishes)]),
+            'customer_ids': _pack(list(self.customer_ids)),
+            'names': _pack(self.names),
+            'emails': _pack(self.emails),
+            'dishes': _pack(self.dishes),
+            'visits': self.visits[:size],
+            'last_visit': self.last_visit[:size],
+            'items': self.items[:size],
+            'last_dish': self.last_dish[:size],
+            'bucket_ids': np.array(sorted(self.buckets), dtype=np.int64),
+            'source_names': _pack(list(self.sources)),
+            'source_watermarks': np.array(list(self.sources.values()), dtype=np.int64)
+        }
+        for bucket, (keys, counts) in self.buckets.items():
+            arrays[f'keys_{bucket}'] = keys
+            arrays[f'counts_{bucket}'] = counts
+
+        partial = path + '.partial'
+        with open(partial, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'ProfileAggregator':
+        with np.load(path) as data:
+            window_days, bucket_days, watermark, orders, size, dishes = data['meta'].tolist()
+            aggregator = cls(window_days, bucket_days)
+            aggregator.watermark = watermark
+            aggregator.orders = orders
+            customer_ids = _unpack(data['customer_ids'], size)
+            aggregator.customer_ids = dict(zip(customer_ids, range(size)))
+            aggregator.names = _unpack(data['names'], size)
+            aggregator.emails = _unpack(data['emails'], size)
+            aggregator.dishes = _unpack(data['dishes'], dishes)
+            aggregator.dish_ids = {name: i for i, name in enumerate(aggregator.dishes)}
+            aggregator.visits = data['visits']
+            aggregator.last_visit = data['last_visit']
+            aggregator.items = data['items']
+            aggregator.last_dish = data['last_dish']
+            for bucket in data['bucket_ids'].tolist():
+                aggregator.buckets[bucket] = (data[f'keys_{bucket}'], data[f'counts_{bucket}'])
+            if 'source_names' in data.files:
+                watermarks = data['source_watermarks'].tolist()
+                aggregator.sources = dict(zip(_unpack(data['source_names'], len(watermarks)), watermarks))
+        return aggregator
+
+
+def iter_json_file(path: str) -> Iterator[dict]:
+    """Records from a local JSON array or JSON Lines file, read in 1 MiB chunks"""
+    def chunks():
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    return
+                yield chunk
+    return iter_json_records(chunks())
+
+
+def write_profiles(profiles: Iterable[dict], path: str):
+    """Write profiles as a JSON array (what read_customers_from_s3 reads), JSON Lines or an Arrow snapshot"""
+    if path.endswith(('.arrow', '.ipc')):
+        from .snapshot import write_snapshot
+
+        write_snapshot(profiles, path)
+        return
+    lines = path.endswith('.jsonl')
+    with open(path, 'w') as f:
+        if not lines:
+            f.write('[')
+        for i, profile in enumerate(profiles):
+            if lines:
+                f.write(json.dumps(profile) + '\n')
+            else:
+                f.write((',\n' if i else '\n') + json.dumps(profile))
+        if not lines:
+            f.write('\n]\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate Square contacts and orders into customer profiles")
+    parser.add_argument('--contacts', action='append', default=[], help='Square customers file (JSON array or JSON Lines)')
+    parser.add_argument('--orders', action='append', default=[], help='Square orders file (JSON array or JSON Lines)')
+    parser.add_argument('--state', help='aggregate state (.npz); loaded if it exists and saved afterwards')
+    parser.add_argument('--output', required=True, help='profile table: .json, .jsonl or .arrow')
+    parser.add_argument('--as-of', help='reference time for days_since_visit (ISO date; default now)')
+    parser.add_argument('--upload', metavar='KEY', help='also upload the profile table to the customer bucket')
+    args = parser.parse_args()
+
+    if args.state and os.path.exists(args.state):
+        aggregator = ProfileAggregator.load(args.state)
+    else:
+        aggregator = ProfileAggregator(
+            int(os.environ.get('PROFILE_WINDOW_DAYS', WINDOW_DAYS)),
+            int(os.environ.get('PROFILE_BUCKET_DAYS', BUCKET_DAYS))
+        )
+    for path in args.contacts:
+        aggregator.add_contacts(iter_json_file(path))
+    start = time.perf_counter()
+    orders = aggregator.orders
+    for path in args.orders:
+        # Sources are named by file name, so a file keeps its watermark wherever it is read from
+        aggregator.update(iter_json_file(path), source=os.path.basename(path))
+    print(f"Aggregated {aggregator.orders - orders:,} orders in {time.perf_counter() - start:.1f}s "
+          f"({aggregator.size:,} customers, {len(aggregator.dishes):,} dishes)")
+    if aggregator.skipped:
+        print(f"Skipped {aggregator.skipped:,} orders at or before their file's watermark")
+
+    as_of = np.datetime64(args.as_of, 's').astype(np.int64).item() if args.as_of else None
+    write_profiles(aggregator.iter_profiles(as_of), args.output)
+    if args.state:
+        aggregator.save(args.state)
+    print(f"Wrote profiles to {args.output}")
+
+    if args.upload:
+        from .clients import get_client
+
+        get_client('s3').upload_file(args.output, CUSTOMER_BUCKET, args.upload)
+        print(f"Uploaded to s3://{CUSTOMER_BUCKET}/{args.upload}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Non-blocking email backends for the AgentCore email agent
+Async SMTP with pooled connections (aiosmtplib) and SES calls offloaded to a bounded executor
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+
+class AsyncSMTPPool:
+    """
+    Pool of up to `size` aiosmtplib connections shared by concurrent requests
+
+    Same policy as smtp_pool.SMTPPool: connect lazily, reconnect when the
+    server drops the session or answers 421, recycle after `max_messages`.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 587,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        size: int = 4,
+        max_messages: int = 100,
+        starttls: bool = True,
+        timeout: float = 30
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.max_messages = max_messages
+        self.starttls = starttls
+        self.timeout = timeout
+
+        self._idle = []
+        self._slots = None
+        self._closed = False
+
+    async def _connect(self):
+        import aiosmtplib
+
+        client = aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            start_tls=self.starttls,
+            timeout=self.timeout
+        )
+        await client.connect()
+        try:
+            if self.password:
+                await client.login(self.username, self.password)
+        except Exception:
+            client.close()
+            raise
+        client.sent = 0
+        return client
+
+    async def _close(self, client):
+        try:
+            await client.quit()
+        except Exception:
+            client.close()
+
+    async def _send_once(self, client, send):
+        await send(client)
+        client.sent += 1
+
+    async def send_message(self, msg):
+        """Send one email.message.Message on a pooled connection, reconnecting once if it died"""
+        await self._send(lambda client: client.send_message(msg))
+
+    async def sendmail(self, sender: str, recipients, msg: bytes):
+        """Send ready-made message bytes (see mime.MessageBuilder) on a pooled connection"""
+        await self._send(lambda client: client.sendmail(sender, recipients, msg))
+
+    async def _send(self, send):
+        import aiosmtplib
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+
+        async with self._slots:
+            client = self._idle.pop() if self._idle else await self._connect()
+            try:
+                try:
+                    await self._send_once(client, send)
+                except aiosmtplib.SMTPResponseException as e:
+                    if e.code != 421:
+                        raise
+                    client.close()
+                    client = await self._connect()
+                    await self._send_once(client, send)
+                except (aiosmtplib.SMTPServerDisconnected, ConnectionError):
+                    client.close()
+                    client = await self._connect()
+                    await self._send_once(client, send)
+            except Exception:
+                client.close()
+                raise
+
+            if self._closed or client.sent >= self.max_messages:
+                await self._close(client)
+            else:
+                self._idle.append(client)
+
+    async def close(self):
+        """Close idle connections; connections in use are closed when released"""
+        self._closed = True
+        while self._idle:
+            await self._close(self._idle.pop())
+
+
+_pool = None
+_pool_key = None
+_executor = None
+_lock = threading.Lock()
+
+
+def get_async_smtp_pool() -> AsyncSMTPPool:
+    """Shared async pool configured from the same SMTP_* variables as the sync pool"""
+    global _pool, _pool_key
+
+    key = (
+        os.environ.get('SMTP_SERVER', 'smtp.gmail.com'),
+        int(os.environ.get('SMTP_PORT', '587')),
+        os.environ.get('SENDER_EMAIL', 'noreply@restaurant.com'),
+        os.environ.get('SMTP_PASSWORD'),
+        int(os.environ.get('SMTP_POOL_SIZE', '4')),
+        int(os.environ.get('SMTP_MAX_MESSAGES_PER_CONNECTION', '100')),
+        os.environ.get('SMTP_STARTTLS', 'true').lower() != 'false'
+    )
+
+    with _lock:
+        if _pool is None or _pool_key != key:
+            server, port, user, password, size, max_messages, starttls = key
+            _pool = AsyncSMTPPool(
+                server,
+                port,
+                username=user,
+                password=password,
+                size=size,
+                max_messages=max_messages,
+                starttls=starttls
+            )
+            _pool_key = key
+        return _pool
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Bounded executor for blocking AWS calls (ASYNC_EXECUTOR_WORKERS threads)"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.environ.get('ASYNC_EXECUTOR_WORKERS', '16')),
+                thread_name_prefix='email-agent'
+            )
+        return _executor
+
+
+async def run_blocking(fn, *args):
+    """Run a blocking call on the bounded executor without stalling the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), fn, *args)
+
+
+async def send_ses_async(to_email: str, subject: str, body: str) -> Dict[str, Any]:
+    """Send through the shared, rate-paced SES sender off the event loop"""
+    from .ses_sender import get_ses_sender
+
+    return await run_blocking(get_ses_sender().send, to_email, subject, body)
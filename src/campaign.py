@@ -0,0 +1,119 @@
+"""
+Campaign checkpointing
+Per-customer progress log with idempotency keys so a restarted campaign resumes instead of repeating work
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from .records import Draft, SendResult
+from .sharding import shard_path
+
+
+def idempotency_key(campaign_id: str, email: str, name: str) -> str:
+    """Stable key for one (campaign, customer) pair"""
+    return hashlib.sha256(f"{campaign_id}\0{email.strip().lower()}\0{name.strip()}".encode()).hexdigest()
+
+
+class CampaignLog:
+    """
+    SQLite log of which customers have been drafted and sent in a campaign
+
+    Drafts are stored so a restart never calls the model twice for the same
+    customer; sends are recorded right after the backend accepts them so a
+    restart skips them. A crash between a send and its record can still
+    repeat that one message.
+    """
+
+    def __init__(self, path: str, campaign_id: str):
+        self.path = path
+        self.campaign_id = campaign_id
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS campaign_progress ('
+            'key TEXT PRIMARY KEY, campaign_id TEXT NOT NULL, draft TEXT, result TEXT)'
+        )
+        self._db.commit()
+
+    def key(self, email: str, name: str) -> str:
+        return idempotency_key(self.campaign_id, email, name)
+
+    def _get(self, key: str, column: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(f'SELECT {column} FROM campaign_progress WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def get_draft(self, customer: dict) -> Optional[Draft]:
+        draft = self._get(self.key(customer['email'], customer['name']), 'draft')
+        return Draft.from_dict(json.loads(draft)) if draft is not None else None
+
+    def record_draft(self, customer: dict, email: dict):
+        key = self.key(customer['email'], customer['name'])
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO campaign_progress (key, campaign_id, draft) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET draft = excluded.draft',
+                (key, self.campaign_id, json.dumps(dict(email)))
+            )
+            self._db.commit()
+
+    def get_result(self, email: dict) -> Optional[SendResult]:
+        result = self._get(self.key(email['to'], email['name']), 'result')
+        return SendResult.parse(result, email['name']) if result is not None else None
+
+    def record_result(self, email: dict, result):
+        key = self.key(email['to'], email['name'])
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO campaign_progress (key, campaign_id, result) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET result = excluded.result',
+                (key, self.campaign_id, str(result))
+            )
+            self._db.commit()
+
+    def counts(self) -> dict:
+        with self._lock:
+            drafted, sent = self._db.execute(
+                'SELECT COUNT(draft), COUNT(result) FROM campaign_progress WHERE campaign_id = ?',
+                (self.campaign_id,)
+            ).fetchone()
+        return {'drafted': drafted, 'sent': sent}
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def campaign_db() -> str:
+    """CAMPAIGN_DB, with one file per shard when the campaign is sharded"""
+    return shard_path(os.environ.get('CAMPAIGN_DB', 'campaign.sqlite'))
+
+
+def get_campaign_log() -> Optional[CampaignLog]:
+    """Progress log for CAMPAIGN_ID, or None when no campaign id is set"""
+    global _log
+    campaign_id = os.environ.get('CAMPAIGN_ID')
+    if not campaign_id:
+        return None
+    with _log_lock:
+        if _log is None or _log.campaign_id != campaign_id or _log.path != campaign_db():
+            _log = CampaignLog(campaign_db(), campaign_id)
+        return _log
+
+
+def get_checkpointer():
+    """LangGraph SQLite checkpointer on the campaign database (needs langgraph-checkpoint-sqlite)"""
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    from .checkpoint import RecordSerializer
+
+    return SqliteSaver(sqlite3.connect(campaign_db(), check_same_thread=False), serde=RecordSerializer())
@@ -0,0 +1,47 @@
+"""
+Checkpoint serialization
+JsonPlusSerializer that writes the campaign's record lists as plain rows (needs langgraph)
+"""
+import threading
+from collections import OrderedDict
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from .records import SERDE_TYPES, pack_records, unpack_records
+
+# Record lists whose serialized form is kept for reuse
+RECENT_LISTS = 4
+
+
+class RecordSerializer(JsonPlusSerializer):
+    """Checkpoints with a million customers serialize as fast as the same state held in dicts"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('allowed_msgpack_modules', SERDE_TYPES)
+        super().__init__(**kwargs)
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+
+    def dumps_typed(self, obj):
+        # LangGraph writes a node's output as a pending write and again as a
+        # channel value, and nodes hand lists on unchanged, so the same list
+        # arrives several times per run. Nodes return new lists rather than
+        # mutating state, so identity and length identify the contents.
+        if not isinstance(obj, list):
+            return super().dumps_typed(pack_records(obj))
+        # Held while serializing, as the writes and the checkpoint for a step
+        # are saved from different threads at the same time
+        with self._lock:
+            recent = self._recent.get(id(obj))
+            if recent is not None and recent[0] is obj and recent[1] == len(obj):
+                return recent[2]
+            packed = pack_records(obj)
+            data = super().dumps_typed(packed)
+            if packed is not obj:
+                self._recent[id(obj)] = (obj, len(obj), data)
+                while len(self._recent) > RECENT_LISTS:
+                    self._recent.popitem(last=False)
+            return data
+
+    def loads_typed(self, data):
+        return unpack_records(super().loads_typed(data))
@@ -0,0 +1,67 @@
+"""
+Shared AWS client registry
+One lazily created, thread-safe client per (service, region), with a sized connection pool and TCP keep-alive
+boto3 itself is imported on the first get_client call
+"""
+import os
+import threading
+from typing import Optional
+
+_clients = {}
+_lock = threading.Lock()
+_session = None
+
+# Services whose callers retry throttling themselves (the generation limiter,
+# SESSender, the outbox); botocore retrying underneath would multiply attempts
+APP_RETRIED_SERVICES = frozenset({'bedrock-agent-runtime', 'ses'})
+
+
+def default_region() -> str:
+    return os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION') or 'us-east-1'
+
+
+def client_config(service: str = ''):
+    """Connection pool sized for the send/generate thread pools; keep-alive reuses TCP/TLS sessions
+
+    botocore retries are off for APP_RETRIED_SERVICES and standard (3 attempts) elsewhere.
+    """
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '50')),
+        tcp_keepalive=True,
+        retries={'max_attempts': 1 if service in APP_RETRIED_SERVICES else 3, 'mode': 'standard'}
+    )
+
+
+def get_client(service: str, region: Optional[str] = None):
+    """Return the shared client for a service, creating it on first use"""
+    key = (service, region or default_region())
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    global _session
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            # boto3 sessions aren't thread-safe; clients created from one are
+            if _session is None:
+                import boto3.session
+
+                _session = boto3.session.Session()
+            client = _session.client(service, region_name=key[1], config=client_config(service))
+            _clients[key] = client
+        return client
+
+
+def set_client(service: str, client, region: Optional[str] = None):
+    """Register a client (a stub in benchmarks) for a service"""
+    with _lock:
+        _clients[(service, region or default_region())] = client
+
+
+def reset_clients():
+    """Drop all cached clients"""
+    with _lock:
+        _clients.clear()
@@ -0,0 +1,357 @@
+"""
+Streaming completion reading for generated emails
+Assembles invoke_inline_agent output chunk by chunk and rejects bad emails before the stream ends
+"""
+import codecs
+import json
+import os
+from typing import Iterable, Iterator, Union
+
+EMAIL_FIELDS = ('subject', 'body', 'discount')
+# Batch items also carry the customer's id
+BATCH_FIELDS = EMAIL_FIELDS + ('id',)
+MAX_SUBJECT_CHARS = 150
+WHITESPACE_ESCAPES = 'ntr'
+
+
+class GenerationRejected(ValueError):
+    """The model's answer broke the email schema or limits; the call was cut short"""
+
+
+def iter_completion(completion: Union[str, bytes, Iterable]) -> Iterator[str]:
+    """
+    Text chunks of a completion
+
+    Accepts a plain string (or bytes) or the invoke_inline_agent event
+    stream, whose events carry {'chunk': {'bytes': ...}}. Error events
+    (throttlingException, ...) are raised with their event name so callers
+    can classify them.
+    """
+    if isinstance(completion, str):
+        yield completion
+        return
+    if isinstance(completion, bytes):
+        yield completion.decode('utf-8')
+        return
+
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    for event in completion:
+        if 'chunk' in event:
+            text = utf8.decode(event['chunk'].get('bytes', b''))
+            if text:
+                yield text
+            continue
+        for name, detail in event.items():
+            if name.endswith('Exception'):
+                message = detail.get('message', '') if isinstance(detail, dict) else detail
+                raise RuntimeError(f"{name[0].upper()}{name[1:]}: {message}")
+    tail = utf8.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def completion_text(completion) -> str:
+    """The whole completion as one string"""
+    return ''.join(iter_completion(completion))
+
+
+class EmailStreamValidator:
+    """
+    Incremental checks on a flat JSON object {"subject", "body", "discount"}
+
+    feed() takes text as it arrives and raises GenerationRejected as soon as
+    the answer stops being a JSON object, grows a field outside the schema
+    or a nested value, or the body passes `max_words` words. `done` turns
+    True once the object closes, so the rest of the stream can be dropped.
+    """
+
+    def __init__(self, max_words: int = 100, fields: tuple = EMAIL_FIELDS):
+        self.max_words = max_words
+        self.fields = fields
+        self.done = False
+        self.chars = 0
+        self._state = 'start'
+        self._fence = False
+        self._key = []
+        self._field = None
+        self._escape = 0
+        self._words = 0
+        self._length = 0
+        self._in_word = False
+
+    def _reject(self, reason: str):
+        raise GenerationRejected(reason)
+
+    def feed(self, text: str):
+        self.chars += len(text)
+        for char in text:
+            if self.done:
+                return
+            self._step(char)
+
+    def _step(self, char: str):
+        state = self._state
+        if state == 'start':
+            if char.isspace():
+                return
+            if char == '`':
+                self._state = 'fence'
+            elif char == '{':
+                self._state = 'key_or_end'
+            else:
+                self._reject("answer is not a JSON object")
+        elif state == 'fence':
+            # ```json ... up to the end of the line
+            if char == '\n':
+                self._state = 'start'
+        elif state in ('key_or_end', 'key_next'):
+            if char.isspace():
+                return
+            if char == '"':
+                self._key = []
+                self._state = 'key'
+            elif char == '}' and state == 'key_or_end':
+                self.done = True
+            else:
+                self._reject("malformed JSON object")
+        elif state == 'key':
+            if char == '"':
+                self._field = ''.join(self._key)
+                if self._field not in self.fields:
+                    self._reject(f"unexpected field {self._field!r}")
+                self._state = 'colon'
+            else:
+                self._key.append(char)
+        elif state == 'colon':
+            if char == ':':
+                self._state = 'value'
+            elif not char.isspace():
+                self._reject("malformed JSON object")
+        elif state == 'value':
+            if char.isspace():
+                return
+            if char == '"':
+                self._words = self._length = 0
+                self._in_word = False
+                self._escape = 0
+                self._state = 'string'
+            elif char in '{[':
+                self._reject(f"nested value for {self._field!r}")
+            elif self._field in ('discount', 'id') and (char.isdigit() or char == '-'):
+                self._state = 'number'
+            else:
+                self._reject(f"{self._field!r} is not a string")
+        elif state == 'string':
+            self._string_char(char)
+        elif state == 'number':
+            if char in ',}' or char.isspace():
+                self._state = 'comma_or_end'
+                self._step(char)
+            elif not (char.isdigit() or char in '.eE+-'):
+                self._reject("discount is not a number")
+        elif state == 'comma_or_end':
+            if char == ',':
+                self._state = 'key_next'
+            elif char == '}':
+                self.done = True
+            elif not char.isspace():
+                self._reject("malformed JSON object")
+
+    def _string_char(self, char: str):
+        if self._escape:
+            if self._escape == 1 and char == 'u':
+                self._escape = 5
+                return
+            if self._escape > 1:
+                self._escape -= 1
+                if self._escape > 1:
+                    return
+                char = 'x'
+            else:
+                char = ' ' if char in WHITESPACE_ESCAPES else char
+            self._escape = 0
+        elif char == '\\':
+            self._escape = 1
+            return
+        elif char == '"':
+            self._state = 'comma_or_end'
+            return
+
+        self._length += 1
+        if char.isspace():
+            self._in_word = False
+        elif not self._in_word:
+            self._in_word = True
+            self._words += 1
+
+        if self._field == 'body' and self._words > self.max_words:
+            self._reject(f"body is over {self.max_words} words")
+        if self._field == 'subject' and self._length > MAX_SUBJECT_CHARS:
+            self._reject(f"subject is over {MAX_SUBJECT_CHARS} characters")
+        if self._field == 'discount' and not (char.isdigit() or char in '.% '):
+            self._reject("discount is not a number")
+
+
+def max_words() -> int:
+    return int(os.environ.get('GENERATION_MAX_WORDS', '100'))
+
+
+def read_email_completion(completion) -> dict:
+    """
+    Read a single-email completion, validating it as it streams
+
+    Stops reading (and closes the stream) as soon as the JSON object closes
+    or the answer is rejected. Raises GenerationRejected for bad answers.
+    """
+    validator = EmailStreamValidator(max_words())
+    parts = []
+    try:
+        for text in iter_completion(completion):
+            parts.append(text)
+            validator.feed(text)
+            if validator.done:
+                break
+    finally:
+        close = getattr(completion, 'close', None)
+        if close is not None:
+            close()
+
+    if not validator.done:
+        raise GenerationRejected("answer ended before the JSON object closed")
+    text = ''.join(parts).strip()
+    if text.startswith('`'):
+        text = text[text.index('\n') + 1:]
+    try:
+        email_data, _ = json.JSONDecoder().raw_decode(text.lstrip())
+    except json.JSONDecodeError as e:
+        raise GenerationRejected(f"invalid JSON: {e}") from e
+    for field in ('subject', 'body'):
+        if not isinstance(email_data.get(field), str) or not email_data[field].strip():
+            raise GenerationRejected(f"missing {field}")
+    return email_data
+
+
+class BatchStreamValidator:
+    """
+    Incremental checks on a JSON array of email objects (a batch answer)
+
+    Each object goes through its own EmailStreamValidator. An object that
+    breaks the schema is skipped to its closing brace and its position
+    noted in `rejected`, so one bad item doesn't cost the whole batch.
+    Anything that isn't an array of objects is rejected outright.
+    """
+
+    def __init__(self, max_words: int = 100):
+        self.max_words = max_words
+        self.done = False
+        self.chars = 0
+        self.rejected = {}
+        self._state = 'start'
+        self._item = None
+        self._index = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str):
+        self.chars += len(text)
+        for char in text:
+            if self.done:
+                return
+            self._step(char)
+
+    def _step(self, char: str):
+        state = self._state
+        if state == 'start':
+            if char.isspace():
+                return
+            if char == '`':
+                self._state = 'fence'
+            elif char == '[':
+                self._state = 'item_or_end'
+            else:
+                raise GenerationRejected("answer is not a JSON array")
+        elif state == 'fence':
+            if char == '\n':
+                self._state = 'start'
+        elif state in ('item_or_end', 'item_next'):
+            if char.isspace():
+                return
+            if char == '{':
+                self._item = EmailStreamValidator(self.max_words, BATCH_FIELDS)
+                self._depth = 0
+                self._state = 'item'
+                self._item_char(char)
+            elif char == ']' and state == 'item_or_end':
+                self.done = True
+            else:
+                raise GenerationRejected("array item is not a JSON object")
+        elif state == 'item':
+            self._item_char(char)
+        elif state == 'comma_or_end':
+            if char == ',':
+                self._state = 'item_next'
+            elif char == ']':
+                self.done = True
+            elif not char.isspace():
+                raise GenerationRejected("malformed JSON array")
+
+    def _item_char(self, char: str):
+        if self._item is not None:
+            try:
+                self._item.feed(char)
+            except GenerationRejected as e:
+                self.rejected[self._index] = str(e)
+                self._item = None
+
+        # Track nesting ourselves so a rejected item can be skipped
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == '\\':
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+        elif char == '"':
+            self._in_string = True
+        elif char in '{[':
+            self._depth += 1
+        elif char in '}]':
+            self._depth -= 1
+            if self._depth == 0:
+                self._item = None
+                self._index += 1
+                self._state = 'comma_or_end'
+
+
+def read_batch_completion(completion) -> list:
+    """
+    Read a batch completion (a JSON array of emails), validating items as they stream
+
+    Returns the valid items; rejected ones are left out for the caller to
+    regenerate one at a time. Raises GenerationRejected when the answer as
+    a whole is not an array of objects.
+    """
+    validator = BatchStreamValidator(max_words())
+    parts = []
+    try:
+        for text in iter_completion(completion):
+            parts.append(text)
+            validator.feed(text)
+            if validator.done:
+                break
+    finally:
+        close = getattr(completion, 'close', None)
+        if close is not None:
+            close()
+
+    if not validator.done:
+        raise GenerationRejected("answer ended before the JSON array closed")
+    text = ''.join(parts).strip()
+    if text.startswith('`'):
+        text = text[text.index('\n') + 1:]
+    try:
+        items, _ = json.JSONDecoder().raw_decode(text.lstrip())
+    except json.JSONDecodeError as e:
+        raise GenerationRejected(f"invalid JSON: {e}") from e
+    return [item for i, item in enumerate(items) if i not in validator.rejected]
@@ -1,27 +1,35 @@
 """
 Restaurant Email Agent using Amazon Bedrock AgentCore
 Handles email sending with multiple backends (mock, SES, SMTP)
+Network calls never block the event loop: SMTP uses aiosmtplib, SES runs on a bounded executor
 """
 import os
+import sys
 import json
-import boto3
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from typing import Dict, Any
+import asyncio
+from typing import Dict, Any, List
 
 from bedrock_agentcore.runtime import BedrockAgentCoreApp
 from strands import tool
 
+if __package__:
+    from .async_email import get_async_smtp_pool, run_blocking, send_ses_async
+    from .clients import get_client
+    from .mime import get_message_builder, mime_message
+else:
+    # Run as a script (python src/email_agent.py): import the helpers through the src package
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from src.async_email import get_async_smtp_pool, run_blocking, send_ses_async
+    from src.clients import get_client
+    from src.mime import get_message_builder, mime_message
+
 # Create the AgentCore app
 app = BedrockAgentCoreApp("restaurant-email-agent")
 
 # Email configuration
 EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'mock')  # mock, ses, smtp
 SENDER_EMAIL = os.environ.get('SENDER_EMAIL', 'noreply@restaurant.com')
-
-# Initialize AWS clients
-ses_client = boto3.client('ses', region_name='us-east-1') if EMAIL_BACKEND == 'ses' else None
+BATCH_CONCURRENCY = int(os.environ.get('EMAIL_BATCH_CONCURRENCY', '16'))  # sends in flight per send_batch
 
 @tool
 async def send_restaurant_email(
@@ -61,14 +69,7 @@ async def send_restaurant_email(
     elif EMAIL_BACKEND == 'ses':
         # AWS SES mode - send real email
         try:
-            response = ses_client.send_email(
-                Source=SENDER_EMAIL,
-                Destination={'ToAddresses': [to_email]},
-                Message={
-                    'Subject': {'Data': subject},
-                    'Body': {'Text': {'Data': body}}
-                }
-            )
+            response = await send_ses_async(to_email, subject, body)
             
             print(f"✅ Email sent via SES to {customer_name}")
             
@@ -99,8 +100,6 @@ async def send_restaurant_email(
     
     elif EMAIL_BACKEND == 'smtp':
         # SMTP mode (Gmail, etc)
-        smtp_server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.environ.get('SMTP_PORT', '587'))
         smtp_password = os.environ.get('SMTP_PASSWORD', '')
         
         if not smtp_password:
@@ -112,16 +111,11 @@ async def send_restaurant_email(
             }
         
         try:
-            msg = MIMEMultipart()
-            msg['From'] = SENDER_EMAIL
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            msg.attach(MIMEText(body, 'plain'))
-            
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()
-                server.login(SENDER_EMAIL, smtp_password)
-                server.send_message(msg)
+            builder = get_message_builder()
+            if builder.supports(to_email):
+                await get_async_smtp_pool().sendmail(builder.envelope_from, [to_email], builder.build(to_email, subject, body))
+            else:
+                await get_async_smtp_pool().send_message(mime_message(SENDER_EMAIL, to_email, subject, body))
             
             print(f"✅ Email sent via SMTP to {customer_name}")
             
@@ -158,7 +152,7 @@ async def get_email_status() -> Dict[str, Any]:
     if EMAIL_BACKEND == 'ses':
         try:
             # Check SES sending quota
-            quota = ses_client.get_send_quota()
+            quota = await run_blocking(get_client('ses').get_send_quota)
             status['ses_quota'] = {
                 'max_24_hour': quota['Max24HourSend'],
                 'sent_last_24_hours': quota['SentLast24Hours'],
@@ -166,7 +160,7 @@ async def get_email_status() -> Dict[str, Any]:
             }
             
             # Check if sender is verified
-            identities = ses_client.list_verified_email_addresses()
+            identities = await run_blocking(get_client('ses').list_verified_email_addresses)
             status['sender_verified'] = SENDER_EMAIL in identities['VerifiedEmailAddresses']
             
             if not status['sender_verified']:
@@ -185,6 +179,42 @@ async def get_email_status() -> Dict[str, Any]:
     
     return status
 
+@tool
+async def send_restaurant_email_batch(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    Send many emails concurrently using the configured backend
+    
+    Args:
+        messages: List of dicts with to_email, customer_name, subject and body
+    
+    Returns:
+        Dict with overall counts and one result per message, in input order
+    """
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def send_one(message: Dict[str, str]) -> Dict[str, Any]:
+        async with limit:
+            try:
+                return await send_restaurant_email(
+                    to_email=message['to_email'],
+                    customer_name=message['customer_name'],
+                    subject=message['subject'],
+                    body=message['body']
+                )
+            except Exception as e:
+                return {'success': False, 'backend': EMAIL_BACKEND, 'error': str(e)}
+    
+    results = await asyncio.gather(*(send_one(message) for message in messages))
+    sent = sum(1 for result in results if result.get('success'))
+    
+    return {
+        'success': sent == len(results),
+        'backend': EMAIL_BACKEND,
+        'sent': sent,
+        'failed': len(results) - sent,
+        'results': results
+    }
+
 # Entry point for the agent
 @app.handler
 async def handle_email_request(event: Dict[str, Any]) -> Dict[str, Any]:
@@ -199,6 +229,8 @@ async def handle_email_request(event: Dict[str, Any]) -> Dict[str, Any]:
             subject=event['subject'],
             body=event['body']
         )
+    elif action == 'send_batch':
+        return await send_restaurant_email_batch(messages=event['messages'])
     elif action == 'get_status':
         return await get_email_status()
     else:
@@ -206,8 +238,6 @@ async def handle_email_request(event: Dict[str, Any]) -> Dict[str, Any]:
 
 if __name__ == "__main__":
     # For local testing
-    import asyncio
-    
     # Test status check
     print("Checking email configuration...")
     status = asyncio.run(get_email_status())
@@ -0,0 +1,138 @@
+"""
+Persistent cache of generated emails
+Keyed on the customer's normalized profile, the prompt text and the model ID
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+# Recency buckets in days: a customer moving from 45 to 52 days away keeps their cached email
+DAYS_BUCKETS = (14, 30, 60, 90, 180, 365)
+
+
+def days_bucket(days: int) -> int:
+    for i, limit in enumerate(DAYS_BUCKETS):
+        if days <= limit:
+            return i
+    return len(DAYS_BUCKETS)
+
+
+def normalize_profile(customer: dict) -> dict:
+    """Fields that decide what the model writes; anything else is ignored"""
+    return {
+        'name': customer.get('name', '').strip(),
+        'email': customer.get('email', '').strip().lower(),
+        'favorite_dish': customer.get('favorite_dish', '').strip().lower(),
+        'segment': customer.get('segment', ''),
+        'days_bucket': days_bucket(int(customer.get('days_since_visit', 0))),
+        'visit_count': int(customer.get('visit_count', 0))
+    }
+
+
+def cache_key(customer: dict, prompt: str, instruction: str, model_id: str) -> str:
+    payload = json.dumps(
+        [normalize_profile(customer), prompt, instruction, model_id],
+        sort_keys=True,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class GenerationCache:
+    """
+    SQLite-backed cache with TTL expiry and size-bounded oldest-first eviction
+
+    Safe to share between the create_emails worker threads. A hit is a
+    single read: entries are evicted in insertion order, so nothing is
+    written to track use.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_entries: int = 1_000_000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        # accessed is no longer updated on hits; kept so existing cache files still open
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS generations ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS generations_created ON generations (created)')
+        self._db.commit()
+        self._count = self._db.execute('SELECT COUNT(*) FROM generations').fetchone()[0]
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT value, created FROM generations WHERE key = ?', (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._db.execute('DELETE FROM generations WHERE key = ?', (key,))
+                    self._db.commit()
+                    self._count -= 1
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict):
+        now = time.time()
+        with self._lock:
+            exists = self._db.execute('SELECT 1 FROM generations WHERE key = ?', (key,)).fetchone()
+            self._db.execute(
+                'INSERT OR REPLACE INTO generations (key, value, created, accessed) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), now, now)
+            )
+            if not exists:
+                self._count += 1
+            if self._count > self.max_entries:
+                excess = self._count - self.max_entries
+                self._db.execute(
+                    'DELETE FROM generations WHERE key IN '
+                    '(SELECT key FROM generations ORDER BY created LIMIT ?)',
+                    (excess,)
+                )
+                self.evictions += excess
+                self._count -= excess
+            self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_generation_cache() -> Optional[GenerationCache]:
+    """Shared cache at GENERATION_CACHE_PATH, or None when caching is off"""
+    global _cache
+    path = os.environ.get('GENERATION_CACHE_PATH')
+    if not path:
+        return None
+    with _cache_lock:
+        if _cache is None or _cache.path != path:
+            _cache = GenerationCache(
+                path,
+                ttl=float(os.environ.get('GENERATION_CACHE_TTL', str(7 * 24 * 3600))),
+                max_entries=int(os.environ.get('GENERATION_CACHE_MAX_ENTRIES', '1000000'))
+            )
+        return _cache
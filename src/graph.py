@@ -1,101 +1,673 @@
-from langgraph.graph import StateGraph, END
-from typing import TypedDict, List
+from typing import TypedDict, Callable, Iterable, Iterator, List
 import json
-import boto3
 import os
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from functools import wraps
+from itertools import islice
 
-from .tools import read_customers_from_s3, send_email
+from .campaign import get_campaign_log
+from .clients import get_client
+from .completion import GenerationRejected, completion_text, read_batch_completion, read_email_completion
+from .email_cache import cache_key, get_generation_cache
+from .incremental import get_contact_index
+from .limiter import CircuitOpenError, generation_concurrency, get_generation_breaker, get_generation_limiter, is_throttled
+from .metrics import inc, instrument, timed, timed_stage, timed_stage_call
+from .outbox import OutboxWorkers, get_outbox
+from .pipeline import pipelined
+from .records import Customer, Draft, SendResult
+from .sharding import in_shard, shard_config
+from .tools import iter_customers_from_s3, read_customers_from_s3, send_email, send_email_batch
 
 class EmailState(TypedDict):
-    customers: List[dict]
-    emails_to_send: List[dict]
-    results: List[str]
+    # Lists by default; lazy iterators when CUSTOMER_STREAMING is on
+    customers: Iterable[Customer]
+    emails_to_send: Iterable[Draft]
+    results: List[SendResult]
+    stats: dict
 
-# Initialize Bedrock Agent client
-bedrock_agent = boto3.client('bedrock-agent-runtime', region_name='us-east-1')
+def pipeline_depth() -> int:
+    """PIPELINE_DEPTH > 0 runs the stages concurrently with queues of that depth between them"""
+    return int(os.environ.get('PIPELINE_DEPTH', '0'))
 
+def streaming_enabled() -> bool:
+    """CUSTOMER_STREAMING=true streams customers through the graph in windows"""
+    return os.environ.get('CUSTOMER_STREAMING', 'false').lower() == 'true' or pipeline_depth() > 0
+
+def stage_output(items: Iterable, stage: str) -> Iterable:
+    """Hand a stage's lazy output to the next stage, through a bounded queue when pipelining
+    
+    The output is timed as `stage` while it is consumed, which is when the
+    stage does its work; waits on the queue count towards neither stage.
+    """
+    items = timed_stage(items, stage)
+    depth = pipeline_depth()
+    return timed_stage(pipelined(items, depth), None) if depth > 0 else items
+
+def instrument_stage(name: str, lazy: bool = True):
+    """Decorator timing a graph node as `name`
+    
+    In streaming mode a lazy node only builds its output; stage_output times
+    the work as it is consumed. Otherwise the call is timed, minus any
+    upstream streams it consumes.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(state):
+            if lazy and streaming_enabled():
+                return fn(state)
+            with timed_stage_call(name):
+                return fn(state)
+        return wrapper
+    return decorator
+
+def iter_windows(items: Iterable, window: int) -> Iterator[list]:
+    """Split items into lists of at most `window` items"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, window))
+        if not batch:
+            return
+        yield batch
+
+def map_windows(fn: Callable, items: Iterable, concurrency: int, window: int) -> Iterator:
+    """Lazily map fn over items in order, with at most `window` items in flight at a time"""
+    if concurrency <= 1:
+        yield from map(fn, items)
+        return
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight = deque()
+        for item in items:
+            in_flight.append(pool.submit(fn, item))
+            while in_flight and (len(in_flight) >= window or in_flight[0].done()):
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+@instrument_stage('stage.fetch_customers')
 def fetch_customers(state: EmailState) -> EmailState:
-    """Fetch customer data from S3"""
-    customers = read_customers_from_s3()
+    """Fetch customer data from S3
+    
+    CUSTOMER_SNAPSHOT_KEY reads a columnar snapshot through the local cache
+    instead of re-downloading and re-parsing customers.json. With SHARD_COUNT > 1
+    only this process's shard (SHARD_INDEX) is kept. With INCREMENTAL_DB set
+    only new or changed customers, or those past their cool-down, are passed on.
+    Profiles are handed on as slotted Customer records rather than dicts.
+    """
+    snapshot_key = os.environ.get('CUSTOMER_SNAPSHOT_KEY')
+    if snapshot_key:
+        # pyarrow is only loaded when snapshots are in use
+        from .snapshot import iter_customers_from_snapshot, read_customers_from_snapshot
+    
+    if streaming_enabled():
+        if snapshot_key:
+            return {"customers": stage_output(select_customers(map(Customer.from_dict, iter_customers_from_snapshot(snapshot_key))), 'stage.fetch_customers')}
+        return {"customers": stage_output(select_customers(map(Customer.from_dict, iter_customers_from_s3())), 'stage.fetch_customers')}
+    
+    if snapshot_key:
+        customers = read_customers_from_snapshot(snapshot_key)
+    else:
+        customers = read_customers_from_s3()
+    # In place, so each dict is freed as soon as its record exists
+    for i, customer in enumerate(customers):
+        customers[i] = Customer.from_dict(customer)
+    if shard_config()[1] > 1 or get_contact_index() is not None:
+        customers = list(select_customers(customers))
     return {"customers": customers}
 
-def create_emails(state: EmailState) -> EmailState:
-    """Use AgentCore to create personalized emails for each customer"""
-    emails = []
+def select_customers(customers: Iterable[dict]) -> Iterator[dict]:
+    """This shard's customers, minus those unchanged since their last email in incremental mode"""
+    customers = in_shard(customers)
+    index = get_contact_index()
+    if index is not None:
+        return index.iter_selected(customers)
+    return customers
+
+# Any of these turns the targeting stage on
+TARGETING_OPTIONS = ('TARGET_SEGMENTS', 'TARGET_MIN_DAYS', 'TARGET_MAX_DAYS', 'SUPPRESSION_FILES', 'RECIPIENT_DEDUP', 'FREQUENCY_CAP')
+
+def get_targeting():
+    """The shared Targeting, or None; numpy is only loaded when a targeting option is set"""
+    if not any(os.environ.get(name) for name in TARGETING_OPTIONS):
+        return None
+    from .targeting import get_targeting as shared_targeting
     
-    for customer in state["customers"]:
-        try:
-            # Use inline agent for email generation with discount
-            response = bedrock_agent.invoke_inline_agent(
-                inputText=f"""Generate personalized marketing email for restaurant customer:
-                {json.dumps(customer)}
-                
-                Determine appropriate discount (10-30%) based on their profile.
-                Return JSON: {{"subject": "...", "body": "...", "discount": "20"}}""",
-                
-                foundationModel='anthropic.claude-instant-v1',
-                
-                instruction="""You are a restaurant marketing agent. Create personalized emails 
-                that mention the customer's favorite dish and include an appropriate discount. 
-                Keep emails under 100 words, friendly and casual. Always return valid JSON.""",
-                
-                enableTrace=False,
-                sessionId=f"email-{customer['name'].replace(' ', '-')}"
-            )
-            
-            # Parse response
-            completion = response.get('completion', '{}')
-            email_data = json.loads(completion)
-            
-            emails.append({
-                "to": customer["email"],
-                "name": customer["name"],
-                "subject": email_data.get('subject', f"Special offer for {customer['name'].split()[0]}!"),
-                "body": email_data.get('body', f"Hi {customer['name'].split()[0]}, enjoy {email_data.get('discount', '20')}% off your next {customer['favorite_dish']}!")
-            })
-            
-            print(f"Generated email for {customer['name']} with {email_data.get('discount', '20')}% discount")
+    return shared_targeting()
+
+@instrument_stage('stage.target_customers')
+def target_customers(state: EmailState) -> EmailState:
+    """Keep only customers eligible for an email before any model call
+    
+    TARGET_SEGMENTS and TARGET_MIN_DAYS/TARGET_MAX_DAYS select by segment and
+    days_since_visit; SUPPRESSION_FILES, RECIPIENT_DEDUP and FREQUENCY_CAP
+    drop suppressed, repeated and over-mailed addresses. A pass-through when
+    none of them is set.
+    """
+    targeting = get_targeting()
+    if targeting is None:
+        return {"customers": state["customers"]}
+    
+    window = int(os.environ.get('CUSTOMER_WINDOW', '500'))
+    eligible = targeting.iter_eligible(state["customers"], window)
+    if streaming_enabled():
+        return {"customers": stage_output(eligible, 'stage.target_customers')}
+    return {"customers": list(eligible)}
+
+def fallback_email(customer: dict) -> Draft:
+    """Template email used when generation fails"""
+    first_name = customer['name'].split()[0]
+    return Draft(
+        to=customer["email"],
+        name=customer["name"],
+        subject=f"We miss you, {first_name}!",
+        body=f"Hi {first_name},\n\nIt's been {customer['days_since_visit']} days since you enjoyed our {customer['favorite_dish']}. Come back for 20% off!\n\nSee you soon!"
+    )
+
+GENERATION_MODEL = 'anthropic.claude-instant-v1'
+
+GENERATION_INSTRUCTION = """You are a restaurant marketing agent. Create personalized emails 
+            that mention the customer's favorite dish and include an appropriate discount. 
+            Keep emails under 100 words, friendly and casual. Always return valid JSON."""
+
+GENERATION_PROMPT = """Generate personalized marketing email for restaurant customer:
+            {customer}
             
+            Determine appropriate discount (10-30%) based on their profile.
+            Return JSON: {{"subject": "...", "body": "...", "discount": "20"}}"""
+
+def invoke_generation(metric: str, read: Callable = completion_text, **kwargs):
+    """Call Bedrock through the adaptive limiter and circuit breaker; returns read(completion)
+    
+    The completion stream is read inside the limiter slot, so the limit
+    covers the whole generation. Throttled calls shrink the limiter and are
+    retried with jittered backoff up to GENERATION_MAX_RETRIES times. Raises
+    CircuitOpenError without calling Bedrock while the breaker is open.
+    The breaker is asked once per call and told its final outcome, so a
+    half-open probe that gets throttled keeps its slot through the retries.
+    """
+    limiter = get_generation_limiter()
+    breaker = get_generation_breaker()
+    max_retries = int(os.environ.get('GENERATION_MAX_RETRIES', '3'))
+    if not breaker.allow():
+        inc('generation.short_circuited')
+        raise CircuitOpenError("Bedrock circuit breaker is open")
+    
+    attempt = 0
+    while True:
+        started = limiter.acquire() if limiter is not None else None
+        throttled = False
+        try:
+            with timed(metric):
+                response = get_client('bedrock-agent-runtime').invoke_inline_agent(**kwargs)
+                result = read(response.get('completion', ''))
+            breaker.record(True)
+            return result
+        except GenerationRejected:
+            # Bedrock answered; the answer was bad
+            breaker.record(True)
+            raise
         except Exception as e:
-            print(f"AgentCore error for {customer['name']}: {e}")
-            # Fallback email
-            emails.append({
-                "to": customer["email"],
-                "name": customer["name"],
-                "subject": f"We miss you, {customer['name'].split()[0]}!",
-                "body": f"Hi {customer['name'].split()[0]},\n\nIt's been {customer['days_since_visit']} days since you enjoyed our {customer['favorite_dish']}. Come back for 20% off!\n\nSee you soon!"
-            })
+            throttled = is_throttled(e)
+            if not throttled or attempt >= max_retries:
+                # Throttling is the limiter's job; the breaker counts failed calls
+                breaker.record(False)
+                raise
+            inc('generation.throttle_retries')
+        finally:
+            if limiter is not None:
+                limiter.release(started, throttled)
+        
+        time.sleep(random.uniform(0, min(5.0, 0.1 * 2 ** attempt)))
+        attempt += 1
+
+def email_from_generation(customer: dict, email_data: dict) -> Draft:
+    """Build a draft from the model's JSON, filling gaps from the customer profile"""
+    return Draft(
+        to=customer["email"],
+        name=customer["name"],
+        subject=email_data.get('subject', f"Special offer for {customer['name'].split()[0]}!"),
+        body=email_data.get('body', f"Hi {customer['name'].split()[0]}, enjoy {email_data.get('discount', '20')}% off your next {customer['favorite_dish']}!")
+    )
+
+@instrument('generate.email')
+def generate_email(customer: dict) -> Draft:
+    """Generate one personalized email with AgentCore, falling back to the template on error
+    
+    With GENERATION_CACHE_PATH set, unchanged profiles reuse the previous run's output.
+    With CAMPAIGN_ID set, a customer already drafted in this campaign is not generated again.
+    """
+    log = get_campaign_log()
+    if log is not None:
+        draft = log.get_draft(customer)
+        if draft is not None:
+            return draft
+    
+    email = _generate_email(customer)
+    if log is not None:
+        log.record_draft(customer, email)
+    return email
+
+def _generate_email(customer: dict) -> Draft:
+    cache = get_generation_cache()
+    key = None
+    if cache is not None:
+        key = cache_key(customer, GENERATION_PROMPT, GENERATION_INSTRUCTION, GENERATION_MODEL)
+        email_data = cache.get(key)
+        if email_data is not None:
+            return email_from_generation(customer, email_data)
+    
+    try:
+        # Use inline agent for email generation with discount
+        # The answer is validated while it streams and cut off if it goes wrong
+        email_data = invoke_generation(
+            'bedrock.invoke_inline_agent',
+            read=read_email_completion,
+            inputText=GENERATION_PROMPT.format(customer=json.dumps(dict(customer))),
+            foundationModel=GENERATION_MODEL,
+            instruction=GENERATION_INSTRUCTION,
+            enableTrace=False,
+            sessionId=f"email-{customer['name'].replace(' ', '-')}"
+        )
+        email = email_from_generation(customer, email_data)
+        
+        if cache is not None:
+            cache.put(key, email_data)
+        
+        print(f"Generated email for {customer['name']} with {email_data.get('discount', '20')}% discount")
+        return email
+        
+    except GenerationRejected as e:
+        print(f"Rejected generated email for {customer['name']}: {e}")
+        inc('generation.rejected')
+        inc('generation.fallbacks')
+        return fallback_email(customer)
+    except CircuitOpenError:
+        # Fast template path while Bedrock is failing; the breaker logs state changes
+        inc('generation.fallbacks')
+        return fallback_email(customer)
+    except Exception as e:
+        print(f"AgentCore error for {customer['name']}: {e}")
+        inc('generation.fallbacks')
+        return fallback_email(customer)
+
+GENERATION_BATCH_PROMPT = """Generate personalized marketing emails for these restaurant customers:
+            {customers}
+            
+            Determine appropriate discount (10-30%) for each customer based on their profile.
+            Return a JSON array with one object per customer, using the customer's id:
+            [{{"id": "0", "subject": "...", "body": "...", "discount": "20"}}]"""
+
+def valid_generation(item) -> bool:
+    """A generated email needs a non-empty subject and body"""
+    return (
+        isinstance(item, dict)
+        and isinstance(item.get('subject'), str) and item['subject'].strip() != ''
+        and isinstance(item.get('body'), str) and item['body'].strip() != ''
+    )
+
+@instrument('generate.batch')
+def generate_batch(customers: List[dict]) -> List[Draft]:
+    """Generate emails for several customers in one model call
+    
+    Items are validated as they stream in, like single emails. Items missing
+    from the model's array, or rejected, are regenerated one at a time with
+    generate_email. When the call as a whole fails (throttling, an open
+    breaker, any other error) the batch gets template emails instead, so a
+    struggling Bedrock isn't sent K more calls.
+    """
+    emails = [None] * len(customers)
+    keys = {}
+    pending = []
+    
+    cache = get_generation_cache()
+    log = get_campaign_log()
+    for i, customer in enumerate(customers):
+        if log is not None:
+            emails[i] = log.get_draft(customer)
+            if emails[i] is not None:
+                continue
+        if cache is not None:
+            keys[i] = cache_key(customer, GENERATION_BATCH_PROMPT, GENERATION_INSTRUCTION, GENERATION_MODEL)
+            email_data = cache.get(keys[i])
+            if email_data is not None:
+                emails[i] = email_from_generation(customer, email_data)
+                if log is not None:
+                    log.record_draft(customer, emails[i])
+                continue
+        pending.append(i)
+    
+    if not pending:
+        return emails
+    
+    generated = {}
+    try:
+        items = invoke_generation(
+            'bedrock.invoke_inline_agent.batch',
+            read=read_batch_completion,
+            inputText=GENERATION_BATCH_PROMPT.format(
+                customers=json.dumps([{"id": str(i), **customers[i]} for i in pending])
+            ),
+            foundationModel=GENERATION_MODEL,
+            instruction=GENERATION_INSTRUCTION,
+            enableTrace=False,
+            sessionId=f"email-batch-{uuid.uuid4().hex}"
+        )
+        generated = {str(item.get('id')): item for item in items}
+    except GenerationRejected as e:
+        # A bad answer, not a load problem: retry the customers one by one
+        print(f"Rejected generated batch for {len(pending)} customers: {e}")
+        inc('generation.rejected')
+    except Exception as e:
+        if not isinstance(e, CircuitOpenError):
+            print(f"AgentCore batch error for {len(pending)} customers: {e}")
+        inc('generation.fallbacks', len(pending))
+        for i in pending:
+            emails[i] = fallback_email(customers[i])
+            if log is not None:
+                log.record_draft(customers[i], emails[i])
+        return emails
+    
+    for i in pending:
+        item = generated.get(str(i))
+        if not valid_generation(item):
+            inc('generation.batch_retries')
+            emails[i] = generate_email(customers[i])
+            continue
+        emails[i] = email_from_generation(customers[i], item)
+        if cache is not None:
+            cache.put(keys[i], item)
+        if log is not None:
+            log.record_draft(customers[i], emails[i])
+        print(f"Generated email for {customers[i]['name']} with {item.get('discount', '20')}% discount")
+    
+    return emails
+
+@instrument_stage('stage.create_emails')
+def create_emails(state: EmailState) -> EmailState:
+    """Use AgentCore to create personalized emails for each customer
+    
+    GENERATION_CONCURRENCY > 1 fans the model calls out over a thread pool
+    (this shard's share of it when sharded);
+    emails come back in the same order as the customers. In streaming mode
+    the drafts are produced lazily, CUSTOMER_WINDOW customers at a time;
+    with PIPELINE_DEPTH set they are produced on a background thread while
+    send_emails is already sending.
+    GENERATION_MODE=template skips the model and uses the batch renderer.
+    GENERATION_BATCH_SIZE > 1 generates several customers per model call.
+    """
+    concurrency = generation_concurrency()
+    window = int(os.environ.get('CUSTOMER_WINDOW', '500'))
+    
+    if os.environ.get('GENERATION_MODE', 'model') == 'template':
+        # Model-free path: rule-based templates rendered in bulk (loads numpy)
+        from .renderer import render_emails
+        
+        if streaming_enabled():
+            emails = (email for batch in iter_windows(state["customers"], window) for email in render_emails(batch))
+            return {"emails_to_send": stage_output(emails, 'stage.create_emails')}
+        return {"emails_to_send": render_emails(state["customers"])}
+    
+    batch_size = int(os.environ.get('GENERATION_BATCH_SIZE', '1'))
+    if batch_size > 1:
+        # Pack GENERATION_BATCH_SIZE customers into each model call
+        batches = iter_windows(state["customers"], batch_size)
+        generated = map_windows(generate_batch, batches, concurrency, max(window // batch_size, 1))
+        emails = (email for batch in generated for email in batch)
+        return {"emails_to_send": stage_output(emails, 'stage.create_emails') if streaming_enabled() else list(emails)}
+    
+    if streaming_enabled():
+        return {"emails_to_send": stage_output(map_windows(generate_email, state["customers"], concurrency, window), 'stage.create_emails')}
+    
+    if concurrency <= 1:
+        emails = [generate_email(customer) for customer in state["customers"]]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            emails = list(pool.map(generate_email, state["customers"]))
     
     return {"emails_to_send": emails}
 
-def send_emails(state: EmailState) -> EmailState:
-    """Send all emails"""
+def sent_ok(result) -> bool:
+    """Whether a SendResult or send_email result string reports success"""
+    if isinstance(result, SendResult):
+        return result.ok
+    return result.startswith(('Email sent', 'Email logged'))
+
+@instrument('send.email')
+def deliver_email(email: dict) -> SendResult:
+    """Send one drafted email through the configured backend
+    
+    With CAMPAIGN_ID set, emails already sent in this campaign are skipped.
+    """
+    log = get_campaign_log()
+    if log is not None:
+        result = log.get_result(email)
+        if result is not None:
+            return result
+    
+    result = SendResult.parse(send_email(
+        to_email=email["to"],
+        subject=email["subject"],
+        body=email["body"],
+        customer_name=email["name"]
+    ), email["name"])
+    
+    inc('emails.sent' if result.ok else 'emails.failed')
+    if result.ok:
+        if log is not None:
+            log.record_result(email, result)
+        record_contacted([email])
+    return result
+
+def record_contacted(emails: List[dict]):
+    """Feed successful sends to the incremental index and the frequency caps"""
+    if not emails:
+        return
+    index = get_contact_index()
+    if index is not None:
+        index.record_contacted(emails)
+    targeting = get_targeting()
+    if targeting is not None:
+        targeting.record_sent(emails)
+
+def campaign_stats(sent: int, total: int) -> dict:
+    """Counters reported alongside the campaign results, starting with emails sent of total"""
+    stats = {"emails": {"sent": sent, "total": total}}
+    cache = get_generation_cache()
+    if cache is not None:
+        stats["generation_cache"] = cache.stats()
+    log = get_campaign_log()
+    if log is not None:
+        stats["campaign"] = {"id": log.campaign_id, **log.counts()}
+    index = get_contact_index()
+    if index is not None:
+        stats["incremental"] = index.stats()
+    targeting = get_targeting()
+    if targeting is not None:
+        stats["targeting"] = targeting.stats()
+    outbox = get_outbox()
+    if outbox is not None:
+        stats["outbox"] = outbox.counts()
+    breaker = get_generation_breaker()
+    if breaker.opened:
+        stats["generation_breaker"] = {"state": breaker.state, "opened": breaker.opened}
+    limiter = get_generation_limiter()
+    if limiter is not None and limiter.maximum > 1:
+        stats["generation_concurrency"] = {"limit": round(limiter.limit, 1), "max": limiter.maximum}
+    return stats
+
+@instrument('send.batch')
+def deliver_batch(emails: List[dict]) -> List[SendResult]:
+    """Send several drafted emails in one backend call, skipping any already sent in this campaign"""
+    log = get_campaign_log()
+    results = [log.get_result(email) if log is not None else None for email in emails]
+    pending = [i for i, result in enumerate(results) if result is None]
+    
+    if pending:
+        sent = send_email_batch([
+            {
+                "to_email": emails[i]["to"],
+                "subject": emails[i]["subject"],
+                "body": emails[i]["body"],
+                "customer_name": emails[i]["name"]
+            }
+            for i in pending
+        ])
+        for i, text in zip(pending, sent):
+            results[i] = result = SendResult.parse(text, emails[i]["name"])
+            inc('emails.sent' if result.ok else 'emails.failed')
+            if log is not None and result.ok:
+                log.record_result(emails[i], result)
+        record_contacted([emails[i] for i in pending if results[i].ok])
+    
+    return results
+
+@instrument('send.outbox')
+def deliver_claimed(emails: List[dict]) -> List[tuple]:
+    """Send emails claimed from the outbox; returns (result, ok) per email
+    
+    AgentCore errors come back as failures for the outbox to retry instead
+    of falling back to mock.
+    """
+    messages = [
+        {
+            "to_email": email["to"],
+            "subject": email["subject"],
+            "body": email["body"],
+            "customer_name": email["name"]
+        }
+        for email in emails
+    ]
+    if len(messages) == 1:
+        results = [send_email(**messages[0], fallback=False)]
+    else:
+        results = send_email_batch(messages, fallback=False)
+    
+    log = get_campaign_log()
+    outcomes = []
+    for email, result in zip(emails, results):
+        ok = sent_ok(result)
+        if ok:
+            inc('emails.sent')
+            if log is not None:
+                log.record_result(email, result)
+        outcomes.append((result, ok))
+    record_contacted([email for email, (_, ok) in zip(emails, outcomes) if ok])
+    return outcomes
+
+def send_through_outbox(outbox, emails: Iterable[dict]) -> EmailState:
+    """Queue the drafts in the outbox while its workers send them
+    
+    Enqueueing is a local SQLite write, so generation never waits on the
+    mail backend. After the last draft is queued the workers get up to
+    OUTBOX_DRAIN_TIMEOUT seconds to finish; anything still waiting for a
+    retry stays queued and is sent by the next run, as long as OUTBOX_DB
+    outlives the task.
+    """
+    concurrency = int(os.environ.get('SEND_CONCURRENCY', '1'))
+    window = int(os.environ.get('CUSTOMER_WINDOW', '500'))
+    batch_size = int(os.environ.get('EMAIL_BATCH_SIZE', '1'))
+    timeout = float(os.environ.get('OUTBOX_DRAIN_TIMEOUT', '60'))
+    
+    streaming = streaming_enabled()
+    log = get_campaign_log()
+    workers = OutboxWorkers(outbox, deliver_claimed, workers=concurrency, batch_size=batch_size).start()
     results = []
+    keys = []
+    names = []
+    skipped = 0
+    try:
+        for batch in iter_windows(emails, window):
+            queued = []
+            for email in batch:
+                # Already sent earlier in this campaign
+                result = log.get_result(email) if log is not None else None
+                if result is None:
+                    queued.append(email)
+                else:
+                    skipped += 1
+                if not streaming:
+                    results.append(result)
+            queued_keys = outbox.enqueue(queued)
+            if not streaming:
+                keys.extend(queued_keys)
+                names.extend(email["name"] for email in queued)
+        if not workers.drain(timeout):
+            print(f"⚠️  Outbox not drained after {timeout:g}s; remaining emails stay queued in {outbox.path} "
+                  f"for the next run, which only finds them if that file is on persistent storage")
+    finally:
+        workers.stop()
     
-    for email in state["emails_to_send"]:
-        result = send_email(
-            to_email=email["to"],
-            subject=email["subject"],
-            body=email["body"],
-            customer_name=email["name"]
-        )
-        results.append(result)
+    if not streaming:
+        outcomes = map(SendResult.parse, outbox.results(keys), names)
+        results = [result if result is not None else next(outcomes) for result in results]
+        return {"results": results, "stats": campaign_stats(sum(result.ok for result in results), len(results))}
     
-    return {"results": results}
+    # Keep memory flat: only failures and a summary line are kept
+    sent, total, unsent = outbox.run_summary()
+    results = [SendResult.parse(text) for text in unsent]
+    results.append(SendResult.summary(sent + skipped, total + skipped))
+    return {"results": results, "stats": campaign_stats(sent + skipped, total + skipped)}
+
+@instrument_stage('stage.send_emails', lazy=False)
+def send_emails(state: EmailState) -> EmailState:
+    """Send all emails
+    
+    SEND_CONCURRENCY > 1 sends over a thread pool; the SES backend paces
+    the pool to the account's MaxSendRate. EMAIL_BATCH_SIZE > 1 hands the
+    backend that many emails per call (one agent invocation on agentcore).
+    With OUTBOX_DB set the emails go through the durable outbox instead.
+    """
+    outbox = get_outbox()
+    if outbox is not None:
+        return send_through_outbox(outbox, state["emails_to_send"])
+    
+    concurrency = int(os.environ.get('SEND_CONCURRENCY', '1'))
+    window = int(os.environ.get('CUSTOMER_WINDOW', '500'))
+    batch_size = int(os.environ.get('EMAIL_BATCH_SIZE', '1'))
+    
+    if batch_size > 1:
+        batches = iter_windows(state["emails_to_send"], batch_size)
+        sent = map_windows(deliver_batch, batches, concurrency, max(window // batch_size, 1))
+        outcomes = (result for batch in sent for result in batch)
+    else:
+        outcomes = map_windows(deliver_email, state["emails_to_send"], concurrency, window)
+    
+    if not streaming_enabled():
+        results = list(outcomes)
+        return {"results": results, "stats": campaign_stats(sum(result.ok for result in results), len(results))}
+    
+    # Keep memory flat: only failures and a summary line are kept
+    results = []
+    sent_count = total = 0
+    for result in outcomes:
+        total += 1
+        if result.ok:
+            sent_count += 1
+        else:
+            results.append(result)
+    results.append(SendResult.summary(sent_count, total))
+    return {"results": results, "stats": campaign_stats(sent_count, total)}
 
 # Build the graph
-def create_email_graph():
+def create_email_graph(checkpointer=None):
+    from langgraph.graph import StateGraph, END
+    
     workflow = StateGraph(EmailState)
     
     # Add nodes
     workflow.add_node("fetch_customers", fetch_customers)
+    workflow.add_node("target_customers", target_customers)
     workflow.add_node("create_emails", create_emails)
     workflow.add_node("send_emails", send_emails)
     
     # Add edges
     workflow.set_entry_point("fetch_customers")
-    workflow.add_edge("fetch_customers", "create_emails")
+    workflow.add_edge("fetch_customers", "target_customers")
+    workflow.add_edge("target_customers", "create_emails")
     workflow.add_edge("create_emails", "send_emails")
     workflow.add_edge("send_emails", END)
     
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile(checkpointer=checkpointer)
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Incremental campaigns
+A per-customer fingerprint and last-contacted time, so a daily run only handles customers that changed
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+from .email_cache import normalize_profile
+from .sharding import shard_path
+
+# Keys per SELECT ... IN (...) lookup
+LOOKUP_BATCH = 500
+
+
+def contact_key(email: str, name: str) -> bytes:
+    """Stable customer identity (same normalization as the campaign idempotency key)"""
+    return hashlib.blake2b(f"{email.strip().lower()}\0{name.strip()}".encode(), digest_size=16).digest()
+
+
+def fingerprint(customer: dict) -> bytes:
+    """Hash of the profile fields that decide the email (recency is bucketed, as in the generation cache)"""
+    payload = json.dumps(normalize_profile(customer), sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode(), digest_size=8).digest()
+
+
+class ContactIndex:
+    """
+    SQLite index of each customer's fingerprint and last successful send
+
+    select() keeps customers that are new, whose fingerprint changed, or
+    whose last email is older than `cooldown` seconds, and remembers their
+    new fingerprint as pending. record_contacted() promotes it once the
+    email is sent, so a failed send is retried on the next run.
+    """
+
+    def __init__(self, path: str, cooldown: float):
+        self.path = path
+        self.cooldown = cooldown
+        self.counts = {'scanned': 0, 'new': 0, 'changed': 0, 'expired': 0, 'unchanged': 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS contacts ('
+            'key BLOB PRIMARY KEY, fingerprint BLOB, pending BLOB, last_contacted REAL) WITHOUT ROWID'
+        )
+        self._db.commit()
+
+    def select(self, customers: List[dict]) -> List[dict]:
+        """The customers in this batch that need an email on this run"""
+        keys = [contact_key(c['email'], c['name']) for c in customers]
+        with self._lock:
+            rows = {}
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                chunk = keys[start:start + LOOKUP_BATCH]
+                rows.update(
+                    (key, (fp, last)) for key, fp, last in self._db.execute(
+                        'SELECT key, fingerprint, last_contacted FROM contacts '
+                        f'WHERE key IN ({",".join("?" * len(chunk))})',
+                        chunk
+                    )
+                )
+
+        now = time.time()
+        selected = []
+        pending = []
+        counts = dict.fromkeys(self.counts, 0)
+        for customer, key in zip(customers, keys):
+            fp = fingerprint(customer)
+            row = rows.get(key)
+            if row is None or row[0] is None:
+                reason = 'new'
+            elif row[0] != fp:
+                reason = 'changed'
+            elif row[1] is None or now - row[1] >= self.cooldown:
+                reason = 'expired'
+            else:
+                counts['unchanged'] += 1
+                continue
+            counts[reason] += 1
+            selected.append(customer)
+            pending.append((key, fp))
+        counts['scanned'] = len(customers)
+
+        with self._lock:
+            if pending:
+                self._db.executemany(
+                    'INSERT INTO contacts (key, pending) VALUES (?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET pending = excluded.pending',
+                    pending
+                )
+                self._db.commit()
+            for name, n in counts.items():
+                self.counts[name] += n
+        return selected
+
+    def iter_selected(self, customers: Iterable[dict], window: int = LOOKUP_BATCH) -> Iterator[dict]:
+        customers = iter(customers)
+        while True:
+            batch = list(islice(customers, window))
+            if not batch:
+                return
+            yield from self.select(batch)
+
+    def record_contacted(self, emails: List[dict]):
+        """Mark drafted emails (dicts with to and name) as sent now"""
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                'UPDATE contacts SET fingerprint = COALESCE(pending, fingerprint), pending = NULL, '
+                'last_contacted = ? WHERE key = ?',
+                [(now, contact_key(email['to'], email['name'])) for email in emails]
+            )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_contact_index() -> Optional[ContactIndex]:
+    """Index at INCREMENTAL_DB, or None when incremental mode is off"""
+    global _index
+    path = os.environ.get('INCREMENTAL_DB')
+    if not path:
+        return None
+    path = shard_path(path)
+    cooldown = float(os.environ.get('CONTACT_COOLDOWN_DAYS', '30')) * 86400
+    with _index_lock:
+        if _index is None or _index.path != path or _index.cooldown != cooldown:
+            _index = ContactIndex(path, cooldown)
+        return _index
+
+
+def reset_contact_index():
+    """Drop the shared index (benchmarks run several campaigns per process)"""
+    global _index
+    with _index_lock:
+        _index = None
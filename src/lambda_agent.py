@@ -1,5 +1,32 @@
 import json
 
+# Discount by customer segment
+DISCOUNT_MAP = {
+    're-engagement': '25',  # Higher for win-back
+    'loyal': '20',          # Moderate for loyal
+    'new_customer': '30'    # Highest for acquisition
+}
+DEFAULT_DISCOUNT = '20'
+MAX_DISCOUNT = 30
+LAPSED_DAYS = 60     # Customers away longer than this get a bump
+LAPSED_BONUS = 5
+
+# (subject, body) templates by segment
+TEMPLATES = {
+    're-engagement': (
+        "We miss your {favorite}, {first_name}!",
+        "Hi {first_name},\n\nIt's been {days_since} days since you enjoyed our {favorite}. Come back for {discount}% off! We've missed you.\n\nSee you soon!"
+    ),
+    'loyal': (
+        "VIP {discount}% off for {first_name} 🎉",
+        "Hi {first_name},\n\nAs a loyal customer with {visit_count} visits, enjoy {discount}% off your next {favorite}!\n\nThank you for being awesome!"
+    )
+}
+DEFAULT_TEMPLATE = (
+    "Come back soon, {first_name}!",
+    "Hi {first_name},\n\nWe loved serving you! Bring friends and get {discount}% off your group's meal.\n\nHope to see you again!"
+)
+
 def lambda_handler(event, context):
     """
     Lambda handler for Bedrock Agent email generation
@@ -9,33 +36,28 @@ def lambda_handler(event, context):
     customer = agent_input.get('customer', {})
     
     # Determine discount based on customer segment
-    discount_map = {
-        're-engagement': '25',  # Higher for win-back
-        'loyal': '20',          # Moderate for loyal
-        'new_customer': '30'    # Highest for acquisition
-    }
-    
     segment = customer.get('segment', 'new_customer')
-    discount = discount_map.get(segment, '20')
+    discount = DISCOUNT_MAP.get(segment, DEFAULT_DISCOUNT)
     
     # Adjust based on days since visit
     days_since = customer.get('days_since_visit', 0)
-    if days_since > 60:
-        discount = str(min(int(discount) + 5, 30))
+    if days_since > LAPSED_DAYS:
+        discount = str(min(int(discount) + LAPSED_BONUS, MAX_DISCOUNT))
     
     # Generate email
     first_name = customer.get('name', 'Valued Customer').split()[0]
     favorite = customer.get('favorite_dish', 'your favorite dish')
     
-    if segment == 're-engagement':
-        subject = f"We miss your {favorite}, {first_name}!"
-        body = f"Hi {first_name},\n\nIt's been {days_since} days since you enjoyed our {favorite}. Come back for {discount}% off! We've missed you.\n\nSee you soon!"
-    elif segment == 'loyal':
-        subject = f"VIP {discount}% off for {first_name} 🎉"
-        body = f"Hi {first_name},\n\nAs a loyal customer with {customer.get('visit_count', 0)} visits, enjoy {discount}% off your next {favorite}!\n\nThank you for being awesome!"
-    else:
-        subject = f"Come back soon, {first_name}!"
-        body = f"Hi {first_name},\n\nWe loved serving you! Bring friends and get {discount}% off your group's meal.\n\nHope to see you again!"
+    subject_template, body_template = TEMPLATES.get(segment, DEFAULT_TEMPLATE)
+    fields = {
+        'first_name': first_name,
+        'favorite': favorite,
+        'days_since': days_since,
+        'visit_count': customer.get('visit_count', 0),
+        'discount': discount
+    }
+    subject = subject_template.format(**fields)
+    body = body_template.format(**fields)
     
     # Return formatted response for agent
     return {
@@ -0,0 +1,184 @@
+"""
+Adaptive concurrency and circuit breaking for model calls
+An AIMD limiter backs off on throttling; a circuit breaker stops calling a failing service
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from .ses_sender import THROTTLING_CODES
+from .sharding import size_share
+
+
+def is_throttled(error: Exception) -> bool:
+    """True for service-side throttling (botocore error code, or the code in the message)"""
+    response = getattr(error, 'response', None) or {}
+    code = response.get('Error', {}).get('Code', '')
+    return code in THROTTLING_CODES or any(name in str(error) for name in THROTTLING_CODES)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a service whose circuit breaker is open"""
+
+
+class AIMDLimiter:
+    """
+    Limit calls in flight, adjusting the limit by AIMD
+
+    Each success adds 1/limit (about +1 per round of calls); a throttled
+    call halves the limit, at most once per observed call latency so one
+    burst of throttles only backs off once.
+    """
+
+    def __init__(self, maximum: int, minimum: int = 1, initial: Optional[float] = None, backoff: float = 0.5):
+        self.maximum = max(maximum, 1)
+        self.minimum = max(min(minimum, self.maximum), 1)
+        self.limit = float(initial or self.maximum)
+        self.backoff = backoff
+        self.in_flight = 0
+        self._latency = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> float:
+        """Wait for a free slot; returns the start time to pass to release"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        return time.monotonic()
+
+    def release(self, started: float, throttled: bool = False):
+        now = time.monotonic()
+        with self._cond:
+            self.in_flight -= 1
+            self._latency = 0.8 * self._latency + 0.2 * (now - started) if self._latency else now - started
+            if throttled:
+                if now - self._last_decrease >= self._latency:
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """
+    Open when the error rate over the last `window` calls reaches `threshold`
+
+    While open, allow() is False and callers take their fallback path. After
+    `cooldown` seconds one probe call is let through (half-open): success
+    closes the circuit, failure opens it for another cooldown.
+    """
+
+    def __init__(self, threshold: float = 0.5, window: int = 50, min_calls: int = 20, cooldown: float = 30.0, name: str = 'service'):
+        self.threshold = threshold
+        self.min_calls = min(min_calls, window)
+        self.cooldown = cooldown
+        self.name = name
+        self.state = 'closed'
+        self.opened = 0
+        self._outcomes = deque(maxlen=window)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False
+                self.state = 'half_open'
+                self._probing = False
+            if self.state == 'half_open':
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record(self, ok: bool):
+        with self._lock:
+            if self.state == 'half_open':
+                self._probing = False
+                if ok:
+                    print(f"✅ {self.name} recovered, closing circuit breaker")
+                    self.state = 'closed'
+                    self._outcomes.clear()
+                    self._failures = 0
+                else:
+                    self._open()
+                return
+            if self.state == 'open':
+                return
+
+            if len(self._outcomes) == self._outcomes.maxlen and not self._outcomes[0]:
+                self._failures -= 1
+            self._outcomes.append(ok)
+            if not ok:
+                self._failures += 1
+            if len(self._outcomes) >= self.min_calls and self._failures / len(self._outcomes) >= self.threshold:
+                print(f"⚠️  {self.name} error rate {self._failures / len(self._outcomes):.0%}, "
+                      f"opening circuit breaker for {self.cooldown:g}s")
+                self._open()
+
+    def _open(self):
+        self.state = 'open'
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._failures = 0
+
+
+_limiter = None
+_limiter_key = None
+_breaker = None
+_breaker_key = None
+_lock = threading.Lock()
+
+
+def generation_concurrency() -> int:
+    """This shard's share of GENERATION_CONCURRENCY, which counts Bedrock calls in flight across all shards"""
+    return size_share(int(os.environ.get('GENERATION_CONCURRENCY', '1')))
+
+
+def get_generation_limiter() -> Optional[AIMDLimiter]:
+    """Shared limiter for Bedrock generation, capped at generation_concurrency(); None when GENERATION_ADAPTIVE=false"""
+    global _limiter, _limiter_key
+    if os.environ.get('GENERATION_ADAPTIVE', 'true').lower() == 'false':
+        return None
+    key = (
+        generation_concurrency(),
+        int(os.environ.get('GENERATION_MIN_CONCURRENCY', '1'))
+    )
+    with _lock:
+        if _limiter is None or _limiter_key != key:
+            _limiter = AIMDLimiter(maximum=key[0], minimum=key[1])
+            _limiter_key = key
+        return _limiter
+
+
+def get_generation_breaker() -> CircuitBreaker:
+    """Shared circuit breaker for Bedrock generation"""
+    global _breaker, _breaker_key
+    key = (
+        float(os.environ.get('GENERATION_BREAKER_THRESHOLD', '0.5')),
+        int(os.environ.get('GENERATION_BREAKER_WINDOW', '50')),
+        float(os.environ.get('GENERATION_BREAKER_COOLDOWN', '30'))
+    )
+    with _lock:
+        if _breaker is None or _breaker_key != key:
+            threshold, window, cooldown = key
+            _breaker = CircuitBreaker(threshold, window, min_calls=min(20, window), cooldown=cooldown, name='Bedrock')
+            _breaker_key = key
+        return _breaker
+
+
+def reset_generation_control():
+    """Drop the shared limiter and breaker (benchmarks run several campaigns per process)"""
+    global _limiter, _breaker
+    with _lock:
+        _limiter = None
+        _breaker = None
@@ -0,0 +1,316 @@
+"""
+Campaign instrumentation
+Latency histograms and counters for graph stages and external calls, reported as JSON or OpenMetrics
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from functools import wraps
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Histogram bucket upper bounds in seconds: 1 us to ~18 min, a factor of 2**0.25 apart
+BUCKETS = tuple(1e-6 * 2 ** (i / 4) for i in range(121))
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram
+
+    Observing is a bisect and a few additions; quantiles are interpolated
+    inside a bucket (within ~19%). Fixed buckets merge exactly across shards.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(max(lower + (upper - lower) * (rank - seen) / n, self.min), self.max)
+            seen += n
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {'counts': list(self.counts), 'count': self.count, 'sum': self.sum, 'min': self.min, 'max': self.max}
+
+    def merge(self, data: dict):
+        for i, n in enumerate(data['counts']):
+            self.counts[i] += n
+        self.count += data['count']
+        self.sum += data['sum']
+        self.min = min(self.min, data['min'])
+        self.max = max(self.max, data['max'])
+
+
+class Metrics:
+    """Thread-safe registry of named histograms and counters"""
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, float] = {}
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, amount: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def timer(self, name: str) -> '_Timer':
+        """Time a block as `name`; exceptions also count towards `name.errors`"""
+        return _Timer(self, name)
+
+    def snapshot(self) -> dict:
+        """Raw state, for merging shard metrics in the parent process"""
+        with self._lock:
+            return {
+                'started': self.started,
+                'histograms': {name: h.to_dict() for name, h in self.histograms.items()},
+                'counters': dict(self.counters)
+            }
+
+    def merge(self, snapshot: dict):
+        with self._lock:
+            self.started = min(self.started, snapshot['started'])
+            for name, data in snapshot['histograms'].items():
+                self.histograms.setdefault(name, Histogram()).merge(data)
+            for name, value in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self) -> dict:
+        """Per-call latency percentiles (ms), throughput and counters"""
+        with self._lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            calls = {}
+            for name, h in sorted(self.histograms.items()):
+                calls[name] = {
+                    'count': h.count,
+                    'errors': int(self.counters.get(f"{name}.errors", 0)),
+                    'per_second': round(h.count / elapsed, 3),
+                    'mean_ms': round(h.sum / h.count * 1000, 3) if h.count else 0.0,
+                    'p50_ms': round(h.quantile(0.50) * 1000, 3),
+                    'p95_ms': round(h.quantile(0.95) * 1000, 3),
+                    'p99_ms': round(h.quantile(0.99) * 1000, 3),
+                    'max_ms': round(h.max * 1000, 3)
+                }
+            counters = {
+                name: value for name, value in sorted(self.counters.items())
+                if not (name.endswith('.errors') and name[:-len('.errors')] in self.histograms)
+            }
+        return {'elapsed_s': round(elapsed, 3), 'calls': calls, 'counters': counters}
+
+    def openmetrics(self) -> str:
+        """OpenMetrics text exposition (histograms in seconds, cumulative buckets)"""
+        lines: List[str] = []
+        with self._lock:
+            for name, h in sorted(self.histograms.items()):
+                metric = 'campaign_' + _metric_name(name) + '_seconds'
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, n in zip(BUCKETS, h.counts):
+                    cumulative += n
+                    if n:
+                        lines.append(f'{metric}_bucket{{le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {h.count}')
+                lines.append(f"{metric}_count {h.count}")
+                lines.append(f"{metric}_sum {h.sum:.6f}")
+            for name, value in sorted(self.counters.items()):
+                metric = 'campaign_' + _metric_name(name)
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric}_total {value:g}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics: Metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.metrics.inc(f"{self.name}.errors")
+        return False
+
+
+class _StageTimer:
+    """Times a block, minus the time spent in stage timers nested inside it on the same thread"""
+
+    __slots__ = ('start', 'outer', 'own')
+
+    def __enter__(self):
+        self.outer = getattr(_stage_time, 'nested', 0.0)
+        _stage_time.nested = 0.0
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        self.own = elapsed - _stage_time.nested
+        _stage_time.nested = self.outer + elapsed
+        return False
+
+
+def _metric_name(name: str) -> str:
+    return ''.join(c if c.isalnum() else '_' for c in name)
+
+
+_metrics = Metrics()
+_stage_time = threading.local()
+_END = object()
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+
+def reset_metrics():
+    """Start a fresh registry (benchmarks run several campaigns per process)"""
+    global _metrics
+    _metrics = Metrics()
+
+
+def timed(name: str):
+    """Context manager timing a block into the shared registry"""
+    return _metrics.timer(name)
+
+
+def timed_stage(items: Iterable, name: Optional[str]) -> Iterator:
+    """
+    Iterate `items`, timing the work of producing them as one `name` observation
+
+    Meant for a graph stage's lazy output: the stage's work happens as it
+    is consumed, not when the node returns. Time spent pulling from an
+    upstream timed_stage is left out, so each stage is charged only its
+    own work. name=None times nothing but is still left out upstream (a
+    queue wait between pipelined stages). Observed once, when the
+    iteration ends.
+    """
+    iterator = iter(items)
+    total = 0.0
+    try:
+        while True:
+            timer = _StageTimer()
+            with timer:
+                item = next(iterator, _END)
+            total += timer.own
+            if item is _END:
+                return
+            yield item
+    finally:
+        if name is not None:
+            _metrics.observe(name, total)
+
+
+def timed_stage_call(name: str):
+    """Context manager timing a block as `name`, minus the time spent in timed_stage iterators it consumes"""
+    return _StageCall(name)
+
+
+class _StageCall(_StageTimer):
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __exit__(self, exc_type, exc, tb):
+        _StageTimer.__exit__(self, exc_type, exc, tb)
+        _metrics.observe(self.name, self.own)
+        if exc_type is not None:
+            _metrics.inc(f"{self.name}.errors")
+        return False
+
+
+def inc(name: str, amount: float = 1):
+    _metrics.inc(name, amount)
+
+
+def instrument(name: str):
+    """Decorator timing every call of a function as `name`"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _metrics.timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def write_report(path: Optional[str] = None) -> Optional[str]:
+    """Write the JSON report to `path` or METRICS_REPORT; returns the path written"""
+    path = path or os.environ.get('METRICS_REPORT')
+    if not path:
+        return None
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(_metrics.report(), f, indent=2)
+    return path
+
+
+def serve_metrics(port: Optional[int] = None):
+    """Serve /metrics in OpenMetrics format on METRICS_PORT from a daemon thread"""
+    global _server
+    port = port if port is not None else int(os.environ.get('METRICS_PORT', '0') or 0)
+    if not port:
+        return None
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = _metrics.openmetrics().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/openmetrics-text; version=1.0.0; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(('0.0.0.0', port), Handler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            print(f"📈 Metrics at http://localhost:{port}/metrics")
+        return _server
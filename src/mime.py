@@ -0,0 +1,130 @@
+"""
+Bulk MIME message builder
+Precompiles the constant part of a campaign's messages and splices in each recipient's fields as bytes
+"""
+import base64
+import os
+import random
+import re
+import sys
+import threading
+from email import quoprimime
+from email.policy import compat32
+from email.utils import getaddresses
+from typing import Optional
+
+# What smtplib.send_message flattens with: compat32 folding, CRLF line ends
+POLICY = compat32.clone(linesep='\r\n')
+
+# Same format as email.generator's random boundaries
+BOUNDARY_WIDTH = len(repr(sys.maxsize - 1))
+
+# Plain ASCII addr-spec; anything else (display names, SMTPUTF8) is left to the email package
+SIMPLE_ADDRESS = re.compile(r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~.-]+@[A-Za-z0-9.-]+")
+
+# Generator quirks reproduced on the body: mangle_from_ (on in compat32) and CRLF line ends
+FROM_LINE = re.compile(r'^From ', re.MULTILINE)
+NEWLINE = re.compile(r'\r\n|\r|\n')
+
+PLAIN_ASCII = b'Content-Type: text/plain; charset="us-ascii"\r\nMIME-Version: 1.0\r\nContent-Transfer-Encoding: 7bit\r\n\r\n'
+PLAIN_UTF8 = b'Content-Type: text/plain; charset="utf-8"\r\nMIME-Version: 1.0\r\nContent-Transfer-Encoding: base64\r\n\r\n'
+
+# Longest header value compat32 writes unfolded on the "Subject: " line, and
+# the longest encoded-word payload that still fits (=?utf-8?b?...?= adds 12)
+SUBJECT_LIMIT = 78 - len('Subject: ')
+ENCODED_WORD_LIMIT = SUBJECT_LIMIT - len('=?utf-8?b??=')
+
+
+def make_boundary() -> str:
+    return '=' * 15 + str(random.randrange(sys.maxsize)).zfill(BOUNDARY_WIDTH) + '=='
+
+
+def mime_message(sender: str, to_email: str, subject: str, body: str):
+    """The MIMEMultipart tree send_email used to build per message"""
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+
+class MessageBuilder:
+    """
+    Ready-to-send message bytes for one sender
+
+    build() returns what smtplib.send_message would put on the wire for
+    mime_message(), byte for byte apart from the random boundary: the
+    same headers, folding, charset choice and body encoding. The sender
+    header, part headers and encoding policy are worked out once; each
+    message only splices in its boundary, To, Subject and body.
+    Addresses that aren't a plain ASCII addr-spec need the email package
+    (supports() is False).
+    """
+
+    def __init__(self, sender: str):
+        self.sender = sender
+        self.envelope_from = getaddresses([sender])[0][1]
+        self._simple = sender.isascii()
+        self._from = POLICY.fold_binary('From', sender)
+
+    def supports(self, to_email: str) -> bool:
+        return self._simple and to_email.isascii() and SIMPLE_ADDRESS.fullmatch(to_email) is not None
+
+    def subject_header(self, subject: str) -> bytes:
+        if subject.isascii():
+            if len(subject) <= SUBJECT_LIMIT and subject.isprintable() and subject == subject.strip():
+                return b'Subject: ' + subject.encode() + b'\r\n'
+        elif subject.isprintable():
+            raw = subject.encode('utf-8', 'surrogateescape')
+            # compat32 picks base64 only when it is strictly shorter
+            b64 = (len(raw) + 2) // 3 * 4
+            qp = quoprimime.header_length(raw)
+            if min(b64, qp) <= ENCODED_WORD_LIMIT:
+                if b64 < qp:
+                    word = '=?utf-8?b?' + base64.b64encode(raw).decode() + '?='
+                else:
+                    word = quoprimime.header_encode(raw, 'utf-8')
+                return b'Subject: ' + word.encode() + b'\r\n'
+        return POLICY.fold_binary('Subject', subject)
+
+    def build(self, to_email: str, subject: str, body: str, boundary: Optional[str] = None) -> bytes:
+        if body.isascii():
+            part = PLAIN_ASCII
+            payload = NEWLINE.sub('\r\n', FROM_LINE.sub('>From ', body)).encode()
+        else:
+            part = PLAIN_UTF8
+            payload = base64.encodebytes(body.encode('utf-8')).replace(b'\n', b'\r\n')
+
+        boundary = (boundary or make_boundary()).encode()
+        if b'--' + boundary in payload:
+            # The email package would pick another boundary; so do we
+            return self.build(to_email, subject, body)
+
+        if len(to_email) <= 74 and self.supports(to_email):
+            to = b'To: ' + to_email.encode() + b'\r\n'
+        else:
+            to = POLICY.fold_binary('To', to_email)
+
+        return b''.join((
+            b'Content-Type: multipart/mixed; boundary="', boundary, b'"\r\nMIME-Version: 1.0\r\n',
+            self._from, to, self.subject_header(subject),
+            b'\r\n--', boundary, b'\r\n', part, payload, b'\r\n--', boundary, b'--\r\n'
+        ))
+
+
+_builder = None
+_builder_lock = threading.Lock()
+
+
+def get_message_builder() -> MessageBuilder:
+    """Shared builder for SENDER_EMAIL"""
+    global _builder
+    sender = os.environ.get('SENDER_EMAIL', 'noreply@restaurant.com')
+    with _builder_lock:
+        if _builder is None or _builder.sender != sender:
+            _builder = MessageBuilder(sender)
+        return _builder
@@ -0,0 +1,268 @@
+"""
+Durable send outbox
+Drafted emails are queued in SQLite and sent by a worker pool that retries failures with backoff
+"""
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, List, Optional
+
+from .metrics import inc
+from .sharding import shard_path
+
+# Failures that will not succeed on a retry
+PERMANENT_ERRORS = ('MessageRejected', 'InvalidParameterValue', 'Unknown email backend', 'SMTPRecipientsRefused')
+
+# One id per process, so runs without a CAMPAIGN_ID never collide
+RUN_ID = uuid.uuid4().hex
+
+
+def outbox_key(email: dict) -> str:
+    """One row per (campaign, customer); a rerun of a campaign doesn't queue the same email twice"""
+    campaign_id = os.environ.get('CAMPAIGN_ID') or RUN_ID
+    identity = f"{campaign_id}\0{email['to'].strip().lower()}\0{email['name'].strip()}"
+    return hashlib.blake2b(identity.encode(), digest_size=16).hexdigest()
+
+
+def is_permanent(result: str) -> bool:
+    return any(code in result for code in PERMANENT_ERRORS)
+
+
+class Outbox:
+    """
+    SQLite queue of rendered emails
+
+    Each row is pending, sending, sent or failed, with an attempt count and
+    the time it may next be tried. claim() leases due rows by pushing their
+    next attempt `lease` seconds out, so rows held by a worker that died are
+    picked up again once the lease runs out.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 5, retry_base: float = 1.0,
+                 retry_max: float = 300.0, lease: float = 300.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.lease = lease
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS outbox ('
+            'key TEXT PRIMARY KEY, to_email TEXT NOT NULL, name TEXT NOT NULL, subject TEXT NOT NULL, '
+            'body TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+            'next_attempt REAL NOT NULL, result TEXT, run TEXT)'
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS outbox_due ON outbox (next_attempt) WHERE status IN ('pending', 'sending')"
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS outbox_run ON outbox (run)')
+        self._db.commit()
+
+    def enqueue(self, emails: List[dict], run: str = RUN_ID) -> List[str]:
+        """
+        Queue drafted emails (dicts with to, name, subject, body); returns their keys
+
+        An email already in the outbox keeps its row and status and is
+        tagged with this run, so run_summary() reports it.
+        """
+        keys = [outbox_key(email) for email in emails]
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                'INSERT INTO outbox (key, to_email, name, subject, body, status, next_attempt, run) '
+                "VALUES (?, ?, ?, ?, ?, 'pending', ?, ?) ON CONFLICT(key) DO UPDATE SET run = excluded.run",
+                [(key, e['to'], e['name'], e['subject'], e['body'], now, run) for key, e in zip(keys, emails)]
+            )
+            self._db.commit()
+            self._ready.notify_all()
+        return keys
+
+    def claim(self, limit: int) -> List[dict]:
+        """Lease up to `limit` due emails"""
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                'UPDATE outbox SET status = ?, next_attempt = ?, attempts = attempts + 1 WHERE key IN ('
+                "SELECT key FROM outbox WHERE status IN ('pending', 'sending') AND next_attempt <= ? "
+                'ORDER BY next_attempt LIMIT ?) RETURNING key, to_email, name, subject, body, attempts',
+                ('sending', now + self.lease, now, limit)
+            ).fetchall()
+            self._db.commit()
+        return [
+            {'key': key, 'to': to, 'name': name, 'subject': subject, 'body': body, 'attempts': attempts}
+            for key, to, name, subject, body, attempts in rows
+        ]
+
+    def complete(self, email: dict, result: str, ok: bool) -> str:
+        """Record one attempt; returns the row's new status"""
+        if ok:
+            status, next_attempt = 'sent', 0.0
+        elif email['attempts'] >= self.max_attempts or is_permanent(result):
+            status, next_attempt = 'failed', 0.0
+        else:
+            # Full jitter so retries after an outage don't arrive together
+            status = 'pending'
+            next_attempt = time.time() + random.uniform(0, min(self.retry_max, self.retry_base * 2 ** email['attempts']))
+        with self._lock:
+            self._db.execute(
+                'UPDATE outbox SET status = ?, next_attempt = ?, result = ? WHERE key = ?',
+                (status, next_attempt, result, email['key'])
+            )
+            self._db.commit()
+            if status == 'pending':
+                self._ready.notify_all()
+        return status
+
+    def wait(self, timeout: float):
+        """Sleep until something is queued or retried, or `timeout` passes"""
+        with self._lock:
+            self._ready.wait(timeout)
+
+    def wake(self):
+        with self._lock:
+            self._ready.notify_all()
+
+    def next_due(self) -> Optional[float]:
+        """Seconds until the next queued email is due, or None when nothing is queued"""
+        with self._lock:
+            due, = self._db.execute(
+                "SELECT MIN(next_attempt) FROM outbox WHERE status IN ('pending', 'sending')"
+            ).fetchone()
+        return None if due is None else max(due - time.time(), 0.0)
+
+    def results(self, keys: List[str], batch: int = 500) -> List[str]:
+        """Outcome of each key so far, as send_email-style strings"""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), batch):
+                chunk = keys[start:start + batch]
+                found.update(
+                    (key, (status, attempts, result)) for key, status, attempts, result in self._db.execute(
+                        'SELECT key, status, attempts, result FROM outbox '
+                        f'WHERE key IN ({",".join("?" * len(chunk))})',
+                        chunk
+                    )
+                )
+        return [describe(*found[key]) if key in found else "Failed to send email: not queued" for key in keys]
+
+    def run_summary(self, run: str = RUN_ID) -> tuple:
+        """(sent, total, results of the emails not sent) for the emails queued by `run`"""
+        with self._lock:
+            sent, total = self._db.execute(
+                "SELECT COUNT(*) FILTER (WHERE status = 'sent'), COUNT(*) FROM outbox WHERE run = ?", (run,)
+            ).fetchone()
+            unsent = self._db.execute(
+                "SELECT status, attempts, result FROM outbox WHERE run = ? AND status != 'sent'", (run,)
+            ).fetchall()
+        return sent, total, [describe(*row) for row in unsent]
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._db.execute('SELECT status, COUNT(*) FROM outbox GROUP BY status').fetchall()
+        return {'pending': 0, 'sending': 0, 'sent': 0, 'failed': 0, **dict(rows)}
+
+
+def describe(status: str, attempts: int, result: Optional[str]) -> str:
+    if status == 'sent':
+        return result
+    if status == 'failed':
+        return f"Failed to send email after {attempts} attempts: {result}"
+    return f"Queued for retry after {attempts} attempts: {result or 'not sent yet'}"
+
+
+class OutboxWorkers:
+    """
+    Threads that drain an Outbox through `send`
+
+    `send` takes a list of claimed emails and returns (result, ok) per
+    email. Workers sleep while nothing is due and wake on enqueue.
+    """
+
+    def __init__(self, outbox: Outbox, send: Callable[[List[dict]], List[tuple]], workers: int = 1,
+                 batch_size: int = 1, poll: float = 0.5):
+        self.outbox = outbox
+        self.send = send
+        self.batch_size = max(batch_size, 1)
+        self.poll = poll
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, name=f'outbox-{i}', daemon=True) for i in range(max(workers, 1))
+        ]
+
+    def start(self) -> 'OutboxWorkers':
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            emails = self.outbox.claim(self.batch_size)
+            if not emails:
+                due = self.outbox.next_due()
+                self.outbox.wait(self.poll if due is None else min(due, self.poll))
+                continue
+            try:
+                outcomes = self.send(emails)
+            except Exception as e:
+                outcomes = [(f"Failed to send email: {e}", False)] * len(emails)
+            for email, (result, ok) in zip(emails, outcomes):
+                status = self.outbox.complete(email, result, ok)
+                if status == 'pending':
+                    inc('outbox.retries')
+                elif status == 'failed':
+                    inc('emails.failed')
+
+    def drain(self, timeout: float) -> bool:
+        """Wait until nothing is queued or `timeout` passes; True if the outbox emptied"""
+        deadline = time.monotonic() + timeout
+        while self.outbox.next_due() is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll, remaining))
+        return True
+
+    def stop(self):
+        self._stop.set()
+        self.outbox.wake()
+        for thread in self._threads:
+            thread.join()
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> Optional[Outbox]:
+    """Outbox at OUTBOX_DB, or None when sends go straight to the backend"""
+    global _outbox
+    path = os.environ.get('OUTBOX_DB')
+    if not path:
+        return None
+    path = shard_path(path)
+    max_attempts = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '5'))
+    retry_base = float(os.environ.get('OUTBOX_RETRY_BASE', '1'))
+    with _outbox_lock:
+        if (_outbox is None or _outbox.path != path or _outbox.max_attempts != max_attempts
+                or _outbox.retry_base != retry_base):
+            _outbox = Outbox(path, max_attempts=max_attempts, retry_base=retry_base)
+        return _outbox
+
+
+def reset_outbox():
+    """Drop the shared outbox (benchmarks run several campaigns per process)"""
+    global _outbox
+    with _outbox_lock:
+        _outbox = None
@@ -0,0 +1,59 @@
+"""
+Bounded queues between graph stages
+Lets sending start as soon as the first draft is ready
+"""
+import queue
+import threading
+from typing import Iterable, Iterator
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def pipelined(items: Iterable, depth: int) -> Iterator:
+    """
+    Drain `items` on a background thread into a queue of at most `depth` items
+
+    The producer starts immediately, so the upstream stage keeps working while
+    the downstream stage consumes. Errors are re-raised in the consumer.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    def consume():
+        try:
+            while True:
+                item = buffer.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            stop.set()
+
+    return consume()
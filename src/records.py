@@ -0,0 +1,235 @@
+"""
+Compact campaign records
+Slotted customer, draft and send-result records for EmailState, in place of per-row dicts and result strings
+"""
+import sys
+from dataclasses import dataclass
+from enum import IntEnum
+from operator import attrgetter
+from typing import Optional
+
+# Customer fields in customers.json order; anything else goes to `extra`
+CUSTOMER_FIELDS = ('name', 'email', 'favorite_dish', 'days_since_visit', 'visit_count', 'segment', 'party_size')
+CUSTOMER_FIELD_SET = frozenset(CUSTOMER_FIELDS)
+
+
+class RecordMapping:
+    """
+    Read-only dict protocol over a record's slots
+
+    Lets existing `record['email']`, `.get()`, `dict(record)` and
+    `**record` code handle records and plain dicts alike. A slot left at
+    None counts as a missing key.
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+
+    def __getitem__(self, key: str):
+        value = getattr(self, key, None) if key in self.FIELDS else self._extra(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def _extra(self, key: str):
+        return None
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def keys(self) -> list:
+        return [field for field in self.FIELDS if getattr(self, field) is not None]
+
+    def to_dict(self) -> dict:
+        return {key: self[key] for key in self.keys()}
+
+
+@dataclass(slots=True)
+class Customer(RecordMapping):
+    """One customer profile; segment and favorite_dish are interned, so repeated values share one string"""
+
+    name: Optional[str] = None
+    email: Optional[str] = None
+    favorite_dish: Optional[str] = None
+    days_since_visit: Optional[int] = None
+    visit_count: Optional[int] = None
+    segment: Optional[str] = None
+    party_size: Optional[int] = None
+    extra: Optional[dict] = None
+
+    FIELDS = CUSTOMER_FIELDS
+
+    @classmethod
+    def from_dict(cls, data) -> 'Customer':
+        if isinstance(data, Customer):
+            return data
+        get = data.get
+        favorite_dish = get('favorite_dish')
+        segment = get('segment')
+        extra = None if data.keys() <= CUSTOMER_FIELD_SET else {
+            key: value for key, value in data.items() if key not in CUSTOMER_FIELD_SET
+        }
+        return cls(
+            get('name'),
+            get('email'),
+            sys.intern(favorite_dish) if favorite_dish.__class__ is str else favorite_dish,
+            get('days_since_visit'),
+            get('visit_count'),
+            sys.intern(segment) if segment.__class__ is str else segment,
+            get('party_size'),
+            extra
+        )
+
+    def _extra(self, key: str):
+        return self.extra.get(key) if self.extra else None
+
+    def keys(self) -> list:
+        keys = RecordMapping.keys(self)
+        if self.extra:
+            keys.extend(self.extra)
+        return keys
+
+
+@dataclass(slots=True)
+class Draft(RecordMapping):
+    """A drafted email; `to` and `name` are the customer's own strings, not copies"""
+
+    to: str
+    name: str
+    subject: str
+    body: str
+
+    FIELDS = ('to', 'name', 'subject', 'body')
+
+    @classmethod
+    def from_dict(cls, data) -> 'Draft':
+        if isinstance(data, Draft):
+            return data
+        return cls(data['to'], data['name'], data['subject'], data['body'])
+
+
+class ResultCode(IntEnum):
+    SENT = 0
+    LOGGED = 1
+    FAILED = 2
+    QUEUED = 3
+    SUMMARY = 4
+
+
+# Text in front of the recipient name for the codes that carry one
+RESULT_PREFIXES = {ResultCode.SENT: 'Email sent to ', ResultCode.LOGGED: 'Email logged for '}
+
+
+@dataclass(slots=True)
+class SendResult:
+    """
+    Outcome of one send
+
+    str() gives the backend's original message. For sent and logged emails
+    only the recipient name (shared with the draft) and the interned
+    suffix after it are kept, e.g. " via SMTP".
+    """
+
+    code: ResultCode
+    name: str
+    detail: str
+
+    @classmethod
+    def parse(cls, text, name: str = '') -> 'SendResult':
+        """Classify a send_email result string"""
+        if isinstance(text, SendResult):
+            return text
+        for code, prefix in RESULT_PREFIXES.items():
+            if text.startswith(prefix):
+                rest = text[len(prefix):]
+                if name and rest.startswith(name):
+                    return cls(code, name, sys.intern(rest[len(name):]))
+                return cls(code, '', rest)
+        code = ResultCode.QUEUED if text.startswith('Queued for retry') else ResultCode.FAILED
+        return cls(code, name, text)
+
+    @classmethod
+    def summary(cls, sent: int, total: int) -> 'SendResult':
+        return cls(ResultCode.SUMMARY, '', f"Sent {sent} of {total} emails")
+
+    @property
+    def ok(self) -> bool:
+        return self.code <= ResultCode.LOGGED
+
+    def __str__(self) -> str:
+        prefix = RESULT_PREFIXES.get(self.code)
+        if prefix is None:
+            return self.detail
+        return f"{prefix}{self.name}{self.detail}"
+
+
+# Types the LangGraph checkpointer may rebuild from a checkpoint
+SERDE_TYPES = [('src.records', 'Customer'), ('src.records', 'Draft'), ('src.records', 'ResultCode'), ('src.records', 'SendResult')]
+
+RESULT_CODES = tuple(ResultCode)
+
+
+def interned(column: list) -> list:
+    intern = sys.intern
+    return [intern(value) if value.__class__ is str else value for value in column]
+
+
+def customer_columns(name, email, dish, days, visits, segment, party_size, extra) -> list:
+    # Interned again, as a checkpoint stores one copy of each string per row
+    return list(map(Customer, name, email, interned(dish), days, visits, interned(segment), party_size, extra))
+
+
+# Record lists are written to checkpoints as one list per field: (type, fields, field encoders, rebuild)
+COLUMN_CODECS = {
+    'Customer': (Customer, CUSTOMER_FIELDS + ('extra',), {}, customer_columns),
+    'Draft': (Draft, Draft.FIELDS, {}, lambda *columns: list(map(Draft, *columns))),
+    'SendResult': (
+        SendResult,
+        ('code', 'name', 'detail'),
+        {'code': int},
+        lambda codes, names, details: list(map(SendResult, [RESULT_CODES[code] for code in codes], names, details))
+    )
+}
+COLUMN_TYPES = {codec[0]: name for name, codec in COLUMN_CODECS.items()}
+
+
+def pack_records(value):
+    """
+    Replace lists of records in a checkpoint with {'__records__': type, 'columns': [...]}
+
+    msgpack writes lists of strings and ints natively and the columns only
+    reference the records' own values. A record on its own goes through
+    the serializer's per-object dataclass hook, which is two orders of
+    magnitude slower.
+    """
+    if isinstance(value, dict):
+        return {key: pack_records(item) for key, item in value.items()}
+    if isinstance(value, list) and value:
+        name = COLUMN_TYPES.get(value[0].__class__)
+        if name is not None:
+            cls, fields, encoders, _ = COLUMN_CODECS[name]
+            if all(item.__class__ is cls for item in value):
+                columns = []
+                for field in fields:
+                    column = map(attrgetter(field), value)
+                    if field in encoders:
+                        column = map(encoders[field], column)
+                    columns.append(list(column))
+                return {'__records__': name, 'columns': columns}
+    return value
+
+
+def unpack_records(value):
+    """Inverse of pack_records"""
+    if isinstance(value, dict):
+        name = value.get('__records__')
+        if name in COLUMN_CODECS and len(value) == 2:
+            return COLUMN_CODECS[name][3](*value['columns'])
+        return {key: unpack_records(item) for key, item in value.items()}
+    return value
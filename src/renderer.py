@@ -0,0 +1,113 @@
+"""
+Batch rule-based email renderer
+Same discounts and templates as lambda_agent.lambda_handler, computed for a whole customer table
+"""
+from typing import Dict, List
+
+import numpy as np
+
+from .lambda_agent import (
+    DEFAULT_DISCOUNT,
+    DEFAULT_TEMPLATE,
+    DISCOUNT_MAP,
+    LAPSED_BONUS,
+    LAPSED_DAYS,
+    MAX_DISCOUNT,
+    TEMPLATES
+)
+from .records import Draft
+
+# Column defaults, matching lambda_handler
+DEFAULTS = {
+    'name': 'Valued Customer',
+    'email': '',
+    'favorite_dish': 'your favorite dish',
+    'days_since_visit': 0,
+    'visit_count': 0,
+    'segment': 'new_customer'
+}
+
+
+def to_columns(customers) -> Dict[str, list]:
+    """Normalize a pyarrow Table, pandas DataFrame, dict of columns or list of dicts to column lists"""
+    if hasattr(customers, 'to_pydict'):
+        columns = customers.to_pydict()
+    elif hasattr(customers, 'to_dict') and hasattr(customers, 'columns'):
+        columns = customers.to_dict('list')
+    elif isinstance(customers, dict):
+        columns = customers
+    else:
+        customers = list(customers)
+        columns = {
+            column: [c.get(column, default) for c in customers]
+            for column, default in DEFAULTS.items()
+        }
+
+    size = len(next(iter(columns.values()))) if columns else 0
+    for column, default in DEFAULTS.items():
+        if column not in columns:
+            columns[column] = [default] * size
+    return columns
+
+
+def compute_discounts(segments, days_since_visit) -> np.ndarray:
+    """Vectorized discount: segment base, plus a bump past LAPSED_DAYS, capped at MAX_DISCOUNT"""
+    segments = np.asarray(segments, dtype=object)
+    days = np.asarray(days_since_visit, dtype=np.int64)
+
+    discounts = np.full(len(segments), int(DEFAULT_DISCOUNT), dtype=np.int64)
+    for segment, discount in DISCOUNT_MAP.items():
+        discounts[segments == segment] = int(discount)
+
+    lapsed = days > LAPSED_DAYS
+    discounts[lapsed] = np.minimum(discounts[lapsed] + LAPSED_BONUS, MAX_DISCOUNT)
+    return discounts
+
+
+def render_columns(customers) -> Dict[str, list]:
+    """Render subject, body and discount for every customer; returns column lists"""
+    columns = to_columns(customers)
+    segments = np.asarray(columns['segment'], dtype=object)
+    discounts = compute_discounts(segments, columns['days_since_visit']).astype(str).tolist()
+    first_names = [name.split()[0] for name in columns['name']]
+
+    size = len(segments)
+    subjects = [None] * size
+    bodies = [None] * size
+
+    # Render each segment's rows with that segment's template
+    known = list(TEMPLATES)
+    groups = [(TEMPLATES[s], np.flatnonzero(segments == s)) for s in known]
+    groups.append((DEFAULT_TEMPLATE, np.flatnonzero(~np.isin(segments, known))))
+
+    favorites = columns['favorite_dish']
+    days = columns['days_since_visit']
+    visits = columns['visit_count']
+
+    for (subject_template, body_template), rows in groups:
+        subject_format = subject_template.format
+        body_format = body_template.format
+        for i in rows.tolist():
+            first_name, favorite, discount = first_names[i], favorites[i], discounts[i]
+            subjects[i] = subject_format(first_name=first_name, favorite=favorite, discount=discount)
+            bodies[i] = body_format(
+                first_name=first_name,
+                favorite=favorite,
+                days_since=days[i],
+                visit_count=visits[i],
+                discount=discount
+            )
+
+    return {
+        'to': list(columns['email']),
+        'name': list(columns['name']),
+        'subject': subjects,
+        'body': bodies,
+        'discount': discounts
+    }
+
+
+def render_emails(customers) -> List[Draft]:
+    """Render drafts in the same shape create_emails produces"""
+    columns = render_columns(customers)
+    return list(map(Draft, columns['to'], columns['name'], columns['subject'], columns['body']))
@@ -0,0 +1,78 @@
+"""
+Campaign runners
+One graph in this process, or one graph per shard across a process pool
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from .metrics import get_metrics
+from .sharding import merge_stats
+
+
+def run_campaign() -> dict:
+    """Run the email graph once, resuming the checkpointed run for CAMPAIGN_ID if there is one"""
+    from .graph import create_email_graph, streaming_enabled
+
+    initial_state = {
+        "customers": [],
+        "emails_to_send": [],
+        "results": []
+    }
+
+    campaign_id = os.environ.get('CAMPAIGN_ID')
+    if campaign_id and not streaming_enabled():
+        # Resumable campaign: LangGraph checkpoints plus the per-customer progress log
+        from .campaign import get_checkpointer
+
+        app = create_email_graph(checkpointer=get_checkpointer())
+        config = {"configurable": {"thread_id": campaign_id}}
+        if app.get_state(config).next:
+            print(f"Resuming campaign {campaign_id}...")
+            return app.invoke(None, config)
+        return app.invoke(initial_state, config)
+
+    # Streaming state can't be checkpointed; the per-customer progress log
+    # still applies when CAMPAIGN_ID is set
+    app = create_email_graph()
+    return app.invoke(initial_state)
+
+
+def run_shard(index: int, count: int) -> dict:
+    """Process pool entry point: run shard `index` of `count`"""
+    os.environ['SHARD_INDEX'] = str(index)
+    os.environ['SHARD_COUNT'] = str(count)
+    result = run_campaign()
+    return {
+        "results": list(result["results"]),
+        "stats": result.get("stats", {}),
+        "metrics": get_metrics().snapshot()
+    }
+
+
+def run_sharded(count: int, processes: int = 0, initializer=None, initargs=()) -> dict:
+    """
+    Run `count` shards over a process pool and merge their results and stats
+
+    Each shard runs its own graph on its own slice of customers, with an
+    equal share of the SES send rate and SMTP connections. `initializer`
+    runs once in each worker process (benchmarks use it to install stubs).
+    """
+    processes = processes or min(count, os.cpu_count() or 1)
+    print(f"Running {count} shards on {processes} processes...")
+
+    # spawn: the parent may already hold threads, pools and SQLite handles
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(
+        max_workers=processes, mp_context=context, initializer=initializer, initargs=initargs
+    ) as pool:
+        shards = list(pool.map(run_shard, range(count), [count] * count))
+
+    # Histograms merge bucket by bucket, so percentiles cover the whole campaign
+    for shard in shards:
+        get_metrics().merge(shard["metrics"])
+
+    results = [result for shard in shards for result in shard["results"]]
+    stats = merge_stats([shard["stats"] for shard in shards])
+    stats["shards"] = count
+    return {"results": results, "stats": stats}
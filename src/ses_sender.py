@@ -0,0 +1,177 @@
+"""
+Rate-aware SES sending engine
+One client, a thread pool for fan-out and a token bucket sized from MaxSendRate
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from .clients import get_client
+from .metrics import inc, timed
+from .sharding import rate_share
+
+THROTTLING_CODES = ('Throttling', 'ThrottlingException', 'TooManyRequestsException')
+
+
+class TokenBucket:
+    """
+    Blocking token bucket: `rate` tokens per second, bursts up to `capacity`
+
+    The default capacity of 1 spreads sends evenly, since SES counts
+    MaxSendRate over a sliding one-second window.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self.rate = rate
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """True for SES rate throttling (not for the daily quota, which won't clear with a retry)"""
+    response = getattr(error, 'response', None) or {}
+    code = response.get('Error', {}).get('Code', '')
+    if code not in THROTTLING_CODES:
+        return False
+    return 'Daily message quota exceeded' not in str(error)
+
+
+class SESSender:
+    """
+    Send emails through SES at the account's MaxSendRate
+
+    Throttled requests are retried with full-jitter exponential backoff.
+    MaxSendRate is re-read every `refresh_interval` seconds, so a quota
+    raised (or lowered) by AWS mid-campaign takes effect without a restart.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        sender_email: Optional[str] = None,
+        max_workers: int = 8,
+        max_retries: int = 5,
+        base_delay: float = 0.2,
+        max_delay: float = 10.0,
+        rate: Optional[float] = None,
+        refresh_interval: float = 300.0
+    ):
+        self.client = client or get_client('ses')
+        self.sender_email = sender_email or os.environ.get('SENDER_EMAIL', 'noreply@restaurant.com')
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.bucket = TokenBucket(rate or self._read_rate())
+        # A fixed rate passed in is never refreshed
+        self.refresh_interval = refresh_interval if rate is None else 0
+        self._refreshed = time.monotonic()
+        self._refresh_lock = threading.Lock()
+
+    def _read_rate(self) -> float:
+        """MaxSendRate (or SES_MAX_SEND_RATE), divided between shards when the campaign is sharded"""
+        if os.environ.get('SES_MAX_SEND_RATE'):
+            return rate_share(float(os.environ['SES_MAX_SEND_RATE']))
+        try:
+            with timed('ses.get_send_quota'):
+                quota = self.client.get_send_quota()
+            return rate_share(float(quota['MaxSendRate']))
+        except Exception as e:
+            print(f"⚠️  Could not read SES send quota, assuming 1 msg/s: {e}")
+            return rate_share(1.0)
+
+    def refresh_rate(self):
+        """Re-read MaxSendRate from SES and resize the bucket"""
+        self.bucket.set_rate(self._read_rate())
+        self._refreshed = time.monotonic()
+
+    def _maybe_refresh(self):
+        # One sending thread refreshes; the others keep going at the old rate
+        if self.refresh_interval <= 0 or time.monotonic() - self._refreshed < self.refresh_interval:
+            return
+        if self._refresh_lock.acquire(blocking=False):
+            try:
+                if time.monotonic() - self._refreshed >= self.refresh_interval:
+                    self.refresh_rate()
+                    inc('ses.rate_refreshes')
+            finally:
+                self._refresh_lock.release()
+
+    def send(self, to_email: str, subject: str, body: str) -> Dict[str, Any]:
+        """Send one email, pacing and retrying throttled requests; returns the SES response"""
+        self._maybe_refresh()
+        attempt = 0
+        while True:
+            with timed('ses.rate_wait'):
+                self.bucket.acquire()
+            try:
+                with timed('ses.send_email'):
+                    return self.client.send_email(
+                        Source=self.sender_email,
+                        Destination={'ToAddresses': [to_email]},
+                        Message={
+                            'Subject': {'Data': subject},
+                            'Body': {'Text': {'Data': body}}
+                        }
+                    )
+            except Exception as e:
+                if not is_throttling_error(e) or attempt >= self.max_retries:
+                    raise
+                inc('ses.throttle_retries')
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                time.sleep(random.uniform(0, delay))
+                attempt += 1
+
+    def send_many(self, messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Send many messages concurrently
+
+        Each message is a dict with to_email, subject and body. Results come back
+        in input order as {'success': True, 'message_id': ...} or {'success': False, 'error': ...}.
+        """
+        def send_one(message):
+            try:
+                response = self.send(message['to_email'], message['subject'], message['body'])
+                return {'success': True, 'message_id': response['MessageId']}
+            except Exception as e:
+                return {'success': False, 'error': str(e)}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(send_one, messages))
+
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def get_ses_sender() -> SESSender:
+    """Shared SES sender, created on first use"""
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            _sender = SESSender(
+                max_workers=int(os.environ.get('SES_MAX_WORKERS', '8')),
+                refresh_interval=float(os.environ.get('SES_RATE_REFRESH_SECONDS', '300'))
+            )
+        return _sender
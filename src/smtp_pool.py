@@ -0,0 +1,183 @@
+"""
+Pooled SMTP transport for bulk sends
+Keeps a few authenticated sessions open and reuses them for many messages
+"""
+import os
+import queue
+import smtplib
+import threading
+from typing import Optional
+
+from .metrics import inc, timed
+from .sharding import size_share
+
+# Errors that mean the session is gone and a fresh connection should be tried
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class SMTPSession:
+    """One open SMTP connection and the number of messages sent on it"""
+
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.sent = 0
+
+    def close(self):
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+
+class SMTPPool:
+    """
+    Thread-safe pool of up to `size` SMTP sessions
+
+    Sessions are opened lazily, reconnected when the server drops them or
+    answers 421, and recycled after `max_messages` sends.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 587,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        size: int = 4,
+        max_messages: int = 100,
+        starttls: bool = True,
+        timeout: float = 30
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.max_messages = max_messages
+        self.starttls = starttls
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _connect(self) -> SMTPSession:
+        with timed('smtp.connect'):
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.starttls:
+                    server.starttls()
+                if self.password:
+                    server.login(self.username, self.password)
+            except Exception:
+                server.close()
+                raise
+        return SMTPSession(server)
+
+    def _acquire(self) -> SMTPSession:
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, session: Optional[SMTPSession]):
+        if session is not None:
+            if self._closed or session.sent >= self.max_messages:
+                session.close()
+            else:
+                self._idle.put(session)
+        self._slots.release()
+
+    def send_message(self, msg, from_addr: Optional[str] = None, to_addrs=None):
+        """Send one email.message.Message on a pooled session, reconnecting once if the session died"""
+        self._send(lambda server: server.send_message(msg, from_addr, to_addrs))
+
+    def sendmail(self, from_addr: str, to_addrs, msg: bytes):
+        """Send ready-made message bytes (see mime.MessageBuilder) on a pooled session"""
+        self._send(lambda server: server.sendmail(from_addr, to_addrs, msg))
+
+    def _send(self, send):
+        session = self._acquire()
+        try:
+            try:
+                with timed('smtp.send_message'):
+                    send(session.server)
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code != 421:
+                    raise
+                inc('smtp.reconnects')
+                session.close()
+                session = None
+                session = self._connect()
+                with timed('smtp.send_message'):
+                    send(session.server)
+            except RECONNECT_ERRORS:
+                inc('smtp.reconnects')
+                session.close()
+                session = None
+                session = self._connect()
+                with timed('smtp.send_message'):
+                    send(session.server)
+            session.sent += 1
+        except Exception:
+            if session is not None:
+                session.close()
+            session = None
+            raise
+        finally:
+            self._release(session)
+
+    def close(self):
+        """Close all idle sessions; sessions in use are closed when released"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool() -> SMTPPool:
+    """Shared pool configured from SMTP_* environment variables (SMTP_POOL_SIZE is split between shards)"""
+    global _pool, _pool_key
+
+    key = (
+        os.environ.get('SMTP_SERVER', 'smtp.gmail.com'),
+        int(os.environ.get('SMTP_PORT', '587')),
+        os.environ.get('SENDER_EMAIL', 'noreply@restaurant.com'),
+        os.environ.get('SMTP_PASSWORD'),
+        size_share(int(os.environ.get('SMTP_POOL_SIZE', '4'))),
+        int(os.environ.get('SMTP_MAX_MESSAGES_PER_CONNECTION', '100')),
+        os.environ.get('SMTP_STARTTLS', 'true').lower() != 'false'
+    )
+
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                _pool.close()
+            server, port, user, password, size, max_messages, starttls = key
+            _pool = SMTPPool(
+                server,
+                port,
+                username=user,
+                password=password,
+                size=size,
+                max_messages=max_messages,
+                starttls=starttls
+            )
+            _pool_key = key
+        return _pool
@@ -0,0 +1,148 @@
+"""
+Columnar customer snapshots with a local on-disk cache
+Needs pyarrow (pip install pyarrow)
+"""
+import glob
+import hashlib
+import os
+import tempfile
+from typing import Iterator, List, Optional
+
+from .clients import get_client
+from .metrics import inc, timed
+from .tools import CUSTOMER_BUCKET, iter_json_records
+
+# Columns segmentation and templating actually use
+SNAPSHOT_COLUMNS = ['name', 'email', 'favorite_dish', 'days_since_visit', 'visit_count', 'segment']
+
+BATCH_ROWS = 65536
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Customer snapshots need pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def _schema():
+    pa = _pyarrow()
+    return pa.schema([
+        ('name', pa.string()),
+        ('email', pa.string()),
+        ('favorite_dish', pa.string()),
+        ('days_since_visit', pa.int32()),
+        ('visit_count', pa.int32()),
+        ('segment', pa.string())
+    ])
+
+
+def cache_dir() -> str:
+    return os.environ.get('CUSTOMER_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'restaurant-email-cache'))
+
+
+def write_snapshot(customers, path: str):
+    """Write customer dicts to an uncompressed Arrow IPC file (memory-mappable)"""
+    pa = _pyarrow()
+    schema = _schema()
+    batch = []
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for customer in customers:
+            batch.append(customer)
+            if len(batch) >= BATCH_ROWS:
+                writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+
+
+def _convert_to_arrow(source: str, key: str, target: str):
+    """Convert a downloaded JSON, JSON Lines, Parquet or Arrow file to an Arrow IPC file"""
+    pa = _pyarrow()
+
+    if key.endswith('.parquet'):
+        parquet = pa.parquet.ParquetFile(source)
+        with pa.OSFile(target, 'wb') as sink, pa.ipc.new_file(sink, parquet.schema_arrow) as writer:
+            for batch in parquet.iter_batches(batch_size=BATCH_ROWS):
+                writer.write_batch(batch)
+    elif key.endswith(('.arrow', '.feather', '.ipc')):
+        os.replace(source, target)
+    else:
+        def chunks():
+            with open(source, 'rb') as f:
+                while True:
+                    chunk = f.read(1024 * 1024)
+                    if not chunk:
+                        return
+                    yield chunk
+        write_snapshot(iter_json_records(chunks()), target)
+
+
+def fetch_snapshot(key: str, bucket: str = CUSTOMER_BUCKET) -> str:
+    """
+    Return the path of a local Arrow copy of s3://bucket/key
+
+    The cache is keyed on the object's ETag (LastModified if there is none),
+    so an unchanged object is never downloaded twice.
+    """
+    s3 = get_client('s3')
+    with timed('s3.head_object'):
+        head = s3.head_object(Bucket=bucket, Key=key)
+    version = head.get('ETag') or str(head.get('LastModified'))
+
+    key_hash = hashlib.sha256(f"{bucket}/{key}".encode()).hexdigest()[:16]
+    version_hash = hashlib.sha256(version.encode()).hexdigest()[:16]
+    directory = cache_dir()
+    path = os.path.join(directory, f"{key_hash}-{version_hash}.arrow")
+
+    if os.path.exists(path):
+        print(f"Using cached snapshot for {key}")
+        return path
+
+    os.makedirs(directory, exist_ok=True)
+    download = path + '.download'
+    partial = path + '.partial'
+    with timed('s3.get_object'):
+        response = s3.get_object(Bucket=bucket, Key=key)
+        with open(download, 'wb') as f:
+            for chunk in response['Body'].iter_chunks(1024 * 1024):
+                f.write(chunk)
+                inc('s3.bytes_read', len(chunk))
+
+    try:
+        _convert_to_arrow(download, key, partial)
+        os.replace(partial, path)
+    finally:
+        for leftover in (download, partial):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    # Drop cached copies of older versions of the same object
+    for stale in glob.glob(os.path.join(directory, f"{key_hash}-*.arrow")):
+        if stale != path:
+            os.remove(stale)
+
+    print(f"Cached snapshot for {key} at {path}")
+    return path
+
+
+def load_snapshot(path: str, columns: Optional[List[str]] = None):
+    """Memory-map a cached Arrow snapshot and select only the needed columns"""
+    pa = _pyarrow()
+    source = pa.memory_map(path, 'r')
+    table = pa.ipc.open_file(source).read_all()
+    return table.select(columns or SNAPSHOT_COLUMNS)
+
+
+def read_customers_from_snapshot(key: str, bucket: str = CUSTOMER_BUCKET) -> List[dict]:
+    """Customer dicts from a cached columnar snapshot"""
+    return load_snapshot(fetch_snapshot(key, bucket)).to_pylist()
+
+
+def iter_customers_from_snapshot(key: str, bucket: str = CUSTOMER_BUCKET) -> Iterator[dict]:
+    """Stream customer dicts batch by batch from a cached columnar snapshot"""
+    for batch in load_snapshot(fetch_snapshot(key, bucket)).to_batches(BATCH_ROWS):
+        yield from batch.to_pylist()
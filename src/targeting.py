@@ -0,0 +1,338 @@
+"""
+Campaign targeting
+Segment and recency selection, suppression lists, recipient dedup and frequency caps, applied before generation
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .sharding import shard_path
+
+# Keys per SELECT ... IN (...) lookup
+LOOKUP_BATCH = 500
+
+
+def normalize_address(email: str) -> str:
+    return email.strip().lower()
+
+
+def address_hash(email: str) -> int:
+    """64-bit hash of a normalized address (collisions are negligible below billions of addresses)"""
+    return int.from_bytes(hashlib.blake2b(normalize_address(email).encode(), digest_size=8).digest(), 'little')
+
+
+def address_hashes(emails: Iterable[str]) -> np.ndarray:
+    """address_hash of each address, as a uint64 array (digests are joined, then viewed in place)"""
+    blake2b = hashlib.blake2b
+    digests = b''.join([blake2b(email.strip().lower().encode(), digest_size=8).digest() for email in emails])
+    return np.frombuffer(digests, dtype='<u8').astype(np.uint64)
+
+
+def sorted_unique(hashes: np.ndarray) -> np.ndarray:
+    """Sorted distinct values; a sort and a neighbour compare, much cheaper than np.unique on uint64"""
+    hashes = np.sort(hashes)
+    if len(hashes) < 2:
+        return hashes
+    keep = np.empty(len(hashes), dtype=bool)
+    keep[0] = True
+    np.not_equal(hashes[1:], hashes[:-1], out=keep[1:])
+    return hashes[keep]
+
+
+class HashSet:
+    """
+    Set of 64-bit hashes stored as sorted numpy runs
+
+    8 bytes per member and vectorized membership tests. add() appends a
+    sorted run and merges runs of similar size (as in an LSM tree), so
+    both adds and lookups stay O(log n) runs deep.
+    """
+
+    def __init__(self, hashes: Optional[np.ndarray] = None):
+        self.runs: List[np.ndarray] = []
+        if hashes is not None and len(hashes):
+            self.runs.append(sorted_unique(hashes))
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self.runs)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(run.nbytes for run in self.runs)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(hashes), dtype=bool)
+        if not self.runs or not len(hashes):
+            return found
+        # Looking up in sorted order walks each run front to back instead of jumping around it
+        order = np.argsort(hashes)
+        hashes = hashes[order]
+        hits = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            positions = np.searchsorted(run, hashes)
+            positions[positions == len(run)] = 0
+            hits |= run[positions] == hashes
+        found[order] = hits
+        return found
+
+    def add(self, hashes: np.ndarray):
+        if not len(hashes):
+            return
+        run = sorted_unique(hashes)
+        while self.runs and len(self.runs[-1]) <= 2 * len(run):
+            run = sorted_unique(np.concatenate([self.runs.pop(), run]))
+        self.runs.append(run)
+
+
+def load_suppression(path: str) -> np.ndarray:
+    """
+    Sorted hashes of the addresses in a suppression file (one per line, or CSV with the address first)
+
+    The hashes are cached next to the file as <path>.hashes.npy and rebuilt
+    when the file is newer, so a multi-million-line list is parsed once.
+    """
+    cache = path + '.hashes.npy'
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+        return np.load(cache)
+
+    def addresses():
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                address = line.split(',', 1)[0].strip().strip('"')
+                if address and not address.startswith('#') and '@' in address:
+                    yield address
+
+    hashes = np.unique(address_hashes(addresses()))
+    try:
+        partial = cache + '.partial.npy'
+        np.save(partial, hashes)
+        os.replace(partial, cache)
+    except OSError as e:
+        print(f"⚠️  Could not cache suppression hashes for {path}: {e}")
+    return hashes
+
+
+class SendHistory:
+    """SQLite log of successful sends per recipient address, for frequency caps"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS sends (recipient INTEGER NOT NULL, sent_at REAL NOT NULL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS sends_recipient ON sends (recipient, sent_at)')
+        self._db.commit()
+
+    def counts_since(self, hashes: np.ndarray, since: float) -> dict:
+        """Sends per recipient hash since `since`"""
+        # SQLite integers are signed 64-bit
+        keys = hashes.view(np.int64).tolist()
+        counts = {}
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                chunk = keys[start:start + LOOKUP_BATCH]
+                counts.update(self._db.execute(
+                    'SELECT recipient, COUNT(*) FROM sends '
+                    f'WHERE recipient IN ({",".join("?" * len(chunk))}) AND sent_at >= ? GROUP BY recipient',
+                    chunk + [since]
+                ))
+        return counts
+
+    def record(self, emails: List[str]):
+        now = time.time()
+        keys = address_hashes(emails).view(np.int64).tolist()
+        with self._lock:
+            self._db.executemany('INSERT INTO sends (recipient, sent_at) VALUES (?, ?)', [(key, now) for key in keys])
+            self._db.commit()
+
+    def prune(self, before: float):
+        with self._lock:
+            self._db.execute('DELETE FROM sends WHERE sent_at < ?', (before,))
+            self._db.commit()
+
+
+class Targeting:
+    """
+    Eligibility filter run between fetch_customers and create_emails
+
+    In order, cheapest first: segment and recency selection, suppression
+    (bounces, complaints, unsubscribes), one email per recipient address
+    per run, and at most cap_count emails per address in cap_days.
+    """
+
+    def __init__(
+        self,
+        segments: Optional[Tuple[str, ...]] = None,
+        min_days: Optional[int] = None,
+        max_days: Optional[int] = None,
+        suppressed: Optional[HashSet] = None,
+        dedup: bool = False,
+        history: Optional[SendHistory] = None,
+        cap_count: int = 0,
+        cap_days: float = 0
+    ):
+        self.segments = segments
+        self.min_days = min_days
+        self.max_days = max_days
+        self.suppressed = suppressed
+        self.dedup = dedup
+        self.history = history
+        self.cap_count = cap_count
+        self.cap_days = cap_days
+        self.counts = {'scanned': 0, 'untargeted': 0, 'suppressed': 0, 'duplicate': 0, 'capped': 0, 'eligible': 0}
+        self._lock = threading.Lock()
+
+    def targeted_rows(self, customers: List[dict]) -> np.ndarray:
+        """Row numbers of a block matching the segment set and recency range, as one boolean mask"""
+        count = len(customers)
+        mask = np.ones(count, dtype=bool)
+        if self.segments is not None:
+            segments = frozenset(self.segments)
+            mask = np.fromiter((c.get('segment') in segments for c in customers), dtype=bool, count=count)
+        if self.min_days is not None or self.max_days is not None:
+            days = np.fromiter((c.get('days_since_visit', 0) for c in customers), dtype=np.int64, count=count)
+            if self.min_days is not None:
+                mask &= days >= self.min_days
+            if self.max_days is not None:
+                mask &= days <= self.max_days
+        return np.flatnonzero(mask)
+
+    def select(self, customers: List[dict], seen: Optional[HashSet] = None, taken: Optional[dict] = None) -> List[dict]:
+        """
+        The eligible customers of a block, in input order
+
+        `seen` holds the addresses earlier blocks of the run kept (for dedup)
+        and `taken` counts them per address hash (for the cap without dedup).
+        """
+        counts = dict.fromkeys(self.counts, 0)
+        counts['scanned'] = len(customers)
+
+        if self.segments is not None or self.min_days is not None or self.max_days is not None:
+            rows = self.targeted_rows(customers)
+        else:
+            rows = np.arange(len(customers))
+        counts['untargeted'] = len(customers) - len(rows)
+        hashes = address_hashes(customers[i]['email'] for i in rows.tolist())
+
+        if self.suppressed is not None and len(rows):
+            keep = ~self.suppressed.contains(hashes)
+            counts['suppressed'] = int((~keep).sum())
+            rows, hashes = rows[keep], hashes[keep]
+
+        with self._lock:
+            if self.dedup and seen is not None and len(rows):
+                # First row per address in this block, then drop addresses seen in earlier blocks
+                _, first = np.unique(hashes, return_index=True)
+                first.sort()
+                keep = np.zeros(len(rows), dtype=bool)
+                keep[first] = True
+                keep &= ~seen.contains(hashes)
+                counts['duplicate'] = int((~keep).sum())
+                rows, hashes = rows[keep], hashes[keep]
+                seen.add(hashes)
+
+            if self.history is not None and self.cap_count > 0 and len(rows):
+                sent = self.history.counts_since(hashes, time.time() - self.cap_days * 86400)
+                if taken is None:
+                    taken = {}
+                keep = np.zeros(len(rows), dtype=bool)
+                for j, key in enumerate(hashes.view(np.int64).tolist()):
+                    if sent.get(key, 0) + taken.get(key, 0) < self.cap_count:
+                        keep[j] = True
+                        taken[key] = taken.get(key, 0) + 1
+                counts['capped'] = int((~keep).sum())
+                rows = rows[keep]
+
+            counts['eligible'] = len(rows)
+            for name, n in counts.items():
+                self.counts[name] += n
+        return [customers[i] for i in rows.tolist()]
+
+    def iter_eligible(self, customers: Iterable[dict], window: int = 500) -> Iterator[dict]:
+        """Eligible customers of one run, `window` at a time (dedup covers the whole run)"""
+        customers = iter(customers)
+        seen = HashSet()
+        # With dedup each address is kept once, so only caps without dedup need counts
+        taken = None if self.dedup else {}
+        while True:
+            block = list(islice(customers, window))
+            if not block:
+                return
+            yield from self.select(block, seen, taken)
+
+    def record_sent(self, emails: List[dict]):
+        """Successful sends (dicts with to) count towards the frequency cap"""
+        if self.history is not None and emails:
+            self.history.record([email['to'] for email in emails])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+
+def _optional_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def targeting_config() -> tuple:
+    """Targeting settings from the environment (all off by default)"""
+    segments = os.environ.get('TARGET_SEGMENTS')
+    cap = os.environ.get('FREQUENCY_CAP', '')
+    cap_count, cap_days = (int(cap.split('/')[0]), float(cap.split('/')[1])) if cap else (0, 0.0)
+    return (
+        tuple(s.strip() for s in segments.split(',') if s.strip()) if segments else None,
+        _optional_int('TARGET_MIN_DAYS'),
+        _optional_int('TARGET_MAX_DAYS'),
+        tuple(p for p in os.environ.get('SUPPRESSION_FILES', '').split(',') if p),
+        os.environ.get('RECIPIENT_DEDUP', 'false').lower() == 'true',
+        cap_count,
+        cap_days,
+        shard_path(os.environ.get('FREQUENCY_DB', 'frequency.sqlite'))
+    )
+
+
+_targeting = None
+_targeting_key = None
+_targeting_lock = threading.Lock()
+
+
+def get_targeting() -> Optional[Targeting]:
+    """Shared Targeting for this run, or None when no targeting option is set"""
+    global _targeting, _targeting_key
+    key = targeting_config()
+    segments, min_days, max_days, files, dedup, cap_count, cap_days, history_path = key
+    if segments is None and min_days is None and max_days is None and not files and not dedup and not cap_count:
+        return None
+    with _targeting_lock:
+        if _targeting is None or _targeting_key != key:
+            suppressed = None
+            if files:
+                suppressed = HashSet(np.concatenate([load_suppression(path) for path in files]))
+                print(f"Loaded {len(suppressed):,} suppressed addresses")
+            history = None
+            if cap_count:
+                history = SendHistory(history_path)
+                history.prune(time.time() - cap_days * 86400)
+            _targeting = Targeting(segments, min_days, max_days, suppressed, dedup, history, cap_count, cap_days)
+            _targeting_key = key
+        return _targeting
+
+
+def reset_targeting():
+    """Drop the shared targeting (benchmarks run several campaigns per process)"""
+    global _targeting
+    with _targeting_lock:
+        _targeting = None
@@ -1,18 +1,136 @@
-import boto3
+import codecs
 import json
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Iterator, List
+
+from .clients import get_client
+from .completion import completion_text
+from .metrics import inc, timed
+
+CUSTOMER_BUCKET = 'aiawsattack-bucket'
+CUSTOMER_KEY = 'customers.json'
 
 def read_customers_from_s3():
     """Read customer data from S3"""
-    s3 = boto3.client('s3')
-    response = s3.get_object(
-        Bucket='aiawsattack-bucket',
-        Key='customers.json'
+    s3 = get_client('s3')
+    with timed('s3.get_object'):
+        response = s3.get_object(
+            Bucket=CUSTOMER_BUCKET,
+            Key=os.environ.get('CUSTOMERS_KEY', CUSTOMER_KEY)
+        )
+        data = response['Body'].read()
+    inc('s3.bytes_read', len(data))
+    return json.loads(data)
+
+def iter_json_records(chunks: Iterable[bytes]) -> Iterator[dict]:
+    """
+    Incrementally parse JSON records from byte chunks
+    
+    Accepts either a JSON array of objects or JSON Lines. Only the current
+    chunk and any partial record are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+    eof = False
+    in_array = None
+    
+    while True:
+        # Skip whitespace and array separators
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        
+        if pos < len(buffer):
+            if in_array is None:
+                in_array = buffer[pos] == '['
+                if in_array:
+                    pos += 1
+                    continue
+            
+            if in_array and buffer[pos] == ']':
+                return
+            
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+                yield record
+                continue
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        elif eof:
+            return
+        
+        # Buffer is empty or ends in a partial record: pull the next chunk
+        chunk = next(chunks, None)
+        eof = chunk is None
+        buffer = buffer[pos:] + utf8.decode(chunk or b'', final=eof)
+        pos = 0
+
+def counted_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Pass chunks through, counting them towards s3.bytes_read"""
+    for chunk in chunks:
+        inc('s3.bytes_read', len(chunk))
+        yield chunk
+
+def iter_customers_from_s3(chunk_size: int = 64 * 1024) -> Iterator[dict]:
+    """Stream customer records from S3 in fixed-size chunks (JSON array or JSON Lines)"""
+    s3 = get_client('s3')
+    with timed('s3.get_object'):
+        response = s3.get_object(
+            Bucket=CUSTOMER_BUCKET,
+            Key=os.environ.get('CUSTOMERS_KEY', CUSTOMER_KEY)
+        )
+    yield from iter_json_records(counted_chunks(response['Body'].iter_chunks(chunk_size)))
+
+def invoke_email_agent(input_text: str, action: str, function: str, payload: dict) -> dict:
+    """Invoke the deployed AgentCore email agent and return its parsed JSON result"""
+    with timed(f'agentcore.{action}'):
+        return _invoke_email_agent(input_text, action, function, payload)
+
+def _invoke_email_agent(input_text: str, action: str, function: str, payload: dict) -> dict:
+    response = get_client('bedrock-agent-runtime').invoke_inline_agent(
+        inputText=input_text,
+        agentResourceRoleArn=os.environ.get('AGENT_ROLE_ARN'),
+        foundationModel='anthropic.claude-3-haiku-20240307-v1:0',
+        instruction='You are an email sending agent.',
+        actionGroups=[{
+            'actionGroupName': 'EmailActions',
+            'parentActionGroupSignature': 'AMAZON.UserInput',
+            'actionGroupExecutor': {
+                'lambda': os.environ.get('EMAIL_AGENT_FUNCTION_ARN')
+            }
+        }],
+        sessionState={
+            'invocationId': '1',
+            'returnControlInvocationResults': [{
+                'functionResult': {
+                    'actionGroup': 'EmailActions',
+                    'action': action,
+                    'function': function,
+                    'responseBody': {
+                        'TEXT': {
+                            'body': json.dumps(payload)
+                        }
+                    }
+                }
+            }]
+        }
     )
-    return json.loads(response['Body'].read())
+    
+    # Extract result from response (a string, or the event stream from the real API)
+    return json.loads(completion_text(response['completion']))
+
+def mock_send(to_email: str, subject: str, body: str, customer_name: str) -> str:
+    """Log the email instead of sending it"""
+    print(f"\n--- EMAIL TO: {customer_name} ({to_email}) ---")
+    print(f"SUBJECT: {subject}")
+    print(f"BODY:\n{body}")
+    print("--- END EMAIL ---\n")
+    return f"Email sent to {customer_name}"
 
-def send_email(to_email: str, subject: str, body: str, customer_name: str) -> str:
+def send_email(to_email: str, subject: str, body: str, customer_name: str, fallback: bool = True) -> str:
     """
     Send email using configured backend
     
@@ -21,52 +139,29 @@ def send_email(to_email: str, subject: str, body: str, customer_name: str) -> st
     - ses: Send via AWS SES
     - smtp: Send via SMTP (Gmail, etc)
     - agentcore: Use deployed Bedrock agent
+    
+    With fallback=False an AgentCore error is returned as a failure (so the
+    outbox can retry it) instead of falling back to mock.
     """
     
     email_backend = os.environ.get('EMAIL_BACKEND', 'mock')
     
     if email_backend == 'agentcore':
         # Use the deployed AgentCore email agent
-        bedrock_agent = boto3.client('bedrock-agent-runtime')
-        
         try:
             # Invoke the email agent
-            response = bedrock_agent.invoke_inline_agent(
-                inputText=f"Send email to {customer_name}",
-                agentResourceRoleArn=os.environ.get('AGENT_ROLE_ARN'),
-                foundationModel='anthropic.claude-3-haiku-20240307-v1:0',
-                instruction='You are an email sending agent.',
-                actionGroups=[{
-                    'actionGroupName': 'EmailActions',
-                    'parentActionGroupSignature': 'AMAZON.UserInput',
-                    'actionGroupExecutor': {
-                        'lambda': os.environ.get('EMAIL_AGENT_FUNCTION_ARN')
-                    }
-                }],
-                sessionState={
-                    'invocationId': '1',
-                    'returnControlInvocationResults': [{
-                        'functionResult': {
-                            'actionGroup': 'EmailActions',
-                            'action': 'send_email',
-                            'function': 'send_restaurant_email',
-                            'responseBody': {
-                                'TEXT': {
-                                    'body': json.dumps({
-                                        'to_email': to_email,
-                                        'customer_name': customer_name,
-                                        'subject': subject,
-                                        'body': body
-                                    })
-                                }
-                            }
-                        }
-                    }]
+            result = invoke_email_agent(
+                f"Send email to {customer_name}",
+                'send_email',
+                'send_restaurant_email',
+                {
+                    'to_email': to_email,
+                    'customer_name': customer_name,
+                    'subject': subject,
+                    'body': body
                 }
             )
             
-            # Extract result from response
-            result = json.loads(response['completion'])
             if result.get('success'):
                 return f"Email sent to {customer_name} via AgentCore"
             else:
@@ -74,30 +169,23 @@ def send_email(to_email: str, subject: str, body: str, customer_name: str) -> st
                 
         except Exception as e:
             print(f"AgentCore error: {str(e)}")
+            if not fallback:
+                return f"Failed to send email: AgentCore error: {str(e)}"
             print("Falling back to local email handling...")
+            inc('send.fallbacks')
             email_backend = 'mock'  # Fall back to mock
     
     # Direct implementation (mock, ses, or smtp)
     if email_backend == 'mock':
-        print(f"\n--- EMAIL TO: {customer_name} ({to_email}) ---")
-        print(f"SUBJECT: {subject}")
-        print(f"BODY:\n{body}")
-        print("--- END EMAIL ---\n")
-        return f"Email sent to {customer_name}"
+        return mock_send(to_email, subject, body, customer_name)
     
     elif email_backend == 'ses':
-        ses = boto3.client('ses', region_name='us-east-1')
+        from .ses_sender import get_ses_sender
+        
         sender_email = os.environ.get('SENDER_EMAIL', 'noreply@restaurant.com')
         
         try:
-            response = ses.send_email(
-                Source=sender_email,
-                Destination={'ToAddresses': [to_email]},
-                Message={
-                    'Subject': {'Data': subject},
-                    'Body': {'Text': {'Data': body}}
-                }
-            )
+            response = get_ses_sender().send(to_email, subject, body)
             print(f"✅ Email sent via SES to {customer_name}")
             return f"Email sent to {customer_name} - ID: {response['MessageId']}"
         except Exception as e:
@@ -108,12 +196,9 @@ def send_email(to_email: str, subject: str, body: str, customer_name: str) -> st
     
     elif email_backend == 'smtp':
         # SMTP implementation
-        import smtplib
-        from email.mime.text import MIMEText
-        from email.mime.multipart import MIMEMultipart
+        from .mime import get_message_builder, mime_message
+        from .smtp_pool import get_smtp_pool
         
-        smtp_server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.environ.get('SMTP_PORT', '587'))
         sender_email = os.environ.get('SENDER_EMAIL', 'noreply@restaurant.com')
         sender_password = os.environ.get('SMTP_PASSWORD')
         
@@ -126,16 +211,13 @@ def send_email(to_email: str, subject: str, body: str, customer_name: str) -> st
             return f"Email logged for {customer_name} (SMTP not configured)"
         
         try:
-            msg = MIMEMultipart()
-            msg['From'] = sender_email
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            msg.attach(MIMEText(body, 'plain'))
-            
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()
-                server.login(sender_email, sender_password)
-                server.send_message(msg)
+            # Message bytes come from the precompiled builder; unusual
+            # addresses still go through the email package
+            builder = get_message_builder()
+            if builder.supports(to_email):
+                get_smtp_pool().sendmail(builder.envelope_from, [to_email], builder.build(to_email, subject, body))
+            else:
+                get_smtp_pool().send_message(mime_message(sender_email, to_email, subject, body))
             
             print(f"✅ Email sent via SMTP to {customer_name}")
             return f"Email sent to {customer_name} via SMTP"
@@ -145,4 +227,61 @@ def send_email(to_email: str, subject: str, body: str, customer_name: str) -> st
             return f"SMTP error: {str(e)}"
     
     else:
-        return f"Unknown email backend: {email_backend}"
\ No newline at end of file
+        return f"Unknown email backend: {email_backend}"
+
+def send_email_batch(messages: List[Dict[str, str]], fallback: bool = True) -> List[str]:
+    """
+    Send many emails using the configured backend, one result string per message
+    
+    Each message has to_email, subject, body and customer_name. The agentcore
+    backend sends EMAIL_BATCH_SIZE messages per agent invocation through the
+    agent's send_batch action; SES fans out through the paced sender.
+    fallback is as for send_email.
+    """
+    email_backend = os.environ.get('EMAIL_BACKEND', 'mock')
+    
+    if email_backend == 'agentcore':
+        batch_size = int(os.environ.get('EMAIL_BATCH_SIZE', '1'))
+        results = []
+        for start in range(0, len(messages), batch_size):
+            chunk = messages[start:start + batch_size]
+            try:
+                response = invoke_email_agent(
+                    f"Send {len(chunk)} emails",
+                    'send_batch',
+                    'send_restaurant_email_batch',
+                    {'messages': chunk}
+                )
+                chunk_results = response.get('results', [])
+                for message, result in zip(chunk, chunk_results):
+                    if result.get('success'):
+                        results.append(f"Email sent to {message['customer_name']} via AgentCore")
+                    else:
+                        results.append(f"Failed to send email: {result.get('error', 'Unknown error')}")
+                for message in chunk[len(chunk_results):]:
+                    results.append(f"Failed to send email: no result for {message['customer_name']}")
+            except Exception as e:
+                print(f"AgentCore batch error: {str(e)}")
+                if not fallback:
+                    results.extend(f"Failed to send email: AgentCore error: {str(e)}" for _ in chunk)
+                    continue
+                print("Falling back to local email handling...")
+                inc('send.fallbacks', len(chunk))
+                results.extend(mock_send(**message) for message in chunk)
+        return results
+    
+    if email_backend == 'ses':
+        from .ses_sender import get_ses_sender
+        
+        sent = get_ses_sender().send_many(messages)
+        results = []
+        for message, result in zip(messages, sent):
+            if result['success']:
+                print(f"✅ Email sent via SES to {message['customer_name']}")
+                results.append(f"Email sent to {message['customer_name']} - ID: {result['message_id']}")
+            else:
+                print(f"❌ SES Error: {result['error']}")
+                results.append(f"Failed to send email: {result['error']}")
+        return results
+    
+    return [send_email(**message, fallback=fallback) for message in messages]
@@ -6,6 +6,30 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+def print_task_logs(logs, task_id):
+    """Print the CloudWatch log events of one task"""
+    try:
+        # Try different log stream formats
+        for stream_format in [f'ecs/app/{task_id}', f'ecs/app/{task_id[:8]}']:
+            try:
+                events = logs.get_log_events(
+                    logGroupName='/ecs/restaurant-email',
+                    logStreamName=stream_format,
+                    startFromHead=True
+                )
+                
+                if events['events']:
+                    for event in events['events']:
+                        print(event['message'].strip())
+                    break
+            except:
+                continue
+                
+    except Exception as e:
+        print(f"Could not retrieve detailed logs: {e}")
+        print("\nCheck CloudWatch for full results:")
+        print(f"https://console.aws.amazon.com/cloudwatch/home?region=us-east-1#logStream:group=/ecs/restaurant-email")
+
 def run_email_campaign():
     """Run the restaurant email campaign on AWS"""
     
@@ -21,6 +45,13 @@ def run_email_campaign():
         print(f"   ✅ Real emails will be sent via {email_backend.upper()}")
     print()
     
+    # Only passed on when set: it turns on the progress log and checkpoints,
+    # which need CAMPAIGN_DB on storage that outlives the task
+    campaign_id = os.environ.get('CAMPAIGN_ID')
+    if campaign_id:
+        print(f"🆔 Campaign: {campaign_id}")
+        print()
+    
     # Initialize AWS clients
     ecs = boto3.client('ecs', region_name='us-east-1')
     ec2 = boto3.client('ec2', region_name='us-east-1')
@@ -29,36 +60,53 @@ def run_email_campaign():
     # Get subnet
     subnet_id = ec2.describe_subnets()['Subnets'][0]['SubnetId']
     
-    # Run the ECS task
-    print("📤 Starting email task on AWS...")
-    response = ecs.run_task(
-        cluster='restaurant-emails',
-        taskDefinition='restaurant-email',
-        launchType='FARGATE',
-        networkConfiguration={
-            'awsvpcConfiguration': {
-                'subnets': [subnet_id],
-                'assignPublicIp': 'ENABLED'
-            }
-        }
-    )
+    # SHARD_COUNT > 1 splits the customers between that many parallel tasks
+    shard_count = int(os.environ.get('SHARD_COUNT', '1'))
     
-    task_arn = response['tasks'][0]['taskArn']
-    task_id = task_arn.split('/')[-1]
-    print(f"✅ Task started: {task_id[:12]}...")
+    # Run the ECS tasks, one per shard
+    print(f"📤 Starting {shard_count} email task(s) on AWS...")
+    task_arns = []
+    for shard_index in range(shard_count):
+        environment = [{'name': 'CAMPAIGN_ID', 'value': campaign_id}] if campaign_id else []
+        if shard_count > 1:
+            environment += [
+                {'name': 'SHARD_INDEX', 'value': str(shard_index)},
+                {'name': 'SHARD_COUNT', 'value': str(shard_count)}
+            ]
+        response = ecs.run_task(
+            cluster='restaurant-emails',
+            taskDefinition='restaurant-email',
+            launchType='FARGATE',
+            networkConfiguration={
+                'awsvpcConfiguration': {
+                    'subnets': [subnet_id],
+                    'assignPublicIp': 'ENABLED'
+                }
+            },
+            overrides={
+                'containerOverrides': [{
+                    'name': 'app',
+                    'environment': environment
+                }]
+            }
+        )
+        
+        task_arn = response['tasks'][0]['taskArn']
+        task_arns.append(task_arn)
+        print(f"✅ Task started: {task_arn.split('/')[-1][:12]}...")
     
     # Wait for completion
     print("\n⏳ Processing emails...")
     for i in range(60):  # Max 5 minutes
-        task = ecs.describe_tasks(cluster='restaurant-emails', tasks=[task_arn])['tasks'][0]
-        status = task['lastStatus']
+        tasks = ecs.describe_tasks(cluster='restaurant-emails', tasks=task_arns)['tasks']
+        stopped = sum(1 for task in tasks if task['lastStatus'] == 'STOPPED')
         
-        if status == 'STOPPED':
-            print("✅ Task completed!\n")
+        if stopped == len(task_arns):
+            print("✅ Task completed!\n" if len(task_arns) == 1 else "✅ All tasks completed!\n")
             break
             
         # Show progress
-        print(f"\r⏳ Processing emails... {i*5}s", end='', flush=True)
+        print(f"\r⏳ Processing emails... {i*5}s ({stopped}/{len(task_arns)} tasks done)", end='', flush=True)
         time.sleep(5)
     
     # Get and display results
@@ -68,28 +116,11 @@ def run_email_campaign():
     # Wait for logs to be available
     time.sleep(3)
     
-    # Try to get logs
-    try:
-        # Try different log stream formats
-        for stream_format in [f'ecs/app/{task_id}', f'ecs/app/{task_id[:8]}']:
-            try:
-                events = logs.get_log_events(
-                    logGroupName='/ecs/restaurant-email',
-                    logStreamName=stream_format,
-                    startFromHead=True
-                )
-                
-                if events['events']:
-                    for event in events['events']:
-                        print(event['message'].strip())
-                    break
-            except:
-                continue
-                
-    except Exception as e:
-        print(f"Could not retrieve detailed logs: {e}")
-        print("\nCheck CloudWatch for full results:")
-        print(f"https://console.aws.amazon.com/cloudwatch/home?region=us-east-1#logStream:group=/ecs/restaurant-email")
+    for task_arn in task_arns:
+        task_id = task_arn.split('/')[-1]
+        if len(task_arns) > 1:
+            print(f"\n--- Shard task {task_id[:12]} ---")
+        print_task_logs(logs, task_id)
     
     print("\n" + "=" * 50)
     print("✅ Email campaign complete!")
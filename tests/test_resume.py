@@ -0,0 +1,88 @@
+"""
+Kill a campaign mid-send, restart it, and check nothing was generated or sent twice
+
+    python -m pytest tests
+"""
+import contextlib
+import io
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CUSTOMERS = 200
+CRASH_AFTER_SENDS = 60
+
+
+def child():
+    """One campaign run with local stand-ins; appends every model call and send to EVENTS_PATH"""
+    import main
+    from src import clients, graph
+    from benchmarks.stubs import StubBedrockClient, StubS3Client, make_customers
+
+    events = open(os.environ['EVENTS_PATH'], 'a', buffering=1)
+    objects = {'customers.json': json.dumps(make_customers(CUSTOMERS)).encode()}
+    clients.set_client('s3', StubS3Client(objects))
+
+    class LoggingBedrock(StubBedrockClient):
+        def invoke_inline_agent(self, **kwargs):
+            customer = json.loads(kwargs['inputText'].split('\n')[1])
+            events.write(f"model {customer['name']}\n")
+            return super().invoke_inline_agent(**kwargs)
+
+    clients.set_client('bedrock-agent-runtime', LoggingBedrock(latency=0.001))
+    sends = Counter()
+
+    def send_email(**kwargs):
+        sends['total'] += 1
+        if sends['total'] > int(os.environ.get('CRASH_AFTER_SENDS', '0')) > 0:
+            os.kill(os.getpid(), signal.SIGKILL)
+        events.write(f"send {kwargs['customer_name']}\n")
+        time.sleep(0.001)
+        return f"Email sent to {kwargs['customer_name']}"
+
+    graph.send_email = send_email
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.main()
+
+
+def run_campaign(env: dict) -> int:
+    return subprocess.run([sys.executable, '-m', 'tests.test_resume'], cwd=ROOT, env=env).returncode
+
+
+@pytest.mark.parametrize('extra_env', [
+    {'PIPELINE_DEPTH': '0', 'CUSTOMER_STREAMING': 'false'},
+    {'PIPELINE_DEPTH': '16', 'GENERATION_CONCURRENCY': '4'}
+], ids=['barrier', 'pipelined'])
+def test_resume_after_kill(tmp_path, extra_env):
+    env = {
+        **os.environ,
+        **extra_env,
+        'CAMPAIGN_ID': 'resume-check',
+        'CAMPAIGN_DB': str(tmp_path / 'campaign.sqlite'),
+        'EVENTS_PATH': str(tmp_path / 'events.log'),
+        'EMAIL_BACKEND': 'mock'
+    }
+
+    first = run_campaign({**env, 'CRASH_AFTER_SENDS': str(CRASH_AFTER_SENDS)})
+    second = run_campaign(env)
+
+    with open(env['EVENTS_PATH']) as f:
+        events = Counter(line.strip() for line in f)
+    models = {k: v for k, v in events.items() if k.startswith('model ')}
+    sends = {k: v for k, v in events.items() if k.startswith('send ')}
+
+    assert first == -signal.SIGKILL, "first run should have been killed mid-send"
+    assert second == 0
+    assert len(models) == CUSTOMERS and max(models.values()) == 1, "repeated model calls"
+    assert len(sends) == CUSTOMERS and max(sends.values()) == 1, "duplicate sends"
+
+
+if __name__ == "__main__":
+    child()